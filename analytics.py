@@ -0,0 +1,195 @@
+"""Vectorized analytics over break history
+
+Loads the entries recorded by ``ReminderHistory.add_entry`` into NumPy
+arrays in one pass, then answers every question with array operations:
+
+    arrays = HistoryArrays.from_history(history)
+    heatmap(arrays)                 # 7 x 24 counts, Monday first
+    rolling_skip_rate(arrays, 7)    # per-day share of "stop" answers
+    interval_histogram(arrays)      # minutes between reminders
+    activity_acceptance(arrays)     # how often each suggestion was accepted
+
+Requires NumPy; the rest of the application works without it.
+"""
+from operator import itemgetter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+# Bin edges in minutes for interval_histogram
+INTERVAL_BINS = (0, 5, 10, 15, 20, 25, 30, 45, 60, 90, 120, 240, np.inf)
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _column(entries: Sequence[Dict], key: str, default: str) -> List[str]:
+    try:
+        return list(map(itemgetter(key), entries))
+    except KeyError:
+        # Entries written by older versions may lack the field
+        return [e.get(key, default) for e in entries]
+
+
+def _encode(values: List[str]) -> Tuple[np.ndarray, List[str]]:
+    """Integer codes for a column of strings plus the code -> string table"""
+    names = sorted(set(values))
+    lookup = {name: code for code, name in enumerate(names)}
+    return np.array(list(map(lookup.__getitem__, values)), dtype=np.int32), names
+
+
+class HistoryArrays:
+    """History columns as NumPy arrays
+
+    ``times`` holds seconds since the epoch in local wall-clock time (the
+    timestamps are naive), ``actions`` and ``activities`` hold integer codes
+    into ``action_names`` and ``activity_names``. Rows are in time order.
+    """
+
+    def __init__(self, times: np.ndarray, actions: np.ndarray, action_names: Sequence[str],
+                 activities: np.ndarray, activity_names: Sequence[str]):
+        self.times = times
+        self.actions = actions
+        self.action_names = list(action_names)
+        self.activities = activities
+        self.activity_names = list(activity_names)
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_entries(cls, entries: Sequence[Dict]) -> "HistoryArrays":
+        if not entries:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(empty, empty.astype(np.int32), [], empty.astype(np.int32), [])
+
+        stamps = np.array(_column(entries, "timestamp", ""), dtype="datetime64[us]")
+        times = stamps.astype("datetime64[s]").astype(np.int64)
+        actions, action_names = _encode(_column(entries, "action", "continue"))
+        activities, activity_names = _encode(_column(entries, "activity", ""))
+
+        # Appends are already in order; only sort if something was merged in
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind="stable")
+            times, actions, activities = times[order], actions[order], activities[order]
+        return cls(times, actions, action_names, activities, activity_names)
+
+    @classmethod
+    def from_history(cls, history) -> "HistoryArrays":
+        return cls.from_entries(history.history)
+
+    def action_mask(self, actions: Iterable[str]) -> np.ndarray:
+        codes = [self.action_names.index(a) for a in actions if a in self.action_names]
+        return np.isin(self.actions, codes)
+
+    @property
+    def days(self) -> np.ndarray:
+        return self.times // 86400
+
+
+def heatmap(arrays: HistoryArrays, actions: Iterable[str] = None) -> np.ndarray:
+    """Entry counts as a 7 x 24 array indexed by [weekday, hour], Monday = 0"""
+    times = arrays.times if actions is None else arrays.times[arrays.action_mask(actions)]
+    hours = (times // 3600) % 24
+    # 1970-01-01 was a Thursday
+    weekdays = (times // 86400 + 3) % 7
+    return np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+
+
+def busiest_slot(arrays: HistoryArrays, actions: Iterable[str] = None) -> Tuple[str, int]:
+    """The weekday and hour with the most entries, e.g. ("Tue", 14)"""
+    counts = heatmap(arrays, actions)
+    weekday, hour = np.unravel_index(np.argmax(counts), counts.shape)
+    return WEEKDAYS[weekday], int(hour)
+
+
+def rolling_skip_rate(arrays: HistoryArrays, window_days: int = 7,
+                      skip_action: str = "stop") -> Tuple[np.ndarray, np.ndarray]:
+    """Share of answers that were ``skip_action`` over a trailing window
+
+    Returns ``(days, rates)`` with one value per calendar day from the first
+    to the last entry; ``days`` are numpy datetime64[D] values and days
+    without any entries in their window have a rate of NaN.
+    """
+    if not len(arrays):
+        return np.zeros(0, dtype="datetime64[D]"), np.zeros(0)
+
+    days = arrays.days
+    first = days[0]
+    index = days - first
+    span = int(index[-1]) + 1
+    # Reminders nobody could answer are not answers
+    totals = np.bincount(index, weights=~arrays.action_mask(["shown_only"]), minlength=span)
+    skips = np.bincount(index, weights=arrays.action_mask([skip_action]), minlength=span)
+
+    # Zeros in front so the first days use the partial window they have
+    pad = np.zeros(window_days - 1)
+
+    def trailing(counts):
+        cumulative = np.concatenate(([0], np.cumsum(np.concatenate((pad, counts)))))
+        return cumulative[window_days:] - cumulative[:-window_days]
+
+    total_window = trailing(totals)
+    skip_window = trailing(skips)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(total_window > 0, skip_window / total_window, np.nan)
+    return np.arange(first, first + span).astype("datetime64[D]"), rates
+
+
+def interval_histogram(arrays: HistoryArrays, bins: Sequence[float] = INTERVAL_BINS,
+                       actions: Iterable[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Histogram of minutes between consecutive entries; returns ``(counts, edges)``"""
+    times = arrays.times if actions is None else arrays.times[arrays.action_mask(actions)]
+    gaps = np.diff(times) / 60.0
+    return np.histogram(gaps, bins=np.asarray(bins, dtype=float))
+
+
+def activity_acceptance(arrays: HistoryArrays, accept_action: str = "continue") -> Dict[str, Dict]:
+    """For each suggested activity: times shown, times accepted and the rate"""
+    if not len(arrays):
+        return {}
+    n_actions = len(arrays.action_names)
+    table = np.bincount(
+        arrays.activities * n_actions + arrays.actions,
+        minlength=len(arrays.activity_names) * n_actions
+    ).reshape(len(arrays.activity_names), n_actions)
+
+    shown = table.sum(axis=1)
+    if accept_action in arrays.action_names:
+        accepted = table[:, arrays.action_names.index(accept_action)]
+    else:
+        accepted = np.zeros_like(shown)
+
+    result = {}
+    for code, name in enumerate(arrays.activity_names):
+        if not name:
+            continue  # reminders shown without a suggestion
+        result[name] = {
+            "shown": int(shown[code]),
+            "accepted": int(accepted[code]),
+            "rate": float(accepted[code] / shown[code]) if shown[code] else 0.0,
+        }
+    return result
+
+
+def summary(arrays: HistoryArrays, window_days: int = 7) -> Dict:
+    """The figures StatsWindow shows, as plain Python values"""
+    if not len(arrays):
+        return {"entries": 0}
+    _, rates = rolling_skip_rate(arrays, window_days)
+    weekday, hour = busiest_slot(arrays)
+    counts, edges = interval_histogram(arrays)
+    common = int(np.argmax(counts)) if counts.any() else None
+    if common is not None:
+        # The last bin is open-ended: (240.0, None) means 240 minutes or more
+        high = edges[common + 1]
+        common = (float(edges[common]), None if np.isinf(high) else float(high))
+    acceptance = activity_acceptance(arrays)
+    return {
+        "entries": len(arrays),
+        "skip_rate": None if np.isnan(rates[-1]) else float(rates[-1]),
+        "busiest": f"{weekday} {hour:02d}:00",
+        "common_interval": common,
+        "top_activities": sorted(
+            acceptance.items(), key=lambda item: (-item[1]["rate"], -item[1]["shown"])
+        )[:3],
+    }
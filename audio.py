@@ -0,0 +1,327 @@
+"""Non-blocking notification sounds
+
+Sounds are decoded once into PCM, cached by path and modification time,
+and played by a dedicated worker thread through a pluggable backend:
+
+    engine = AudioEngine(create_audio_backend("auto"))
+    engine.preload("chime.ogg")   # decode ahead of time, e.g. at session start
+    engine.play("chime.ogg")      # returns immediately
+
+Backends: ``winsound`` on Windows, ``paplay``/``pw-play``/``aplay`` on
+Linux (PulseAudio, PipeWire or plain ALSA), ``BellBackend`` when there is
+no player, and ``NullSink``, which writes what would have been played to
+WAV files for tests. WAV files are decoded with the standard library;
+MP3, OGG and other formats need ``ffmpeg`` on the PATH. Without a sound
+file, or if decoding fails, a short beep is played instead.
+"""
+import io
+import math
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+# The old winsound.Beep(800, 500) reminder beep
+BEEP_FREQUENCY = 800
+BEEP_DURATION = 0.5
+
+
+class DecodeError(Exception):
+    pass
+
+
+class Sound:
+    """Decoded PCM audio"""
+
+    def __init__(self, frames: bytes, channels: int = 1, sample_width: int = 2,
+                 framerate: int = 44100, name: str = ""):
+        self.frames = frames
+        self.channels = channels
+        self.sample_width = sample_width
+        self.framerate = framerate
+        self.name = name
+        self._wav = None
+        self._wav_path = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / (self.channels * self.sample_width * self.framerate)
+
+    def wav_bytes(self) -> bytes:
+        if self._wav is None:
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as f:
+                f.setnchannels(self.channels)
+                f.setsampwidth(self.sample_width)
+                f.setframerate(self.framerate)
+                f.writeframes(self.frames)
+            self._wav = buffer.getvalue()
+        return self._wav
+
+    def wav_path(self) -> str:
+        """A temporary WAV copy for players that want a file"""
+        if self._wav_path is None or not Path(self._wav_path).exists():
+            fd, path = tempfile.mkstemp(prefix="break-reminder-", suffix=".wav")
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self.wav_bytes())
+            self._wav_path = path
+        return self._wav_path
+
+    def discard(self):
+        if self._wav_path is not None:
+            Path(self._wav_path).unlink(missing_ok=True)
+            self._wav_path = None
+
+
+def tone(frequency: float = BEEP_FREQUENCY, duration: float = BEEP_DURATION,
+         framerate: int = 44100, volume: float = 0.4) -> Sound:
+    """A sine beep with short fades so it does not click"""
+    count = int(duration * framerate)
+    fade = min(count // 2, framerate // 100)
+    step = 2 * math.pi * frequency / framerate
+    samples = []
+    for i in range(count):
+        envelope = min(1.0, i / fade, (count - i) / fade) if fade else 1.0
+        samples.append(int(32767 * volume * envelope * math.sin(step * i)))
+    return Sound(struct.pack(f"<{count}h", *samples), 1, 2, framerate, "beep")
+
+
+def decode(path: str) -> Sound:
+    """Decode a sound file into PCM"""
+    try:
+        with wave.open(path, 'rb') as f:
+            return Sound(f.readframes(f.getnframes()), f.getnchannels(),
+                         f.getsampwidth(), f.getframerate(), path)
+    except (wave.Error, EOFError):
+        pass  # Not a PCM WAV file; try ffmpeg
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise DecodeError(f"cannot decode {path}: not a WAV file and ffmpeg is not installed")
+    result = subprocess.run(
+        [ffmpeg, "-nostdin", "-loglevel", "error", "-i", path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "2", "-ar", "44100", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise DecodeError(f"cannot decode {path}: {result.stderr.decode(errors='replace').strip()}")
+    return Sound(result.stdout, 2, 2, 44100, path)
+
+
+class SoundCache:
+    """Decoded sounds keyed by path, reloaded when the file's mtime changes"""
+
+    def __init__(self, max_items: int = 8):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[float, Sound]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Sound:
+        mtime = os.stat(path).st_mtime
+        with self._lock:
+            cached = self._items.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._items.move_to_end(path)
+                return cached[1]
+
+        sound = decode(path)
+        with self._lock:
+            old = self._items.pop(path, None)
+            if old is not None:
+                old[1].discard()
+            self._items[path] = (mtime, sound)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)[1][1].discard()
+        return sound
+
+    def clear(self):
+        with self._lock:
+            for _, sound in self._items.values():
+                sound.discard()
+            self._items.clear()
+
+
+class AudioBackend:
+    """Plays a Sound; called only from the engine's worker thread"""
+
+    name = "base"
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def prepare(self, sound: Sound):
+        """Get a sound ready ahead of time; called after preload"""
+
+    def play(self, sound: Sound):
+        raise NotImplementedError
+
+
+class WinsoundBackend(AudioBackend):
+    name = "winsound"
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform == "win32"
+
+    def play(self, sound):
+        import winsound
+
+        # SND_MEMORY cannot be combined with SND_ASYNC; we are on a worker anyway
+        winsound.PlaySound(sound.wav_bytes(), winsound.SND_MEMORY)
+
+
+class SubprocessBackend(AudioBackend):
+    """Plays through a command-line player: paplay, pw-play or aplay"""
+
+    name = "subprocess"
+    PLAYERS = (("paplay",), ("pw-play",), ("aplay", "-q"))
+
+    def __init__(self, command: Optional[List[str]] = None):
+        self.command = command or self.find_player()
+        if self.command is None:
+            raise RuntimeError("no command-line audio player found")
+
+    @classmethod
+    def find_player(cls) -> Optional[List[str]]:
+        for player in cls.PLAYERS:
+            if shutil.which(player[0]):
+                return list(player)
+        return None
+
+    @classmethod
+    def available(cls) -> bool:
+        return cls.find_player() is not None
+
+    def prepare(self, sound):
+        sound.wav_path()
+
+    def play(self, sound):
+        subprocess.run(self.command + [sound.wav_path()],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+class BellBackend(AudioBackend):
+    """Ignores the sound and calls ``bell``, e.g. Tk's bell or a terminal BEL"""
+
+    name = "bell"
+
+    def __init__(self, bell: Callable[[], None]):
+        self.bell = bell
+
+    def play(self, sound):
+        self.bell()
+
+
+class NullSink(AudioBackend):
+    """Plays nothing; records sounds and optionally writes them as WAV files"""
+
+    name = "null"
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.played: List[Sound] = []
+
+    def play(self, sound):
+        self.played.append(sound)
+        if self.directory is not None:
+            path = Path(self.directory) / f"played-{len(self.played):04d}.wav"
+            path.write_bytes(sound.wav_bytes())
+
+
+class AudioEngine:
+    """Decodes and plays sounds on a worker thread so callers never block
+
+    ``play`` and ``preload`` only put a request on a queue. Plays requested
+    while another sound is still going are collapsed into one. If a sound
+    cannot be played, ``fallback`` is called from the worker thread.
+    """
+
+    def __init__(self, backend: AudioBackend, fallback: Optional[Callable[[], None]] = None,
+                 cache: Optional[SoundCache] = None):
+        self.backend = backend
+        self.fallback = fallback
+        self.cache = cache or SoundCache()
+        self.requests = queue.Queue()
+        self._beep = None
+        self._thread = threading.Thread(target=self._run, name="audio", daemon=True)
+        self._thread.start()
+
+    def preload(self, path: str = ""):
+        self.requests.put(("preload", path))
+
+    def play(self, path: str = ""):
+        self.requests.put(("play", path))
+
+    def shutdown(self, timeout: float = 2.0):
+        self.requests.put(None)
+        self._thread.join(timeout)
+        self.cache.clear()
+        if self._beep is not None:
+            self._beep.discard()
+
+    def sound(self, path: str = "") -> Sound:
+        """The decoded sound for ``path``, or the beep; worker thread only"""
+        if path:
+            try:
+                return self.cache.get(path)
+            except (OSError, DecodeError):
+                pass
+        if self._beep is None:
+            self._beep = tone()
+        return self._beep
+
+    def _run(self):
+        while True:
+            batch = [self.requests.get()]
+            while not self.requests.empty():
+                batch.append(self.requests.get_nowait())
+            if None in batch:
+                return
+
+            for kind, path in batch:
+                if kind == "preload":
+                    try:
+                        self.backend.prepare(self.sound(path))
+                    except Exception:
+                        pass
+
+            # Plays that piled up while the last sound was going become one
+            plays = [path for kind, path in batch if kind == "play"]
+            if plays:
+                try:
+                    self.backend.play(self.sound(plays[-1]))
+                except Exception:
+                    if self.fallback is not None:
+                        self.fallback()
+
+
+def create_audio_backend(name: str = "auto",
+                         bell: Optional[Callable[[], None]] = None) -> AudioBackend:
+    """Backend factory for the ``audio_backend`` config value
+
+    ``bell`` is used when no real player is available.
+    """
+    if name == "auto":
+        if WinsoundBackend.available():
+            name = "winsound"
+        elif SubprocessBackend.available():
+            name = "subprocess"
+        else:
+            name = "bell"
+
+    if name == "winsound" and WinsoundBackend.available():
+        return WinsoundBackend()
+    if name == "subprocess" and SubprocessBackend.available():
+        return SubprocessBackend()
+    if name in ("bell", "winsound", "subprocess") and bell is not None:
+        return BellBackend(bell)
+    return NullSink()
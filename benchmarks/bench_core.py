@@ -0,0 +1,520 @@
+"""Benchmarks for the reminder core, run headless
+
+    python benchmarks/bench_core.py                 # everything, JSON on stdout
+    python benchmarks/bench_core.py --quick         # skip the 1M-entry cases
+    python benchmarks/bench_core.py --only history scheduler
+    python benchmarks/bench_core.py --save          # also write results/core.json
+    python benchmarks/bench_core.py --baseline benchmarks/results/core.json
+
+Cases:
+
+- config: ReminderConfig.load_config / save_config latency and the unchanged-file reload check
+- history: ReminderHistory.add_entry cost with 100, 10k and 1M entries
+  already stored, for the JSON and SQLite backends
+- stats: ReminderStats.log_break_taken cost
+- scheduler: how late recurring jobs fire with many timers and a busy
+  background thread
+- history_window: HistoryWindow open/refresh/scroll with 200k entries; uses
+  $DISPLAY or starts Xvfb, and is skipped without either
+- import: cold ``import ver4`` in a fresh interpreter
+- wakeups: scheduler wakeups per hour of a Pomodoro session (reminder,
+  tray countdown, idle sampling) on a simulated clock, with and without
+  the low-power slack window
+- instrumentation: cost of one histogram observation and of save_config
+  with metrics off and on
+- simulation: a month of scripted Pomodoro sessions on the virtual clock
+  of simulate.py
+- eventbus: how long ReminderSession.fire takes with history and stats
+  written inline and through the event bus, the bus also feeding a
+  rotating log and a webhook on a local stand-in server that answers slowly
+- fleet: fleet.py over 5000 users (10k stats and history files) made by
+  copying a few simulated months, in one process and with a process pool
+
+All timings are in seconds. ``--baseline`` compares each ``median`` with
+an earlier report and exits with status 1 if any got slower than the
+tolerance allows.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import ver4  # noqa: E402
+from eventbus import EventBus, HistorySink, RotatingLogSink, StatsSink, WebhookSink  # noqa: E402
+from icons import CountdownUpdater, IconCache  # noqa: E402
+from idle import FakeActivitySource, IdleMonitor  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from notifications import NotificationCenter, NullBackend  # noqa: E402
+from scheduler import Scheduler  # noqa: E402
+from fleet import aggregate  # noqa: E402
+from simulate import Simulation  # noqa: E402
+from storage import SQLiteStore  # noqa: E402
+
+RESULTS = Path(__file__).resolve().parent / "results" / "core.json"
+NO_RETENTION = {"max_entries": None, "max_days": None}
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        "median": statistics.median(samples),
+        "p95": samples[min(count - 1, int(0.95 * count))],
+        "p99": samples[min(count - 1, int(0.99 * count))],
+        "max": samples[-1],
+        "n": count,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+@contextmanager
+def scratch_dir():
+    """Run in an empty working directory so the real data files are untouched"""
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield Path(directory)
+        finally:
+            os.chdir(previous)
+
+
+def make_entries(count, end=None):
+    end = end or datetime.now()
+    start = end - timedelta(minutes=25 * count)
+    actions = ("continue", "continue", "continue", "stop", "dismissed", "missed")
+    return [
+        {
+            "timestamp": (start + timedelta(minutes=25 * i)).isoformat(),
+            "message": "Time for a break!",
+            "activity": "Drink a glass of water",
+            "action": actions[i % len(actions)],
+        }
+        for i in range(count)
+    ]
+
+
+def bench_config(repeat=200):
+    with scratch_dir():
+        config = ver4.ReminderConfig()
+        config.save_config()
+        return {
+            "load_config": timed(config.load_config, repeat),
+            "save_config": timed(config.save_config, repeat),
+            "reload_unchanged": timed(config.reload_if_changed, repeat),
+        }
+
+
+def bench_history(sizes, adds=2000):
+    results = {}
+    for backend in ("json", "sqlite"):
+        for size in sizes:
+            with scratch_dir():
+                entries = make_entries(size)
+                store = None
+                if backend == "sqlite":
+                    store = SQLiteStore(ver4.DATABASE_FILE)
+                    with store.conn:
+                        store.conn.executemany(
+                            store.INSERT_HISTORY, (store._row(e) for e in entries)
+                        )
+                history = ver4.ReminderHistory(NO_RETENTION, store)
+                if store is None:
+                    history.history = entries
+                del entries
+
+                samples = []
+                for i in range(adds):
+                    start = time.perf_counter()
+                    history.add_entry("Time for a break!", "Stretch", "continue")
+                    samples.append(time.perf_counter() - start)
+                history.close()
+                results[f"{backend}_{size}"] = summarize(samples)
+    return results
+
+
+def bench_stats(repeat=500):
+    with scratch_dir():
+        stats = ver4.ReminderStats()
+        stats.log_session_start("Pomodoro")
+        result = timed(stats.log_break_taken, repeat)
+        stats.close()
+        return {"log_break_taken": result}
+
+
+def bench_scheduler(jobs=2000, duration=5.0, interval=(0.05, 0.5)):
+    random.seed(1)
+    scheduler = Scheduler()
+    lateness = []
+    stop = threading.Event()
+
+    def job_for(period):
+        job = None
+
+        def callback():
+            # The job is re-armed only after its callback returns
+            lateness.append(scheduler.clock() - job.deadline)
+        job = scheduler.every(period, callback)
+
+    for _ in range(jobs):
+        job_for(random.uniform(*interval))
+
+    def busy():
+        # Stand-in for a UI thread serializing history now and then
+        payload = make_entries(2000)
+        while not stop.is_set():
+            json.dumps(payload)
+
+    load = threading.Thread(target=busy, daemon=True)
+    worker = threading.Thread(target=scheduler.run_forever, args=(stop,), daemon=True)
+    load.start()
+    worker.start()
+    time.sleep(duration)
+    stop.set()
+    scheduler.wake()
+    worker.join()
+    load.join()
+    return {"jobs": jobs, "fire_lateness": summarize(lateness)}
+
+
+@contextmanager
+def virtual_display():
+    """Yield True if a display is usable, starting Xvfb when needed"""
+    if sys.platform != "linux" or os.environ.get("DISPLAY"):
+        yield True
+        return
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        yield False
+        return
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen(
+        [xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    time.sleep(1.0)
+    os.environ["DISPLAY"] = display
+    try:
+        yield process.poll() is None
+    finally:
+        del os.environ["DISPLAY"]
+        process.terminate()
+        process.wait()
+
+
+def bench_history_window(size=200000, repeat=20):
+    with virtual_display() as available:
+        if not available:
+            return {"skipped": "no display and Xvfb is not installed"}
+        try:
+            ver4.load_gui()
+            root = ver4.ctk.CTk()
+        except Exception as e:
+            return {"skipped": f"GUI unavailable: {e}"}
+
+        with scratch_dir():
+            history = ver4.ReminderHistory(NO_RETENTION)
+            history.history = make_entries(size)
+            window = ver4.HistoryWindow(root, history)
+            root.withdraw()
+
+            start = time.perf_counter()
+            window.show()
+            root.update()
+            opened = time.perf_counter() - start
+
+            def refresh():
+                window.refresh_history()
+                root.update_idletasks()
+
+            offsets = iter(random.Random(1).sample(range(size), repeat))
+
+            def scroll():
+                window.scroll_to(next(offsets))
+                root.update_idletasks()
+
+            results = {
+                "entries": size,
+                "open_s": opened,
+                "refresh": timed(refresh, repeat),
+                "scroll": timed(scroll, repeat),
+            }
+            root.destroy()
+            history.close()
+            return results
+
+
+def bench_import(runs=10):
+    from bench_startup import IMPORT_SNIPPET, measure
+
+    with tempfile.TemporaryDirectory() as cwd:
+        measure(IMPORT_SNIPPET, 1, cwd)  # warm the bytecode cache
+        return measure(IMPORT_SNIPPET, runs, cwd)
+
+
+def bench_wakeups(hours=8, slack=30.0):
+    results = {}
+    for window in (0.0, slack):
+        with scratch_dir():
+            now = [0.0]
+            clock = lambda: now[0]
+            scheduler = Scheduler(clock=clock, slack=window)
+            config = ver4.ReminderConfig(overrides={"sound_enabled": False})
+            stats = ver4.ReminderStats()
+            history = ver4.ReminderHistory(NO_RETENTION)
+            session = ver4.ReminderSession(
+                config, stats, history, scheduler, NotificationCenter(NullBackend())
+            )
+            # A user at the keyboard the whole time, so the session never pauses
+            source = FakeActivitySource(clock)
+            source.idle_seconds = lambda: 0.0
+            IdleMonitor(source, scheduler, session)
+            countdown = CountdownUpdater(IconCache(), scheduler, session)
+            session.start("Pomodoro")
+            countdown.start()
+
+            while now[0] < hours * 3600:
+                now[0] = scheduler.next_wakeup()
+                scheduler.run_pending()
+            session.stop()
+            stats.close()
+            history.close()
+            results[f"slack_{window:g}"] = {"wakeups_per_hour": scheduler.wakeups / hours}
+    return results
+
+
+def bench_instrumentation(repeat=500, observations=100000):
+    enabled = METRICS.enabled
+    try:
+        with scratch_dir():
+            config = ver4.ReminderConfig()
+            METRICS.enabled = False
+            off = timed(config.save_config, repeat)
+            METRICS.enabled = True
+            on = timed(config.save_config, repeat)
+
+            histogram = METRICS.histogram("bench_seconds")
+            start = time.perf_counter()
+            for _ in range(observations):
+                histogram.observe(0.001)
+            observe = (time.perf_counter() - start) / observations
+    finally:
+        METRICS.enabled = enabled
+        METRICS.reset()
+    return {
+        "observe_s": observe,
+        "save_config_off": off,
+        "save_config_on": on,
+        "overhead": on["median"] / off["median"] - 1,
+    }
+
+
+def bench_simulation(days=30, repeat=5):
+    with scratch_dir() as directory:
+        simulation = Simulation(directory / "simulation", days)
+        summary = simulation.run()
+        return {
+            "days": days,
+            "reminders": summary["reminders"],
+            "run": timed(simulation.run, repeat),
+        }
+
+
+@contextmanager
+def webhook_server(delay):
+    """Local stand-in for a webhook endpoint; yields its URL and the events it got"""
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(delay)
+            received.extend(json.loads(body)["events"])
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}/hook", received
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def bench_eventbus(reminders=2000, webhook_delay=0.2):
+    results = {}
+    for mode in ("inline", "bus"):
+        with scratch_dir(), webhook_server(webhook_delay) as (url, received):
+            scheduler = Scheduler()
+            config = ver4.ReminderConfig(overrides={"sound_enabled": False})
+            stats = ver4.ReminderStats()
+            history = ver4.ReminderHistory(NO_RETENTION)
+            session = ver4.ReminderSession(
+                config, stats, history, scheduler, NotificationCenter(NullBackend())
+            )
+            bus = None
+            if mode == "bus":
+                bus = EventBus()
+                bus.add_sink(HistorySink(history))
+                bus.add_sink(StatsSink(stats))
+                bus.add_sink(RotatingLogSink("events.log", max_bytes=256 * 1024))
+                webhook = WebhookSink(url)
+                webhook.flush_interval = 0.05
+                bus.add_sink(webhook)
+                bus.attach(session)
+            session.start("Pomodoro")
+
+            samples = []
+            for _ in range(reminders):
+                start = time.perf_counter()
+                session.fire()
+                session.respond("continue")
+                samples.append(time.perf_counter() - start)
+            session.stop()
+
+            result = {"fire_and_respond": summarize(samples)}
+            if bus is not None:
+                start = time.perf_counter()
+                bus.close(timeout=30.0)
+                result["drain_s"] = time.perf_counter() - start
+                result["sinks"] = bus.status()
+                result["webhook_received"] = len(received)
+            result["history_entries"] = len(history.history)
+            stats.close()
+            history.close()
+            results[mode] = result
+    return results
+
+
+def bench_fleet(users=5000, days=30):
+    with scratch_dir() as directory:
+        sources = []
+        for seed in range(4):
+            source = directory / "source" / str(seed)
+            Simulation(source, days, seed=seed).run()
+            sources.append(source)
+        root = directory / "fleet"
+        for user in range(users):
+            target = root / f"team{user % 50}" / f"user{user}"
+            target.mkdir(parents=True)
+            for name in (ver4.STATS_FILE, ver4.HISTORY_FILE):
+                shutil.copyfile(sources[user % len(sources)] / name, target / name)
+
+        results = {"users": users, "files": 2 * users, "cpus": os.cpu_count()}
+        for label, workers in (("single_process", 0), ("process_pool", None)):
+            start = time.perf_counter()
+            report = aggregate(str(root), workers).report()
+            results[label] = {"seconds": time.perf_counter() - start}
+        results["history_entries"] = report["history"]["entries"]
+        return results
+
+
+def compare(report, baseline, tolerance):
+    """Paths whose median got slower than ``baseline`` by more than ``tolerance``"""
+    regressions = []
+
+    def walk(new, old, path):
+        if not isinstance(new, dict) or not isinstance(old, dict):
+            return
+        if isinstance(new.get("median"), (int, float)) and isinstance(old.get("median"), (int, float)):
+            if old["median"] > 0 and new["median"] > old["median"] * (1 + tolerance):
+                regressions.append({
+                    "case": path,
+                    "baseline": old["median"],
+                    "current": new["median"],
+                    "ratio": new["median"] / old["median"],
+                })
+        for key, value in new.items():
+            if key in old:
+                walk(value, old[key], f"{path}.{key}" if path else key)
+
+    walk(report.get("results", {}), baseline.get("results", {}), "")
+    return regressions
+
+
+CASES = (
+    "config", "history", "stats", "scheduler", "history_window", "import", "wakeups",
+    "instrumentation", "simulation", "eventbus", "fleet"
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reminder core benchmarks")
+    parser.add_argument("--only", nargs="+", choices=CASES, help="run just these cases")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-entry history case")
+    parser.add_argument("--save", action="store_true", help=f"write {RESULTS.relative_to(RESULTS.parent.parent.parent)}")
+    parser.add_argument("--output", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression (default 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = (100, 10000) if args.quick else (100, 10000, 1000000)
+    runners = {
+        "config": bench_config,
+        "history": lambda: bench_history(sizes),
+        "stats": bench_stats,
+        "scheduler": bench_scheduler,
+        "history_window": bench_history_window,
+        "import": bench_import,
+        "wakeups": bench_wakeups,
+        "instrumentation": bench_instrumentation,
+        "simulation": bench_simulation,
+        "eventbus": bench_eventbus,
+        "fleet": bench_fleet,
+    }
+
+    results = {}
+    for case in args.only or CASES:
+        results[case] = runners[case]()
+
+    report = {
+        "benchmark": "core",
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    for path in ([RESULTS] if args.save else []) + ([Path(args.output)] if args.output else []):
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
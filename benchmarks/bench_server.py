@@ -0,0 +1,134 @@
+"""Memory per user, fire-time jitter and client wait of the multi-user server
+
+    python benchmarks/bench_server.py --users 10000 --duration 30 --save
+
+Prints a JSON report; ``--save`` also writes it to
+benchmarks/results/server.json. ``client_wait_ms`` is how much later than
+asked a task sleeping 10 ms on the server's loop gets to run, which is
+what a client request waits while timers are being fired.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scheduler import ASYNC_BATCH  # noqa: E402
+from server import ReminderServer  # noqa: E402
+from ver4 import CONFIG_FILE  # noqa: E402
+
+RESULTS = Path(__file__).resolve().parent / "results" / "server.json"
+PROBE_INTERVAL = 0.01
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(users: int, duration: float, min_interval: float, max_interval: float,
+        batch: int = ASYNC_BATCH):
+    random.seed(1)
+    with tempfile.TemporaryDirectory() as data_dir:
+        server = ReminderServer(data_dir)
+        lags = []
+        waits = []
+        for i in range(users):
+            directory = Path(data_dir) / "users" / f"user{i}"
+            directory.mkdir(parents=True)
+            (directory / CONFIG_FILE).write_text(json.dumps({
+                "intervals": {"Bench": random.uniform(min_interval, max_interval)}
+            }))
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for i in range(users):
+            server.user(f"user{i}")
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+        def on_event(namespace):
+            def listener(event, payload):
+                if event == "break_shown":
+                    job = server.scheduler.get(namespace.session.key)
+                    lags.append(server.scheduler.clock() - job.deadline)
+                    namespace.session.respond("continue")
+            return listener
+
+        start = time.perf_counter()
+        for namespace in server.users.values():
+            namespace.session.listeners.append(on_event(namespace))
+            namespace.session.start("Bench")
+        start_all = time.perf_counter() - start
+
+        async def probe(stop):
+            loop = asyncio.get_running_loop()
+            while not stop.is_set():
+                asked = loop.time()
+                await asyncio.sleep(PROBE_INTERVAL)
+                waits.append(loop.time() - asked - PROBE_INTERVAL)
+
+        async def drive():
+            stop = asyncio.Event()
+            asyncio.get_running_loop().call_later(duration, stop.set)
+            task = asyncio.create_task(server.scheduler.run_async(stop, batch or None))
+            probing = asyncio.create_task(probe(stop))
+            await stop.wait()
+            await probing
+            server.scheduler.wake()
+            await task
+
+        asyncio.run(drive())
+        for namespace in server.users.values():
+            namespace.close()
+
+    return {
+        "benchmark": "server",
+        "users": users,
+        "duration_s": duration,
+        "batch": batch or None,
+        "bytes_per_user": allocated / users,
+        "start_all_sessions_s": start_all,
+        "fires": len(lags),
+        "jitter_ms": {
+            "p50": percentile(lags, 0.50) * 1000 if lags else None,
+            "p90": percentile(lags, 0.90) * 1000 if lags else None,
+            "p99": percentile(lags, 0.99) * 1000 if lags else None,
+            "max": max(lags) * 1000 if lags else None,
+        },
+        "client_wait_ms": {
+            "p50": percentile(waits, 0.50) * 1000 if waits else None,
+            "p99": percentile(waits, 0.99) * 1000 if waits else None,
+            "max": max(waits) * 1000 if waits else None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--min-interval", type=float, default=5.0)
+    parser.add_argument("--max-interval", type=float, default=15.0)
+    parser.add_argument("--batch", type=int, default=ASYNC_BATCH,
+                        help="jobs fired between yields to the loop (0: no limit)")
+    parser.add_argument("--save", action="store_true", help="write benchmarks/results/server.json")
+    args = parser.parse_args(argv)
+    report = run(args.users, args.duration, args.min_interval, args.max_interval, args.batch)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.save:
+        RESULTS.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Cold-start cost of ver4.py
+
+Each measurement runs in a fresh interpreter:
+
+- import_s: ``import ver4``
+- first_schedule_s: interpreter start to the first reminder being scheduled
+  on the headless path (config, stats and history loaded, session started)
+- gui_import_s: importing customtkinter, PIL and pystray, i.e. what the
+  headless path no longer pays (skipped if they are not installed)
+
+    python benchmarks/bench_startup.py --runs 10 --save
+
+``--save`` writes the report to benchmarks/results/startup.json so changes
+in start-up time show up in review.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS = Path(__file__).resolve().parent / "results" / "startup.json"
+
+IMPORT_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import ver4
+print(time.perf_counter() - t)
+"""
+
+FIRST_SCHEDULE_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import ver4
+from scheduler import Scheduler
+from notifications import NotificationCenter, NullBackend
+config = ver4.ReminderConfig()
+stats = ver4.ReminderStats()
+history = ver4.ReminderHistory(config.get("history_retention"))
+session = ver4.ReminderSession(config, stats, history, Scheduler(), NotificationCenter(NullBackend()))
+session.start()
+print(time.perf_counter() - t)
+assert "customtkinter" not in sys.modules
+"""
+
+GUI_SNIPPET = """
+import time
+t = time.perf_counter()
+import customtkinter, PIL.Image
+try:
+    import pystray
+except Exception:  # needs a display on Linux
+    pass
+print(time.perf_counter() - t)
+"""
+
+
+def measure(snippet: str, runs: int, cwd: str):
+    samples = []
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", snippet], cwd=cwd, env=env,
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "max": max(samples),
+        "runs": runs,
+    }
+
+
+def run(runs: int):
+    # Empty working directory, so no data files are loaded
+    with tempfile.TemporaryDirectory() as cwd:
+        measure(IMPORT_SNIPPET, 1, cwd)  # warm the bytecode cache
+        return {
+            "benchmark": "startup",
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "import_s": measure(IMPORT_SNIPPET, runs, cwd),
+            "first_schedule_s": measure(FIRST_SCHEDULE_SNIPPET, runs, cwd),
+            "gui_import_s": measure(GUI_SNIPPET, runs, cwd),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ver4.py cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--save", action="store_true", help=f"write {RESULTS.relative_to(ROOT)}")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.save:
+        RESULTS.parent.mkdir(exist_ok=True)
+        RESULTS.write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
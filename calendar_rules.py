@@ -0,0 +1,251 @@
+"""Working hours, lunch and do-not-disturb rules for reminders
+
+Rules come from the ``calendar`` config value:
+
+    "calendar": {
+        "enabled": true,
+        "working_hours": [{"days": ["mon", "tue", "wed", "thu", "fri"],
+                           "start": "09:00", "end": "17:30"}],
+        "lunch": {"start": "12:30", "end": "13:30"},
+        "do_not_disturb": [
+            {"days": ["wed"], "start": "14:00", "end": "15:00"},
+            {"from": "2024-06-03T10:00", "to": "2024-06-03T12:00"}
+        ]
+    }
+
+Weekly rules are compiled once into sorted, merged lists of windows in
+seconds since Monday 00:00, and one-off blocks into a sorted list of
+datetimes, so "is this moment allowed" and "when is the next allowed
+moment" are a few binary searches instead of a walk over a calendar.
+Recurrences are only expanded on demand, by the ``allowed_windows`` generator.
+
+Outside working hours and during lunch the user is off; during a
+do-not-disturb block they are working but must not be interrupted.
+``ReminderSession`` starts a fresh interval after time off and delivers a
+reminder held back by do-not-disturb as soon as the block ends.
+"""
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+# How far ahead next_allowed looks before giving up
+HORIZON = timedelta(days=366)
+
+
+def parse_time(text: str) -> int:
+    """Seconds since midnight for "HH:MM" (or "24:00")"""
+    hours, minutes = text.split(":")
+    seconds = int(hours) * 3600 + int(minutes) * 60
+    if not 0 <= seconds <= DAY_SECONDS:
+        raise ValueError(f"bad time of day {text!r}")
+    return seconds
+
+
+def parse_days(days: Optional[Iterable[str]]) -> List[int]:
+    if days is None:
+        return list(range(7))
+    return [DAYS.index(day.strip().lower()[:3]) for day in days]
+
+
+def week_start(when: datetime) -> datetime:
+    return (when - timedelta(days=when.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def week_offset(when: datetime) -> float:
+    """Seconds since Monday 00:00 of ``when``'s week"""
+    return (when.weekday() * DAY_SECONDS + when.hour * 3600 + when.minute * 60
+            + when.second + when.microsecond / 1e6)
+
+
+def merge(windows: Iterable[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Sort and merge overlapping or touching windows"""
+    merged = []
+    for start, end in sorted(w for w in windows if w[1] > w[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class WeeklyWindows:
+    """Disjoint windows that repeat every week, in seconds since Monday 00:00"""
+
+    def __init__(self, windows: Iterable[Tuple[float, float]] = ()):
+        windows = merge(windows)
+        self.starts = [start for start, _ in windows]
+        self.ends = [end for _, end in windows]
+
+    @classmethod
+    def from_rules(cls, rules: Iterable[Dict]) -> "WeeklyWindows":
+        """Windows for ``{"days": [...], "start": "HH:MM", "end": "HH:MM"}`` rules
+
+        A rule whose end is not after its start runs past midnight.
+        """
+        windows = []
+        for rule in rules:
+            start, end = parse_time(rule["start"]), parse_time(rule["end"])
+            if end <= start:
+                end += DAY_SECONDS
+            for day in parse_days(rule.get("days")):
+                offset = day * DAY_SECONDS
+                # Sunday night into Monday morning wraps to the start of the week
+                if offset + end > WEEK_SECONDS:
+                    windows.append((offset + start, WEEK_SECONDS))
+                    windows.append((0, offset + end - WEEK_SECONDS))
+                else:
+                    windows.append((offset + start, offset + end))
+        return cls(windows)
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    def subtract(self, other: "WeeklyWindows") -> "WeeklyWindows":
+        result = []
+        for start, end in zip(self.starts, self.ends):
+            for cut_start, cut_end in zip(other.starts, other.ends):
+                if cut_end <= start or cut_start >= end:
+                    continue
+                if cut_start > start:
+                    result.append((start, cut_start))
+                start = max(start, cut_end)
+            if start < end:
+                result.append((start, end))
+        return WeeklyWindows(result)
+
+    def find(self, offset: float) -> int:
+        """Index of the window containing ``offset``, or -1"""
+        index = bisect_right(self.starts, offset) - 1
+        if index >= 0 and offset < self.ends[index]:
+            return index
+        return -1
+
+    def contains(self, when: datetime) -> bool:
+        return self.find(week_offset(when)) >= 0
+
+    def end_of(self, when: datetime) -> Optional[datetime]:
+        """End of the window containing ``when``, following it across the week boundary"""
+        offset = week_offset(when)
+        index = self.find(offset)
+        if index < 0:
+            return None
+        end = week_start(when) + timedelta(seconds=self.ends[index])
+        if self.ends[index] == WEEK_SECONDS and self.starts[0] == 0:
+            end += timedelta(seconds=self.ends[0])
+        return end
+
+    def next_start(self, when: datetime) -> Optional[datetime]:
+        """Start of the first window beginning after ``when``"""
+        if not self.starts:
+            return None
+        offset = week_offset(when)
+        index = bisect_right(self.starts, offset)
+        base = week_start(when)
+        if index == len(self.starts):
+            index, base = 0, base + timedelta(days=7)
+        return base + timedelta(seconds=self.starts[index])
+
+
+class Blocks:
+    """One-off blocks of absolute time, merged and sorted"""
+
+    def __init__(self, blocks: Iterable[Tuple[datetime, datetime]] = ()):
+        blocks = merge(blocks)
+        self.starts = [start for start, _ in blocks]
+        self.ends = [end for _, end in blocks]
+
+    def end_of(self, when: datetime) -> Optional[datetime]:
+        index = bisect_right(self.starts, when) - 1
+        if index >= 0 and when < self.ends[index]:
+            return self.ends[index]
+        return None
+
+
+class WorkCalendar:
+    """When reminders may be shown
+
+    ``working`` are the weekly windows the user works in (None: always),
+    already without lunch; ``quiet`` and ``blocks`` are the recurring and
+    one-off do-not-disturb times.
+    """
+
+    def __init__(self, working: Optional[WeeklyWindows] = None,
+                 quiet: Optional[WeeklyWindows] = None, blocks: Optional[Blocks] = None):
+        self.working = working
+        self.quiet = quiet or WeeklyWindows()
+        self.blocks = blocks or Blocks()
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict]) -> Optional["WorkCalendar"]:
+        """Compile the ``calendar`` config value; None if it is off or empty"""
+        if not settings or not settings.get("enabled", False):
+            return None
+        working = None
+        if settings.get("working_hours"):
+            hours = settings["working_hours"]
+            working = WeeklyWindows.from_rules(hours if isinstance(hours, (list, tuple)) else [hours])
+            if settings.get("lunch"):
+                working = working.subtract(WeeklyWindows.from_rules([settings["lunch"]]))
+
+        recurring, once = [], []
+        for rule in settings.get("do_not_disturb") or []:
+            if "from" in rule:
+                once.append((datetime.fromisoformat(rule["from"]), datetime.fromisoformat(rule["to"])))
+            else:
+                recurring.append(rule)
+        calendar = cls(working, WeeklyWindows.from_rules(recurring), Blocks(once))
+        if calendar.working is None and not calendar.quiet and not calendar.blocks.starts:
+            return None
+        return calendar
+
+    def is_working(self, when: datetime) -> bool:
+        return self.working is None or self.working.contains(when)
+
+    def is_quiet(self, when: datetime) -> bool:
+        return self.quiet.contains(when) or self.blocks.end_of(when) is not None
+
+    def allowed(self, when: datetime) -> bool:
+        return self.is_working(when) and not self.is_quiet(when)
+
+    def next_allowed(self, when: datetime, horizon: timedelta = HORIZON) -> Optional[datetime]:
+        """The first moment at or after ``when`` a reminder may be shown
+
+        Each step jumps to the end of whatever blocks the current candidate,
+        found by binary search, so the cost depends on how many rules overlap
+        rather than on how far away the answer is.
+        """
+        limit = when + horizon
+        candidate = when
+        while candidate <= limit:
+            if not self.is_working(candidate):
+                candidate = self.working.next_start(candidate)
+                if candidate is None:
+                    return None
+                continue
+            end = self.quiet.end_of(candidate) or self.blocks.end_of(candidate)
+            if end is not None:
+                candidate = end
+                continue
+            return candidate
+        return None
+
+    def allowed_windows(self, start: datetime) -> Iterator[Tuple[datetime, datetime]]:
+        """Stretches of time reminders may be shown in, lazily from ``start`` on"""
+        candidate = self.next_allowed(start)
+        while candidate is not None:
+            end = candidate + HORIZON
+            if self.working is not None:
+                end = min(end, self.working.end_of(candidate) or end)
+            next_quiet = self.quiet.next_start(candidate)
+            if next_quiet is not None:
+                end = min(end, next_quiet)
+            index = bisect_right(self.blocks.starts, candidate)
+            if index < len(self.blocks.starts):
+                end = min(end, self.blocks.starts[index])
+            yield candidate, end
+            candidate = self.next_allowed(end)
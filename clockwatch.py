@@ -0,0 +1,140 @@
+"""Suspend/resume and wall-clock jump detection for sessions
+
+The scheduler runs on the monotonic clock, which on Linux stops while the
+machine is suspended: a reminder due in ten minutes when the lid closed is
+still due ten minutes after it opens again, however long it stayed shut.
+On Windows the monotonic clock keeps counting, so every reminder missed
+while asleep is due at once. Wall-clock time can also jump when NTP or the
+user corrects it, which would otherwise end up in session durations.
+
+ClockWatch samples three clocks every ``check_interval`` seconds (and
+whenever a reminder fires) and compares how far each moved:
+
+- CLOCK_BOOTTIME (Linux) counts suspended time and the monotonic clock
+  doesn't, so the difference is the time spent suspended
+- without a boot clock, a check that ran far later than planned means the
+  monotonic clock counted a suspend (Windows), and the wall clock moving
+  further than the monotonic clock means it didn't (macOS)
+- whatever the wall clock moved beyond that is a clock jump
+
+A suspend is handed to ``ReminderSession.suspended`` with the catch-up
+policy: ``skip`` drops reminders missed while asleep and keeps the
+schedule, ``fire_once`` shows one reminder for all of them, and ``reset``
+(the default) treats the time asleep as a break and starts a fresh
+interval. In every case at most one reminder is shown on resume.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+CATCH_UP_POLICIES = ("skip", "fire_once", "reset")
+
+# Gaps shorter than this are scheduling noise, not a suspend or a jump
+JUMP_THRESHOLD = 10.0
+
+
+def boottime() -> Optional[float]:
+    """Seconds on CLOCK_BOOTTIME, or None where there is no such clock"""
+    clock_id = getattr(time, "CLOCK_BOOTTIME", None)
+    if clock_id is None:
+        return None
+    try:
+        return time.clock_gettime(clock_id)
+    except OSError:
+        return None
+
+
+class ClockSample:
+    __slots__ = ("monotonic", "boot", "wall")
+
+    def __init__(self, monotonic: float, boot: Optional[float], wall: float):
+        self.monotonic = monotonic
+        self.boot = boot
+        self.wall = wall
+
+
+class ClockWatch:
+    """Notices suspends and clock jumps during a session
+
+    The monotonic reading is the scheduler's own clock, so gaps are
+    measured the way the scheduler saw them. The session starts and stops
+    the watch itself (see ``ReminderSession.clock_watch``).
+    """
+
+    def __init__(self, scheduler, session, policy: str = "reset", check_interval: float = 60.0,
+                 threshold: float = JUMP_THRESHOLD,
+                 boot: Callable[[], Optional[float]] = boottime,
+                 wall: Callable[[], float] = time.time):
+        if policy not in CATCH_UP_POLICIES:
+            raise ValueError(f"unknown catch-up policy {policy!r}")
+        self.scheduler = scheduler
+        self.session = session
+        self.policy = policy
+        self.check_interval = check_interval
+        self.threshold = threshold
+        self.boot = boot
+        self.wall = wall
+        self.key = (session.key, "clock")
+        self.config = None
+
+        self.last: Optional[ClockSample] = None
+        self.suspends = 0
+        self.jumps = 0
+        session.clock_watch = self
+
+    @classmethod
+    def from_config(cls, config, scheduler, session) -> "ClockWatch":
+        """Watch that re-reads ``catch_up_policy`` from a ReminderConfig at every session start"""
+        watch = cls(scheduler, session)
+        watch.config = config
+        return watch
+
+    def sample(self) -> ClockSample:
+        return ClockSample(self.scheduler.clock(), self.boot(), self.wall())
+
+    def start(self):
+        if self.config is not None:
+            policy = self.config.get("catch_up_policy", "reset")
+            self.policy = policy if policy in CATCH_UP_POLICIES else "reset"
+        self.last = self.sample()
+        self.scheduler.every(self.check_interval, self.check, key=self.key,
+                             slack=self.scheduler.slack)
+
+    def stop(self):
+        self.scheduler.cancel(self.key)
+        self.last = None
+
+    def check(self) -> bool:
+        """Compare the clocks with the last sample; True if a suspend was handled"""
+        if self.last is None:
+            return False
+        last, now = self.last, self.sample()
+        self.last = now
+
+        monotonic = now.monotonic - last.monotonic
+        wall = now.wall - last.wall
+        suspended = unseen = 0.0
+        if now.boot is not None and last.boot is not None:
+            unseen = (now.boot - last.boot) - monotonic
+            suspended = unseen
+        else:
+            # The periodic check can run up to its slack late
+            overdue = monotonic - self.check_interval - self.scheduler.slack
+            if overdue > self.threshold:
+                suspended = overdue
+            elif wall - monotonic > self.threshold:
+                suspended = unseen = wall - monotonic
+
+        if suspended < self.threshold:
+            suspended = unseen = 0.0
+        jump = wall - monotonic - unseen
+        if abs(jump) > self.threshold:
+            self.jumps += 1
+            self.session.clock_jumped(jump)
+        if not suspended:
+            return False
+
+        self.suspends += 1
+        started = datetime.fromtimestamp(now.wall) - timedelta(seconds=suspended)
+        self.session.suspended(started, suspended, unseen, self.policy)
+        return True
@@ -0,0 +1,278 @@
+"""Layered configuration resolved into one immutable snapshot
+
+Settings come from up to five layers; later layers win:
+
+1. built-in defaults (``ReminderConfig.DEFAULT_CONFIG``)
+2. the system file, ``/etc/break-reminder/config.json``
+   (``%PROGRAMDATA%\\break-reminder\\config.json`` on Windows)
+3. the user file, ``reminder_config.json``
+4. environment variables, for example
+   ``BREAK_REMINDER_SOUND_ENABLED=false`` or
+   ``BREAK_REMINDER_IDLE_DETECTION__IDLE_MINUTES=10``
+5. overrides given on the command line, ``--set idle_detection.idle_minutes=10``
+
+Layers are merged key by key at every depth. A user file that only sets
+``{"intervals": {"Pomodoro": 3000}}`` keeps the other presets. Lists are
+replaced as a whole. The merged values are checked against the defaults
+once (``validate``) and frozen into a ``FrozenConfig``. Nested dicts in it
+are read-only mappings whose keys are also attributes, and lists are
+tuples:
+
+    snapshot = FrozenConfig({"idle_detection": {"idle_minutes": 5}})
+    snapshot.idle_detection.idle_minutes        # 5, no defaults at the call site
+    snapshot["idle_detection"]["idle_minutes"]  # the same value
+
+A snapshot is never changed after it is built. A change builds a new
+snapshot and replaces the old one in a single assignment, so readers on
+other threads see either the old values or the new ones, never a mix.
+``file_stamp`` gives the (mtime, size) a reload is checked against. A file
+that has not changed costs one ``stat`` call.
+"""
+import json
+import os
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+if sys.platform == "win32":
+    SYSTEM_CONFIG_FILE = os.path.join(
+        os.environ.get("PROGRAMDATA", r"C:\ProgramData"), "break-reminder", "config.json"
+    )
+else:
+    SYSTEM_CONFIG_FILE = "/etc/break-reminder/config.json"
+
+# BREAK_REMINDER_<KEY>[__<SUBKEY>...]=<JSON or plain text>
+ENV_PREFIX = "BREAK_REMINDER_"
+ENV_SEPARATOR = "__"
+# Variables under the prefix that are not settings and must never reach a snapshot
+SERVER_TOKEN_ENV = ENV_PREFIX + "SERVER_TOKEN"
+RESERVED_ENV = frozenset({SERVER_TOKEN_ENV})
+
+
+class FrozenConfig(Mapping):
+    """Read-only mapping whose keys can also be read as attributes
+
+    Attribute reads are plain instance attribute lookups. Keys that aren't
+    identifiers, such as ``"Short Break"``, and keys named like a mapping
+    method, such as ``"items"``, are read as items.
+    """
+
+    __slots__ = ("_data", "__dict__")
+
+    def __init__(self, values: Mapping = ()):
+        data = {key: freeze(value) for key, value in dict(values).items()}
+        object.__setattr__(self, "_data", data)
+        # Keys never shadow the mapping methods
+        if all(isinstance(key, str) and not hasattr(FrozenConfig, key) for key in data):
+            object.__setattr__(self, "__dict__", data)  # no second dict needed
+        else:
+            for key, value in data.items():
+                if isinstance(key, str) and not hasattr(FrozenConfig, key):
+                    object.__setattr__(self, key, value)
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("config snapshots are read-only; use ReminderConfig.set")
+
+    def __delattr__(self, name):
+        raise AttributeError("config snapshots are read-only; use ReminderConfig.set")
+
+    def __repr__(self):
+        return f"FrozenConfig({self._data!r})"
+
+    def thaw(self) -> Dict:
+        """A plain, mutable, JSON-serializable deep copy"""
+        return thaw(self)
+
+
+def freeze(value):
+    if value is None or isinstance(value, (str, int, float, FrozenConfig)):
+        return value
+    if isinstance(value, Mapping):
+        return FrozenConfig(value)
+    if isinstance(value, (list, tuple)):
+        items = tuple(freeze(item) for item in value)
+        # An already frozen tuple is kept, so snapshots can share it
+        if isinstance(value, tuple) and all(a is b for a, b in zip(items, value)):
+            return value
+        return items
+    return value
+
+
+def thaw(value):
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+def deep_merge(base: Mapping, override: Mapping) -> Dict:
+    """``base`` with ``override`` on top, dicts merged at every depth
+
+    Neither argument is modified. Values that are not merged may be
+    shared with the inputs. They are copied when the result is frozen.
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), Mapping):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def nest(path: Sequence[str], value) -> Dict:
+    """``{"a": {"b": value}}`` for the path ``("a", "b")``"""
+    for key in reversed(path):
+        value = {key: value}
+    return value
+
+
+def leaf_paths(layer: Mapping, prefix: Tuple[str, ...] = ()) -> Iterator[Tuple[str, ...]]:
+    """Paths to every value in ``layer`` that is not itself a dict"""
+    for key, value in layer.items():
+        if isinstance(value, Mapping) and value:
+            yield from leaf_paths(value, prefix + (key,))
+        else:
+            yield prefix + (key,)
+
+
+def covers(layer: Mapping, path: Sequence[str]) -> bool:
+    """Whether merging ``layer`` on top replaces the value at ``path``"""
+    for key in path:
+        if not isinstance(layer, Mapping) or key not in layer:
+            return False
+        layer = layer[key]
+        if not isinstance(layer, Mapping):
+            return True
+    return True
+
+
+def parse_value(text: str):
+    """JSON if it parses (numbers, true/false, null, lists, objects), else the text itself"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_assignment(text: str) -> Dict:
+    """The layer for a ``--set`` argument such as ``idle_detection.idle_minutes=10``"""
+    path, sep, value = text.partition("=")
+    if not sep or not path.strip():
+        raise ValueError(f"expected KEY=VALUE, got {text!r}")
+    return nest([part.strip() for part in path.split(".")], parse_value(value))
+
+
+def env_overrides(environ: Optional[Mapping[str, str]] = None) -> Dict:
+    """The layer for ``BREAK_REMINDER_*`` variables (``os.environ`` by default)
+
+    Names in ``RESERVED_ENV``, such as the server token, are left out.
+    """
+    if environ is None:
+        environ = os.environ
+    layer = {}
+    for name in sorted(environ):
+        if (not name.startswith(ENV_PREFIX) or len(name) == len(ENV_PREFIX)
+                or name in RESERVED_ENV):
+            continue
+        path = name[len(ENV_PREFIX):].lower().split(ENV_SEPARATOR)
+        layer = deep_merge(layer, nest(path, parse_value(environ[name])))
+    return layer
+
+
+def file_stamp(path: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(mtime, size) of ``path``; None if it doesn't exist"""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def read_layer(path: Optional[str]) -> Dict:
+    """The settings in a JSON file; an empty layer if there is no file
+
+    Raises ValueError for a file that can't be read or isn't a JSON object.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            layer = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{path}: {e}")
+    if not isinstance(layer, dict):
+        raise ValueError(f"{path}: expected a JSON object")
+    return layer
+
+
+def kind(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (dict, Mapping)):
+        return "object"
+    if isinstance(value, (list, tuple)):
+        return "list"
+    return type(value).__name__
+
+
+def validate(values: Mapping, defaults: Mapping, choices: Optional[Mapping[str, Sequence]] = None,
+             nullable: Sequence[str] = (), prefix: str = "") -> Tuple[Dict, List[str]]:
+    """Check ``values`` against the types of ``defaults``
+
+    A value of the wrong kind (or not in ``choices``, keyed by dotted path)
+    is replaced by its default, and the problem is described in the
+    returned list. Options listed in ``nullable`` may also be null. Keys
+    that have no default are kept as they are.
+    """
+    choices = choices or {}
+    checked, problems = {}, []
+    for key, value in values.items():
+        path = prefix + str(key)
+        if key not in defaults:
+            checked[key] = value
+            continue
+        default = defaults[key]
+        if value is default:
+            checked[key] = value  # untouched by every layer
+            continue
+        expected = kind(default)
+        if value is None and path in nullable:
+            checked[key] = None
+        elif default is not None and kind(value) != expected:
+            problems.append(f"{path}: expected a {expected}, got {value!r}; using the default")
+            checked[key] = default
+        elif expected == "object":
+            checked[key], nested = validate(value, default, choices, nullable, path + ".")
+            problems.extend(nested)
+        elif path in choices and value not in choices[path]:
+            allowed = ", ".join(map(str, choices[path]))
+            problems.append(f"{path}: {value!r} is not one of {allowed}; using the default")
+            checked[key] = default
+        else:
+            checked[key] = value
+    return checked, problems
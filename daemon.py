@@ -0,0 +1,225 @@
+"""Background break reminder daemon with a Unix-socket JSON control API
+
+Start the daemon:
+
+    python daemon.py
+
+Talk to it (one JSON object per line in each direction):
+
+    python daemon.py --send status
+    python daemon.py --send start_session --interval Pomodoro
+    echo '{"cmd": "next_fire"}' | socat - UNIX-CONNECT:$XDG_RUNTIME_DIR/break-reminder.sock
+
+Commands: start_session, stop_session, status, next_fire, respond, stats,
+history and subscribe. ``subscribe`` keeps the connection open and streams
+session, stats and history events as they happen.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from clockwatch import ClockWatch
+from eventbus import EventBus
+from idle import IdleMonitor
+from notifications import NotificationCenter, create_backend
+from scheduler import Scheduler
+
+# Most history entries one request can ask for
+MAX_HISTORY_LIMIT = 1000
+
+
+def default_socket_path() -> str:
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return str(Path(runtime_dir) / "break-reminder.sock")
+    return str(Path(tempfile.gettempdir()) / f"break-reminder-{os.getuid()}.sock")
+
+
+def history_limit(request: Dict) -> int:
+    """The ``limit`` of a history request, 20 by default and at most MAX_HISTORY_LIMIT"""
+    limit = request.get("limit", 20)
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+        raise ValueError(f"limit must be a positive integer, got {limit!r}")
+    return min(limit, MAX_HISTORY_LIMIT)
+
+
+class ReminderDaemon:
+    """Runs a ReminderSession on asyncio and serves the control API"""
+
+    def __init__(self, socket_path: str, notification_backend: str = None):
+        # Imported here so ``--send`` clients stay lightweight
+        from ver4 import (
+            ReminderConfig, ReminderHistory, ReminderSession, ReminderStats, open_store
+        )
+
+        self.socket_path = socket_path
+        self.config = ReminderConfig()
+        self.store = open_store(self.config.get("storage_backend", "json"))
+        self.stats = ReminderStats(self.store)
+        self.history = ReminderHistory(self.config.get("history_retention"), self.store)
+
+        self.scheduler = Scheduler()
+        backend = notification_backend or self.config.get("notification_backend", "auto")
+        self.notifier = NotificationCenter(create_backend(backend))
+        self.session = ReminderSession(
+            self.config, self.stats, self.history, self.scheduler, self.notifier
+        )
+        self.session.listeners.append(self.broadcast)
+        self.bus = EventBus.from_config(self.config.get("event_bus"), self.history, self.stats)
+        if self.bus is not None:
+            self.bus.attach(self.session)
+        self.idle = IdleMonitor.from_config(self.config, self.scheduler, self.session)
+        ClockWatch.from_config(self.config, self.scheduler, self.session)
+        self.subscribers = {}
+
+        self.commands = {
+            "start_session": self.cmd_start_session,
+            "stop_session": self.cmd_stop_session,
+            "status": self.cmd_status,
+            "next_fire": self.cmd_next_fire,
+            "respond": self.cmd_respond,
+            "stats": self.cmd_stats,
+            "history": self.cmd_history,
+        }
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        # Backend answers arrive on other threads; hand them to the loop
+        self.notifier.on_response = lambda: loop.call_soon_threadsafe(self.notifier.dispatch)
+
+        Path(self.socket_path).unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+
+        try:
+            async with server:
+                await self.scheduler.run_async()
+        finally:
+            self.session.stop()
+            self.notifier.shutdown()
+            self.config.flush()
+            if self.bus is not None:
+                self.bus.close()
+            self.history.close()
+            self.stats.close()
+            self.idle.close()
+            Path(self.socket_path).unlink(missing_ok=True)
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    name = request.get("cmd")
+                    if name == "subscribe":
+                        self.subscribers[writer] = set(request.get("topics") or ())
+                        response = {"ok": True, "subscribed": sorted(self.subscribers[writer])}
+                    elif name in self.commands:
+                        response = {"ok": True, "result": self.commands[name](request)}
+                    else:
+                        response = {"ok": False, "error": f"unknown command: {name}"}
+                except (ValueError, TypeError, AttributeError, KeyError) as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.subscribers.pop(writer, None)
+            writer.close()
+
+    def broadcast(self, event: str, payload):
+        message = json.dumps({"event": event, "data": payload}).encode() + b"\n"
+        for writer, topics in list(self.subscribers.items()):
+            if topics and event not in topics:
+                continue
+            if writer.is_closing():
+                self.subscribers.pop(writer, None)
+                continue
+            writer.write(message)
+
+    def cmd_start_session(self, request: Dict):
+        interval = request.get("interval")
+        if interval is not None and interval not in self.config.get("intervals", {}):
+            raise KeyError(f"unknown interval: {interval}")
+        self.session.start(interval)
+        return self.session.status()
+
+    def cmd_stop_session(self, request: Dict):
+        self.session.stop()
+        return self.session.status()
+
+    def cmd_status(self, request: Dict):
+        return self.session.status()
+
+    def cmd_next_fire(self, request: Dict):
+        status = self.session.status()
+        return {"next_fire_in": status["next_fire_in"], "next_fire_at": status["next_fire_at"]}
+
+    def cmd_respond(self, request: Dict):
+        return self.session.respond(request.get("action", "continue"))
+
+    def cmd_stats(self, request: Dict):
+        return self.stats.stats
+
+    def cmd_history(self, request: Dict):
+        return self.history.recent(history_limit(request))
+
+
+def send_command(socket_path: str, request: Dict, follow: bool = False):
+    """Minimal blocking client used by ``--send``"""
+    import socket
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("r") as stream:
+            for line in stream:
+                print(line.rstrip())
+                if not follow:
+                    break
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Break reminder daemon")
+    parser.add_argument("--socket", default=default_socket_path())
+    parser.add_argument("--backend", help="notification backend (auto, freedesktop, null)")
+    parser.add_argument("--send", metavar="CMD", help="send a command to a running daemon")
+    parser.add_argument("--interval", help="interval name for start_session")
+    parser.add_argument("--action", help="action for respond (continue or stop)")
+    parser.add_argument("--limit", type=int, help="number of entries for history")
+    parser.add_argument("--topics", nargs="*", help="event names for subscribe")
+    args = parser.parse_args(argv)
+
+    if args.send:
+        request = {"cmd": args.send}
+        for field in ("interval", "action", "limit", "topics"):
+            if getattr(args, field) is not None:
+                request[field] = getattr(args, field)
+        try:
+            send_command(args.socket, request, follow=args.send == "subscribe")
+        except (ConnectionError, FileNotFoundError):
+            print(f"No daemon listening on {args.socket}", file=sys.stderr)
+            return 1
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    daemon = ReminderDaemon(args.socket, args.backend)
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
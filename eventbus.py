@@ -0,0 +1,354 @@
+"""In-process event bus that writes session events off the reminder thread
+
+Without a bus the session writes history and stats itself, on whatever
+thread fired the reminder (the Tk loop in the GUI). With one attached
+(``event_bus`` in the config) it only publishes; every sink has its own
+worker thread and bounded queue and does the writing there:
+
+- ``HistorySink`` - history entries, one journal write per batch
+- ``StatsSink`` - session events into ReminderStats, one stats file write per batch
+- ``RotatingLogSink`` - session events as JSON lines, rotated by size
+- ``WebhookSink`` - session events POSTed as ``{"events": [...]}`` to a URL
+
+``publish`` never blocks. A sink collects events until it has
+``batch_size`` of them or the oldest has waited ``flush_interval``
+seconds, then writes them in one go. A sink that falls behind only grows
+its own queue; past ``max_pending`` the oldest events are dropped and
+counted, so a slow or unreachable webhook cannot hold up reminders or the
+other sinks. Sinks with ``retry`` set put a failed batch back and try
+again with exponential backoff.
+
+Published events look like::
+
+    {"event": "break_shown", "time": "2024-06-03T09:25:00", "data": {...}}
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+from metrics import METRICS
+
+# What ReminderSession emits, minus "stats" (a live copy of all the figures)
+SESSION_EVENTS = (
+    "session_start", "session_pause", "session_resume", "session_stop", "session_suspended",
+    "clock_jump", "break_shown", "break_deferred", "natural_break", "history"
+)
+
+MAX_BACKOFF = 60.0
+# How long close() still waits on a sink that missed the flush deadline
+CLOSE_GRACE = 1.0
+
+METRICS.describe("event_sink_write_seconds", "Time event bus sinks spend writing one batch")
+
+
+class Sink:
+    """Writes batches of published events; subclasses override ``write``"""
+
+    name = "sink"
+    topics: Optional[Sequence[str]] = None  # None: every event
+    batch_size = 100
+    flush_interval = 0.5
+    max_pending = 10000
+    retry = False
+
+    def accepts(self, event: str) -> bool:
+        return self.topics is None or event in self.topics
+
+    def write(self, batch: List[Dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HistorySink(Sink):
+    """Stores entries published as ``history_entry`` in a ReminderHistory"""
+
+    name = "history"
+    topics = ("history_entry",)
+    max_pending = 100000
+
+    def __init__(self, history):
+        self.history = history
+
+    def write(self, batch):
+        self.history.extend([item["data"] for item in batch])
+
+
+class StatsSink(Sink):
+    """Logs events published as ``stats_event`` to ReminderStats"""
+
+    name = "stats"
+    topics = ("stats_event",)
+    max_pending = 100000
+
+    def __init__(self, stats, on_applied: Optional[Callable[[List[str]], None]] = None):
+        self.stats = stats
+        # Called with the event types of each batch once they are in the stats
+        self.on_applied = on_applied
+
+    def write(self, batch):
+        with self.stats.batch():
+            for item in batch:
+                data = dict(item["data"])
+                self.stats.log(data.pop("type"), **data)
+        if self.on_applied is not None:
+            self.on_applied([item["data"]["type"] for item in batch])
+
+
+class RotatingLogSink(Sink):
+    """Appends events to a JSONL file, keeping ``backups`` rotated copies"""
+
+    name = "log"
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024, backups: int = 3,
+                 topics: Optional[Sequence[str]] = SESSION_EVENTS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.topics = topics
+        self._file = None
+
+    def write(self, batch):
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write("".join(json.dumps(item, default=str) + "\n" for item in batch))
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        """log -> log.1 -> log.2 ..., dropping the oldest"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.backups:
+            os.remove(self.path)
+            return
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class WebhookSink(Sink):
+    """POSTs batches of events as JSON; failed batches are retried"""
+
+    name = "webhook"
+    batch_size = 50
+    flush_interval = 1.0
+    max_pending = 1000
+    retry = True
+
+    def __init__(self, url: str, timeout: float = 5.0, headers: Optional[Dict[str, str]] = None,
+                 topics: Optional[Sequence[str]] = SESSION_EVENTS):
+        self.url = url
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.topics = topics
+
+    def write(self, batch):
+        import urllib.request  # only needed once a webhook is configured
+
+        body = json.dumps({"events": batch}, default=str).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers=dict(self.headers, **{"Content-Type": "application/json"})
+        )
+        # Anything but a 2xx raises, so the batch is retried
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SinkWorker:
+    """Feeds one sink from its own bounded queue on its own thread"""
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+        self.pending = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.failures = 0
+        self.batches = 0
+        self.backoff = 0.0
+
+        self._cond = threading.Condition()
+        self._busy = False
+        self._hurry = False  # a flush is waiting; don't hold partial batches back
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name=f"sink-{sink.name}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, item: Dict):
+        with self._cond:
+            if len(self.pending) >= self.sink.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append(item)
+            if len(self.pending) == 1 or len(self.pending) >= self.sink.batch_size:
+                self._cond.notify()
+
+    def flush(self, timeout: float) -> bool:
+        """Wait until everything queued so far is written; False on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._hurry = True
+            self._cond.notify_all()
+            try:
+                while self.pending or self._busy:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._hurry = False
+
+    def close(self, timeout: float):
+        self.flush(timeout)
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        try:
+            self.sink.close()
+        except Exception:
+            pass
+
+    def status(self) -> Dict:
+        return {
+            "sink": self.sink.name,
+            "pending": len(self.pending),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "batches": self.batches,
+        }
+
+    def _take_batch(self) -> Optional[List[Dict]]:
+        sink = self.sink
+        with self._cond:
+            while not self.pending:
+                if self._closing:
+                    return None
+                self._cond.wait()
+            # Give a partial batch until flush_interval to fill up
+            deadline = time.monotonic() + sink.flush_interval
+            while len(self.pending) < sink.batch_size and not (self._hurry or self._closing):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(len(self.pending), sink.batch_size)
+            self._busy = True
+            return [self.pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            try:
+                with METRICS.timer("event_sink_write_seconds", sink=self.sink.name):
+                    self.sink.write(batch)
+            except Exception:
+                self._failed(batch)
+            else:
+                self.delivered += len(batch)
+                self.batches += 1
+                self.backoff = 0.0
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def _failed(self, batch: List[Dict]):
+        self.failures += 1
+        with self._cond:
+            if self._closing:
+                # Shutting down: don't keep retrying what's left
+                self.dropped += len(batch) + len(self.pending)
+                self.pending.clear()
+                return
+            if not self.sink.retry:
+                self.dropped += len(batch)
+                return
+            # Back to the front of the queue, still within max_pending
+            room = max(0, self.sink.max_pending - len(self.pending))
+            kept = batch[-room:] if room else []
+            self.dropped += len(batch) - len(kept)
+            self.pending.extendleft(reversed(kept))
+            self.backoff = min(MAX_BACKOFF, self.backoff * 2 or 0.5)
+            self._cond.wait(self.backoff)
+
+
+class EventBus:
+    """Fans published events out to sink workers"""
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
+        self.clock = clock
+        self.workers: List[SinkWorker] = []
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict], history, stats,
+                    clock: Callable[[], datetime] = datetime.now) -> Optional["EventBus"]:
+        """Bus for the ``event_bus`` config value; None while it is disabled"""
+        settings = settings or {}
+        if not settings.get("enabled", False):
+            return None
+        bus = cls(clock)
+        bus.add_sink(HistorySink(history))
+        bus.add_sink(StatsSink(stats))
+        if settings.get("log_file"):
+            bus.add_sink(RotatingLogSink(
+                settings["log_file"], settings.get("log_max_bytes", 1024 * 1024),
+                settings.get("log_backups", 3)
+            ))
+        if settings.get("webhook_url"):
+            bus.add_sink(WebhookSink(settings["webhook_url"], settings.get("webhook_timeout", 5.0)))
+        return bus
+
+    def add_sink(self, sink: Sink) -> SinkWorker:
+        worker = SinkWorker(sink)
+        worker.start()
+        self.workers.append(worker)
+        return worker
+
+    def attach(self, session):
+        """Take over the session's history and stats writes and forward its events"""
+        session.bus = self
+        session.listeners.append(self.publish)
+        for worker in self.workers:
+            if isinstance(worker.sink, StatsSink):
+                worker.sink.on_applied = session.stats_applied
+
+    def publish(self, event: str, data=None):
+        item = None
+        for worker in self.workers:
+            if worker.sink.accepts(event):
+                if item is None:
+                    item = {"event": event, "time": self.clock().isoformat(), "data": data}
+                worker.put(item)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        return all([worker.flush(max(0.0, deadline - time.monotonic())) for worker in self.workers])
+
+    def close(self, timeout: float = 5.0):
+        """Write out what is queued, giving up on sinks still behind after ``timeout`` seconds"""
+        self.flush(timeout)
+        for worker in self.workers:
+            worker.close(CLOSE_GRACE)
+
+    def status(self) -> List[Dict]:
+        return [worker.status() for worker in self.workers]
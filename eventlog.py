@@ -0,0 +1,354 @@
+"""Event-sourced session log
+
+Every session change is appended to a JSONL log as one event:
+
+    {"seq": 12, "type": "break_accepted", "time": "2024-05-06T14:25:00"}
+
+Event types are session_start, break_shown, break_accepted, break_skipped,
+break_natural (the user was away), suspended (the machine slept),
+clock_jump (the wall clock was set) and session_stop, plus one
+``imported`` event carrying the totals of a stats file written before the
+log existed. Stats and rollups are a
+projection of the log: ``SessionProjection.apply`` folds one event in, so
+everything can be rebuilt from scratch with ``SessionEventLog.rebuild``.
+
+To keep startup cost flat the projection is snapshotted every few hundred
+events together with the byte offset it covers; loading reads the
+snapshot and replays only the events after that offset. Once the log
+passes ``rotate_bytes`` it is moved aside at the end of a session, to
+``reminder_events.1.jsonl``, then ``.2`` and so on, and a new log is
+started. The snapshot records how many segments it covers; a rebuild
+replays the archived segments in order before the current log, so no
+event is ever thrown away.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from rollups import StatsRollups
+from storage import atomic_write_json
+
+# Log size in bytes after which it is archived between sessions
+ROTATE_BYTES = 4 * 1024 * 1024
+
+EVENT_TYPES = (
+    "imported", "session_start", "break_shown", "break_accepted", "break_skipped",
+    "break_natural", "suspended", "clock_jump", "session_stop"
+)
+
+
+def empty_stats() -> Dict:
+    return {
+        "total_sessions": 0,
+        "completed_sessions": 0,
+        "total_breaks": 0,
+        "breaks_shown": 0,
+        "breaks_skipped": 0,
+        "natural_breaks": 0,
+        "idle_time": 0,  # seconds away during sessions
+        "suspended_time": 0,  # seconds the machine slept during sessions
+        "total_work_time": 0,  # in seconds
+        "longest_session": 0,
+        "average_session": 0,
+        "last_session": None
+    }
+
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class SessionProjection:
+    """Stats and rollups folded from session events
+
+    ``total_sessions`` counts sessions started and ``total_breaks`` counts
+    accepted breaks. Session length runs from session_start to
+    session_stop minus time away (break_natural) and asleep (suspended),
+    with wall-clock corrections (clock_jump) taken out; a session left
+    open by a crash is closed at its last event when the next one starts. Rollups
+    record, for each accepted or natural break, the stretch of work since
+    the session started or the previous break ended.
+    """
+
+    def __init__(self):
+        self.stats = empty_stats()
+        self.rollups = StatsRollups()
+        self.seq = 0
+        self.session_start: Optional[datetime] = None
+        self.segment_start: Optional[datetime] = None
+        self.session_idle = 0.0
+        self.last_time: Optional[datetime] = None
+
+    def apply(self, event: Dict):
+        when = datetime.fromisoformat(event["time"])
+        handler = getattr(self, "on_" + event["type"], None)
+        if handler is not None:
+            handler(when, event)
+        self.seq = event.get("seq", self.seq + 1)
+        self.last_time = when
+
+    def on_imported(self, when: datetime, event: Dict):
+        legacy = dict(event.get("stats") or {})
+        # Older files counted every break as a session
+        legacy.setdefault("completed_sessions", legacy.get("total_sessions", 0))
+        self.stats.update(legacy)
+        if event.get("rollups"):
+            self.rollups = StatsRollups.from_dict(event["rollups"])
+
+    def on_session_start(self, when: datetime, event: Dict):
+        if self.session_start is not None:
+            self._close_session(self.last_time)
+        self.session_start = self.segment_start = when
+        self.session_idle = 0.0
+        self.stats["total_sessions"] += 1
+
+    def on_break_shown(self, when: datetime, event: Dict):
+        self.stats["breaks_shown"] += 1
+
+    def on_break_accepted(self, when: datetime, event: Dict):
+        self.stats["total_breaks"] += 1
+        self.stats["last_session"] = when.isoformat()
+        if self.segment_start is not None:
+            self.rollups.record(when, (when - self.segment_start).total_seconds())
+        self.segment_start = when
+
+    def on_break_skipped(self, when: datetime, event: Dict):
+        self.stats["breaks_skipped"] += 1
+
+    def on_break_natural(self, when: datetime, event: Dict):
+        started = _parse(event.get("started")) or when
+        duration = event.get("duration", 0)
+        self.stats["natural_breaks"] = self.stats.get("natural_breaks", 0) + 1
+        self.stats["idle_time"] = self.stats.get("idle_time", 0) + duration
+        if self.session_start is None:
+            return
+        self.session_idle += duration
+        if self.segment_start is not None and started > self.segment_start:
+            self.rollups.record(started, (started - self.segment_start).total_seconds())
+        self.segment_start = when
+
+    def on_suspended(self, when: datetime, event: Dict):
+        duration = event.get("duration", 0)
+        self.stats["suspended_time"] = self.stats.get("suspended_time", 0) + duration
+        if self.session_start is None:
+            return
+        self.session_idle += duration
+        started = _parse(event.get("started")) or when
+        if self.segment_start is not None and started > self.segment_start:
+            self.rollups.record(started, (started - self.segment_start).total_seconds())
+        self.segment_start = when
+
+    def on_clock_jump(self, when: datetime, event: Dict):
+        # Move the open session along with the clock so the jump is not work time
+        offset = timedelta(seconds=event.get("offset", 0))
+        if self.session_start is not None:
+            self.session_start += offset
+        if self.segment_start is not None:
+            self.segment_start += offset
+
+    def on_session_stop(self, when: datetime, event: Dict):
+        self._close_session(when)
+
+    def _close_session(self, end: datetime):
+        if self.session_start is None:
+            return
+        duration = max(0.0, (end - self.session_start).total_seconds() - self.session_idle)
+        stats = self.stats
+        stats["completed_sessions"] += 1
+        stats["total_work_time"] += duration
+        if duration > stats.get("longest_session", 0):
+            stats["longest_session"] = duration
+        stats["average_session"] = stats["total_work_time"] / stats["completed_sessions"]
+        stats["last_session"] = end.isoformat()
+        self.session_start = self.segment_start = None
+        self.session_idle = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "stats": self.stats,
+            "rollups": self.rollups.to_dict(),
+            "seq": self.seq,
+            "session_start": _format(self.session_start),
+            "segment_start": _format(self.segment_start),
+            "session_idle": self.session_idle,
+            "last_time": _format(self.last_time),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SessionProjection":
+        projection = cls()
+        projection.stats.update(data.get("stats") or {})
+        projection.rollups = StatsRollups.from_dict(data.get("rollups"))
+        projection.seq = data.get("seq", 0)
+        projection.session_start = _parse(data.get("session_start"))
+        projection.segment_start = _parse(data.get("segment_start"))
+        projection.session_idle = data.get("session_idle", 0.0)
+        projection.last_time = _parse(data.get("last_time"))
+        return projection
+
+
+class SessionEventLog:
+    """Append-only session event log with periodic projection snapshots"""
+
+    def __init__(self, path: str, snapshot_path: str, snapshot_every: int = 200,
+                 keep_open: bool = True, clock: Callable[[], datetime] = datetime.now,
+                 rotate_bytes: int = ROTATE_BYTES):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.rotate_bytes = rotate_bytes
+        # Processes holding many logs close them between appends to save fds
+        self.keep_open = keep_open
+        self.clock = clock
+
+        self.projection = SessionProjection()
+        self.offset = 0  # bytes of the log folded into the projection
+        self.segments = 0  # archived segments folded in before the log
+        self._since_snapshot = 0
+        self._file = None
+
+    def load(self) -> SessionProjection:
+        """Restore the last snapshot and replay the events written after it"""
+        snapshot = self._read_snapshot()
+        size = Path(self.path).stat().st_size if Path(self.path).exists() else 0
+        if (snapshot is None or snapshot.get("offset", 0) > size
+                or snapshot.get("segments", 0) != self._count_segments()):
+            # Missing snapshot, or a log rotated or replaced underneath it
+            return self.rebuild()
+
+        self.projection = SessionProjection.from_dict(snapshot["state"])
+        self.offset = snapshot["offset"]
+        self.segments = snapshot.get("segments", 0)
+        self._since_snapshot = self._replay()
+        return self.projection
+
+    def rebuild(self) -> SessionProjection:
+        """Recompute the projection from the archived segments and the whole log"""
+        self.projection = SessionProjection()
+        self.segments = self._count_segments()
+        for number in range(1, self.segments + 1):
+            with open(self.segment_path(number), 'rb') as f:
+                self._apply_lines(f)
+        self.offset = 0
+        self._replay()
+        self.snapshot()
+        return self.projection
+
+    def append(self, event_type: str, **data) -> Dict:
+        event = {"seq": self.projection.seq + 1, "type": event_type,
+                 "time": self.clock().isoformat()}
+        event.update(data)
+        line = (json.dumps(event) + "\n").encode()
+
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        self._file.write(line)
+        self._file.flush()
+        if not self.keep_open:
+            self._file.close()
+            self._file = None
+
+        self.offset += len(line)
+        self.projection.apply(event)
+        self._since_snapshot += 1
+        if self.rotate_bytes and self.offset >= self.rotate_bytes and self.rotate():
+            return event
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+        return event
+
+    def segment_path(self, number: int) -> str:
+        """``reminder_events.3.jsonl`` for segment 3 of ``reminder_events.jsonl``"""
+        log = Path(self.path)
+        return str(log.with_name(f"{log.stem}.{number}{log.suffix}"))
+
+    def rotate(self) -> bool:
+        """Archive the log as the next numbered segment and start a new one
+
+        Only done between sessions, so a session never spans two segments;
+        returns False while a session is open or if the rename fails.
+        """
+        if self.projection.session_start is not None:
+            return False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.replace(self.path, self.segment_path(self.segments + 1))
+        except OSError:
+            return False
+        # A crash before the snapshot below leaves it one segment behind,
+        # and load() rebuilds
+        self.segments += 1
+        self.offset = 0
+        self.snapshot()
+        return True
+
+    def snapshot(self):
+        try:
+            atomic_write_json(self.snapshot_path, {
+                "offset": self.offset,
+                "segments": self.segments,
+                "state": self.projection.to_dict()
+            }, indent=None)
+            self._since_snapshot = 0
+        except Exception:
+            pass
+
+    def close(self):
+        if self._since_snapshot:
+            self.snapshot()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _replay(self) -> int:
+        """Apply events from ``offset`` to the end of the log; returns how many"""
+        if not Path(self.path).exists():
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            consumed, applied = self._apply_lines(f)
+        self.offset += consumed
+
+        # Drop a torn final line so the next append starts on a clean line
+        if os.path.getsize(self.path) > self.offset:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.offset)
+        return applied
+
+    def _apply_lines(self, f: BinaryIO) -> Tuple[int, int]:
+        """Apply the complete lines left in ``f``; returns (bytes, events) read"""
+        consumed = applied = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # interrupted write at the end of the log
+            consumed += len(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            self.projection.apply(event)
+            applied += 1
+        return consumed, applied
+
+    def _count_segments(self) -> int:
+        count = 0
+        while Path(self.segment_path(count + 1)).exists():
+            count += 1
+        return count
+
+    def _read_snapshot(self) -> Optional[Dict]:
+        try:
+            if Path(self.snapshot_path).exists():
+                with open(self.snapshot_path, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return None
@@ -0,0 +1,298 @@
+"""Org-level reports from many users' stats and history files
+
+    python fleet.py /srv/reminder-data                  # JSON report on stdout
+    python fleet.py /srv/reminder-data --workers 8 --output fleet.json
+
+Every directory under the root that holds a ``reminder_stats.json`` or a
+``reminder_history.json`` (plus its ``reminder_history.jsonl`` journal, if
+collected) counts as one user. Directories are split into chunks and
+summarised in a process pool; each worker folds its chunk into one
+``FleetReport`` and only that small partial goes back to be merged.
+
+History snapshots are read a chunk at a time (``iter_json_batches``), so a
+worker's memory does not grow with the size of a file. Stats files keep the
+meaning they have in ``ReminderStats``: counters add up, ``longest_session``
+and ``last_session`` take the maximum, ``average_session`` is recomputed
+as work time per completed session, and the session length sketches from
+the rollups merge into one distribution for the whole org.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from eventlog import empty_stats
+from rollups import QuantileSketch
+from storage import COMPACTING_SUFFIX, is_new_entry, iter_journal
+
+STATS_FILE = "reminder_stats.json"
+HISTORY_FILE = "reminder_history.json"
+HISTORY_JOURNAL_FILE = "reminder_history.jsonl"
+
+# Stats fields that add up across users
+SUMMED_FIELDS = (
+    "total_sessions", "completed_sessions", "total_breaks", "breaks_shown", "breaks_skipped",
+    "natural_breaks", "idle_time", "suspended_time", "total_work_time"
+)
+# History actions that mean a reminder was not taken
+SKIP_ACTIONS = ("stop", "dismissed", "missed")
+
+CHUNK_SIZE = 1 << 18
+# Directories per worker task; enough to amortise the round trip
+TASKS_PER_WORKER = 4
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def iter_json_batches(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[List]:
+    """Items of a top-level JSON array of objects, a chunk's worth at a time
+
+    Only about one chunk of the file is in memory at once. The text up to
+    the last ``}`` of a chunk usually ends on an item boundary, so it is
+    decoded in a single call; when it doesn't (the brace was inside a string
+    or a nested object) items are decoded one by one until the next read.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path}: not a JSON array")
+        pos = 1
+        whole = True  # try decoding the rest of the buffer in one go
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            if whole:
+                whole = False
+                cut = buffer.rfind("}", pos) + 1
+                if cut:
+                    try:
+                        items = json.loads("[" + buffer[pos:cut] + "]")
+                    except ValueError:
+                        pass
+                    else:
+                        pos = cut
+                        yield items
+                        continue
+            try:
+                if pos == len(buffer):
+                    raise ValueError("need more data")
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"{path}: truncated or malformed JSON array")
+                buffer, pos, whole = buffer[pos:] + chunk, 0, True
+                continue
+            yield [item]
+
+
+def iter_history(directory: str) -> Iterator[List[Dict]]:
+    """Batches of one user's history: the snapshot, then journal lines it doesn't hold
+
+    Journal lines are told apart from the snapshot the way
+    ``HistoryJournal.load`` does it (``is_new_entry``).
+    """
+    last = None
+    snapshot = os.path.join(directory, HISTORY_FILE)
+    if os.path.exists(snapshot):
+        for batch in iter_json_batches(snapshot):
+            if batch:
+                last = batch[-1]
+                yield batch
+    journal = os.path.join(directory, HISTORY_JOURNAL_FILE)
+    for path in (journal + COMPACTING_SUFFIX, journal):
+        batch = [entry for entry in iter_journal(path) if is_new_entry(last, entry)]
+        if batch:
+            yield batch
+
+
+class FleetReport:
+    """Mergeable totals and distributions over any number of users"""
+
+    def __init__(self):
+        self.users = 0
+        self.totals = {field: 0 for field in SUMMED_FIELDS}
+        self.longest_session = 0
+        self.last_session: Optional[str] = None
+        self.actions: Dict[str, int] = {}
+        self.history_entries = 0
+        self.first_entry: Optional[str] = None
+        self.last_entry: Optional[str] = None
+        self.session_lengths = QuantileSketch()
+        self.work_time = QuantileSketch()  # per user
+        self.skip_rates = QuantileSketch()  # per user with answered reminders
+        self.errors: List[Dict] = []
+
+    def add_user(self, directory: str):
+        """Fold in one user's files; unreadable ones are listed in ``errors``"""
+        stats = None
+        path = os.path.join(directory, STATS_FILE)
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    stats = json.load(f)
+            except (OSError, ValueError) as e:
+                self.errors.append({"path": path, "error": str(e)})
+
+        actions = Counter()
+        first = last = None
+        try:
+            for batch in iter_history(directory):
+                actions.update([entry.get("action", "continue") for entry in batch])
+                # Mostly oldest first, but the wall clock can go back (DST)
+                stamps = [entry["timestamp"] for entry in batch if entry.get("timestamp")]
+                if stamps:
+                    first = min(stamps) if first is None else min(first, min(stamps))
+                    last = max(stamps) if last is None else max(last, max(stamps))
+        except (OSError, ValueError) as e:
+            self.errors.append({"path": os.path.join(directory, HISTORY_FILE), "error": str(e)})
+
+        if stats is None and not actions:
+            return
+        self.users += 1
+        if stats is not None:
+            self.add_stats(stats)
+        if first is not None and (self.first_entry is None or first < self.first_entry):
+            self.first_entry = first
+        if last is not None and (self.last_entry is None or last > self.last_entry):
+            self.last_entry = last
+        for action, count in actions.items():
+            self.actions[action] = self.actions.get(action, 0) + count
+            self.history_entries += count
+
+        skipped = sum(actions.get(action, 0) for action in SKIP_ACTIONS)
+        answered = skipped + actions.get("continue", 0)
+        if answered:
+            self.skip_rates.add(skipped / answered)
+
+    def add_stats(self, stats: Dict):
+        # Files from older versions lack some fields; they count as zero
+        stats = dict(empty_stats(), **stats)
+        if not stats["completed_sessions"] and stats["total_work_time"]:
+            stats["completed_sessions"] = stats["total_sessions"]
+        for field in SUMMED_FIELDS:
+            self.totals[field] += stats[field] or 0
+        self.longest_session = max(self.longest_session, stats["longest_session"] or 0)
+        if stats["last_session"] and (self.last_session is None
+                                      or stats["last_session"] > self.last_session):
+            self.last_session = stats["last_session"]
+        self.work_time.add(stats["total_work_time"] or 0)
+
+        sketch = (stats.get("rollups") or {}).get("sketch")
+        if sketch:
+            try:
+                self.session_lengths.merge(QuantileSketch.from_dict(sketch))
+            except ValueError:
+                pass  # written with a different accuracy; leave it out
+
+    def merge(self, other: "FleetReport"):
+        self.users += other.users
+        for field in SUMMED_FIELDS:
+            self.totals[field] += other.totals[field]
+        self.longest_session = max(self.longest_session, other.longest_session)
+        self.last_session = max(filter(None, (self.last_session, other.last_session)), default=None)
+        for action, count in other.actions.items():
+            self.actions[action] = self.actions.get(action, 0) + count
+        self.history_entries += other.history_entries
+        self.first_entry = min(filter(None, (self.first_entry, other.first_entry)), default=None)
+        self.last_entry = max(filter(None, (self.last_entry, other.last_entry)), default=None)
+        self.session_lengths.merge(other.session_lengths)
+        self.work_time.merge(other.work_time)
+        self.skip_rates.merge(other.skip_rates)
+        self.errors.extend(other.errors)
+
+    def report(self) -> Dict:
+        totals = self.totals
+        skipped = sum(self.actions.get(action, 0) for action in SKIP_ACTIONS)
+        answered = skipped + self.actions.get("continue", 0)
+        return {
+            "users": self.users,
+            "stats": dict(
+                totals,
+                longest_session=self.longest_session,
+                average_session=(totals["total_work_time"] / totals["completed_sessions"]
+                                 if totals["completed_sessions"] else 0),
+                last_session=self.last_session,
+                skip_rate=(totals["breaks_skipped"] / totals["breaks_shown"]
+                           if totals["breaks_shown"] else None),
+            ),
+            "history": {
+                "entries": self.history_entries,
+                "first": self.first_entry,
+                "last": self.last_entry,
+                "actions": dict(sorted(self.actions.items())),
+                "skip_rate": skipped / answered if answered else None,
+            },
+            "session_length": self.distribution(self.session_lengths),
+            "work_time_per_user": self.distribution(self.work_time),
+            "skip_rate_per_user": self.distribution(self.skip_rates),
+            "errors": self.errors,
+        }
+
+    @staticmethod
+    def distribution(sketch: QuantileSketch) -> Dict:
+        return dict(
+            sketch.quantiles((0.1, 0.25, 0.5, 0.75, 0.9, 0.99)),
+            count=sketch.count, mean=sketch.mean, min=sketch.min, max=sketch.max
+        )
+
+
+def find_user_dirs(root: str) -> List[str]:
+    """Directories under ``root`` holding a stats or history file, sorted"""
+    found = []
+    for directory, _, files in os.walk(root):
+        if STATS_FILE in files or HISTORY_FILE in files or HISTORY_JOURNAL_FILE in files:
+            found.append(directory)
+    return sorted(found)
+
+
+def summarize(directories: Sequence[str]) -> FleetReport:
+    """Worker task: one partial report for a chunk of user directories"""
+    report = FleetReport()
+    for directory in directories:
+        report.add_user(directory)
+    return report
+
+
+def aggregate(root: str, workers: Optional[int] = None) -> FleetReport:
+    """Report over every user under ``root``; ``workers=0`` runs in this process"""
+    directories = find_user_dirs(root)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(directories) < 2:
+        return summarize(directories)
+
+    tasks = max(1, min(len(directories), workers * TASKS_PER_WORKER))
+    chunks = [directories[i::tasks] for i in range(tasks)]
+    report = FleetReport()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(summarize, chunks):
+            report.merge(partial)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combine many users' reminder stats and history")
+    parser.add_argument("root", help="directory tree with reminder_stats.json / reminder_history.json")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    if not Path(args.root).is_dir():
+        parser.error(f"{args.root} is not a directory")
+    text = json.dumps(aggregate(args.root, args.workers).report(), indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
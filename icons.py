@@ -0,0 +1,127 @@
+import math
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+ICON_FILE = str(Path(__file__).resolve().parent / "deadline_schedule_time_alarm_clock_icon_256761.ico")
+
+RING_COLOR = (31, 83, 141, 255)
+RING_TRACK_COLOR = (255, 255, 255, 90)
+
+
+class IconCache:
+    """Loads the application icon once and pre-renders countdown frames
+
+    Frame ``i`` shows a ring around the clock with ``(frames - i) / frames``
+    of the interval remaining, so swapping frames in and out of the tray
+    costs nothing beyond handing over an already rendered image.
+    """
+
+    def __init__(self, path: str = ICON_FILE, size: int = 64, frames: int = 12):
+        self.path = path
+        self.size = size
+        self.frame_count = frames
+        self._sizes: Dict[int, "Image.Image"] = {}
+        self._frames: Optional[List["Image.Image"]] = None
+
+    def base(self, size: int = None) -> "Image.Image":
+        size = size or self.size
+        image = self._sizes.get(size)
+        if image is None:
+            image = self._load(size)
+            self._sizes[size] = image
+        return image
+
+    def frames(self) -> List["Image.Image"]:
+        if self._frames is None:
+            self._frames = [self._render(i) for i in range(self.frame_count)]
+        return self._frames
+
+    def frame_index(self, remaining_fraction: float) -> int:
+        remaining_fraction = min(1.0, max(0.0, remaining_fraction))
+        index = self.frame_count - math.ceil(remaining_fraction * self.frame_count)
+        return min(self.frame_count - 1, max(0, index))
+
+    def frame_for(self, remaining_fraction: float) -> Tuple[int, "Image.Image"]:
+        index = self.frame_index(remaining_fraction)
+        return index, self.frames()[index]
+
+    def _load(self, size: int) -> "Image.Image":
+        from PIL import Image, ImageDraw
+
+        try:
+            with Image.open(self.path) as icon:
+                # Pick the smallest embedded image that is at least as large
+                sizes = sorted(icon.ico.sizes())
+                best = next((s for s in sizes if s[0] >= size), sizes[-1])
+                image = icon.ico.getimage(best).convert("RGBA")
+            if image.size != (size, size):
+                image = image.resize((size, size), Image.LANCZOS)
+            return image
+        except Exception:
+            # Same look as the original generated icon
+            image = Image.new('RGBA', (size, size), RING_COLOR)
+            dc = ImageDraw.Draw(image)
+            inset = size * 10 // 64
+            dc.ellipse((inset, inset, size - inset, size - inset), fill=(255, 255, 255, 255))
+            return image
+
+    def _render(self, index: int) -> "Image.Image":
+        from PIL import ImageDraw
+
+        image = self.base().copy()
+        dc = ImageDraw.Draw(image)
+        width = max(2, self.size // 10)
+        box = (width // 2, width // 2, self.size - 1 - width // 2, self.size - 1 - width // 2)
+        dc.ellipse(box, outline=RING_TRACK_COLOR, width=width)
+
+        remaining = (self.frame_count - index) / self.frame_count
+        # Clockwise from 12 o'clock
+        dc.arc(box, start=-90, end=-90 + 360 * remaining, fill=RING_COLOR, width=width)
+        return image
+
+
+class CountdownUpdater:
+    """Shows the time left in the session on a pystray icon
+
+    Runs as a scheduler job that ticks once per frame, so an interval costs
+    ``frame_count`` icon swaps no matter how long it is.
+    """
+
+    def __init__(self, cache: IconCache, scheduler, session, key="tray_countdown"):
+        self.cache = cache
+        self.scheduler = scheduler
+        self.session = session
+        self.key = key
+        self.icon = None
+        self._index = None
+
+    def start(self):
+        interval = self.session.interval_seconds
+        if not interval:
+            return
+        self._index = None
+        # A frame shown a little early or late is fine; let it share a wakeup
+        self.scheduler.every(interval / self.cache.frame_count, self.update, key=self.key, first=0,
+                             slack=self.scheduler.slack)
+
+    def stop(self):
+        self.scheduler.cancel(self.key)
+        self._index = None
+        if self.icon is not None:
+            self.icon.icon = self.cache.base()
+            self.icon.title = "Advanced Break Reminder"
+
+    def update(self):
+        remaining = self.session.seconds_until_next()
+        if self.icon is None or remaining is None:
+            return
+        index, frame = self.cache.frame_for(remaining / self.session.interval_seconds)
+        if index == self._index:
+            return
+        self._index = index
+        self.icon.icon = frame
+        minutes = math.ceil(remaining / 60)
+        self.icon.title = f"Advanced Break Reminder - next break in {minutes} min"
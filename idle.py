@@ -0,0 +1,348 @@
+"""Idle detection for work sessions
+
+An ActivitySource reports how long the user has been idle (no keyboard or
+mouse input). IdleMonitor samples it on the session's scheduler: once the
+user has been idle for ``idle_minutes`` the session is paused, and when
+input resumes the time away is logged as a natural break and the interval
+is restarted (or resumed where it was).
+
+Sources: X11 (XScreenSaver extension via ctypes), GNOME on Wayland
+(Mutter's IdleMonitor over D-Bus via ``gdbus``), Windows
+(GetLastInputInfo) and FakeActivitySource for tests.
+
+Sampling is adaptive. While the user is active the next sample is taken
+only when the idle threshold could first be reached; while away the
+monitor polls every ``away_interval`` seconds, backing off to
+``max_away_interval`` the longer the user stays away.
+"""
+import ctypes
+import ctypes.util
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+
+class ActivitySource:
+    """Reports seconds since the last user input, or None if unknown"""
+
+    name = "base"
+
+    @staticmethod
+    def available() -> bool:
+        return False
+
+    def idle_seconds(self) -> Optional[float]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ("window", ctypes.c_ulong),
+        ("state", ctypes.c_int),
+        ("kind", ctypes.c_int),
+        ("til_or_since", ctypes.c_ulong),
+        ("idle", ctypes.c_ulong),
+        ("event_mask", ctypes.c_ulong),
+    ]
+
+
+class X11ActivitySource(ActivitySource):
+    """Idle time from the X server's screen saver extension"""
+
+    name = "x11"
+
+    def __init__(self):
+        xlib = ctypes.CDLL(ctypes.util.find_library("X11"))
+        xss = ctypes.CDLL(ctypes.util.find_library("Xss"))
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(_XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [
+            ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(_XScreenSaverInfo)
+        ]
+        xss.XScreenSaverQueryInfo.restype = ctypes.c_int
+
+        self.xlib = xlib
+        self.xss = xss
+        self.display = xlib.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError("cannot open X display")
+        self.root = xlib.XDefaultRootWindow(self.display)
+        self.info = xss.XScreenSaverAllocInfo()
+
+    @staticmethod
+    def available() -> bool:
+        return (bool(os.environ.get("DISPLAY"))
+                and ctypes.util.find_library("X11") is not None
+                and ctypes.util.find_library("Xss") is not None)
+
+    def idle_seconds(self):
+        if not self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info):
+            return None
+        return self.info.contents.idle / 1000.0
+
+    def close(self):
+        if self.display:
+            self.xlib.XFree(self.info)
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+class MutterActivitySource(ActivitySource):
+    """Idle time from GNOME's Mutter IdleMonitor (works on Wayland)"""
+
+    name = "mutter"
+    COMMAND = [
+        "gdbus", "call", "--session",
+        "--dest", "org.gnome.Mutter.IdleMonitor",
+        "--object-path", "/org/gnome/Mutter/IdleMonitor/Core",
+        "--method", "org.gnome.Mutter.IdleMonitor.GetIdletime",
+    ]
+
+    @staticmethod
+    def available() -> bool:
+        return (sys.platform.startswith("linux")
+                and "GNOME" in os.environ.get("XDG_CURRENT_DESKTOP", "").upper()
+                and shutil.which("gdbus") is not None)
+
+    def idle_seconds(self):
+        try:
+            output = subprocess.run(
+                self.COMMAND, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, timeout=2
+            ).stdout
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        # Reply looks like "(uint64 12345,)"
+        match = re.search(r"(\d+)", output)
+        return int(match.group(1)) / 1000.0 if match else None
+
+
+class _LastInputInfo(ctypes.Structure):
+    _fields_ = [("size", ctypes.c_uint), ("time", ctypes.c_uint)]
+
+
+class WindowsActivitySource(ActivitySource):
+    """Idle time from GetLastInputInfo"""
+
+    name = "windows"
+
+    def __init__(self):
+        self.info = _LastInputInfo()
+        self.info.size = ctypes.sizeof(_LastInputInfo)
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform == "win32"
+
+    def idle_seconds(self):
+        if not ctypes.windll.user32.GetLastInputInfo(ctypes.byref(self.info)):
+            return None
+        # Both values are 32-bit millisecond tick counts and wrap after 49 days
+        elapsed = (ctypes.windll.kernel32.GetTickCount() - self.info.time) & 0xFFFFFFFF
+        return elapsed / 1000.0
+
+
+class FakeActivitySource(ActivitySource):
+    """Idle time driven by the test: call ``touch()`` to simulate input"""
+
+    name = "fake"
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.last_input = clock()
+        self.queries = 0
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def touch(self):
+        self.last_input = self.clock()
+
+    def idle_seconds(self):
+        self.queries += 1
+        return max(0.0, self.clock() - self.last_input)
+
+
+class NullActivitySource(ActivitySource):
+    """No idle information; the monitor stays out of the way"""
+
+    name = "null"
+
+    def idle_seconds(self):
+        return None
+
+
+def create_activity_source(name: str = "auto") -> ActivitySource:
+    """Source factory for the ``idle_detection.source`` config value"""
+    sources = {
+        "windows": WindowsActivitySource,
+        "mutter": MutterActivitySource,
+        "x11": X11ActivitySource,
+        "fake": FakeActivitySource,
+    }
+    if name == "auto":
+        # Under Wayland the X server only sees XWayland clients
+        order = ["windows", "mutter", "x11"]
+        if not os.environ.get("WAYLAND_DISPLAY"):
+            order = ["windows", "x11", "mutter"]
+    else:
+        order = [name]
+
+    for candidate in order:
+        source = sources.get(candidate)
+        if source is not None and source.available():
+            try:
+                return source()
+            except (OSError, RuntimeError, AttributeError):
+                continue
+    return NullActivitySource()
+
+
+class IdleMonitor:
+    """Pauses a ReminderSession while the user is away
+
+    ``on_return`` is "reset" (start a fresh interval, the time away was a
+    break) or "resume" (carry on where the interval was paused). A session
+    the user paused by hand is left alone. The session starts and stops
+    the monitor itself (see ``ReminderSession.idle_monitor``).
+    """
+
+    def __init__(self, source: ActivitySource, scheduler, session,
+                 idle_minutes: float = 5, on_return: str = "reset",
+                 away_interval: float = 15.0, max_away_interval: float = 60.0,
+                 min_interval: float = 5.0, max_interval: float = 300.0,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.source = source
+        self.scheduler = scheduler
+        self.session = session
+        self.enabled = True
+        self.idle_after = idle_minutes * 60
+        self.on_return = on_return
+        self.away_interval = away_interval
+        self.max_away_interval = max_away_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.clock = clock  # wall clock for the break times logged
+        self.key = (session.key, "idle")
+        self.config = None
+
+        self.away_since: Optional[datetime] = None
+        self.not_before: Optional[datetime] = None  # last resume from suspend
+        self.paused_session = False
+        self.samples = 0
+        self._last_idle = 0.0
+        session.idle_monitor = self
+
+    @classmethod
+    def from_config(cls, config, scheduler, session) -> "IdleMonitor":
+        """Monitor that re-reads ``idle_detection`` from a ReminderConfig at every session start"""
+        settings = config.get("idle_detection") or {}
+        monitor = cls(create_activity_source(settings.get("source", "auto")), scheduler, session,
+                      clock=session.clock)
+        monitor.config = config
+        return monitor
+
+    def configure(self, settings: Dict):
+        self.enabled = settings.get("enabled", True)
+        self.idle_after = settings.get("idle_minutes", 5) * 60
+        self.on_return = settings.get("on_return", "reset")
+
+    @property
+    def away(self) -> bool:
+        return self.away_since is not None
+
+    def start(self):
+        if self.config is not None:
+            self.configure(self.config.get("idle_detection") or {})
+        self.away_since = None
+        self.not_before = None
+        self.paused_session = False
+        self._last_idle = 0.0
+        if self.enabled and self.source.name != "null":
+            self.scheduler.call_later(0, self.sample, key=self.key)
+
+    def stop(self):
+        self.scheduler.cancel(self.key)
+        if self.away:
+            # Session ended while away; the time so far still was a break
+            self.finish_break(0.0)
+        self.away_since = None
+        self.paused_session = False
+
+    def close(self):
+        self.scheduler.cancel(self.key)
+        self.source.close()
+
+    def sample(self):
+        self.samples += 1
+        idle = self.source.idle_seconds()
+        if idle is None:
+            # Source stopped answering (screen locked, bus gone); check back later
+            delay = self.max_interval
+        elif not self.away:
+            if idle >= self.idle_after:
+                self.went_away(idle)
+                delay = self.away_interval
+            else:
+                # Nothing can change before the threshold could be reached
+                delay = min(self.max_interval, max(self.min_interval, self.idle_after - idle))
+        elif idle < self._last_idle:
+            self.came_back(idle)
+            delay = min(self.max_interval, max(self.min_interval, self.idle_after - idle))
+        else:
+            # The longer the user has been gone, the less a late notice matters
+            delay = min(self.max_away_interval, max(self.away_interval, idle / 10))
+
+        if idle is not None:
+            self._last_idle = idle
+        if self.session.running:
+            self.scheduler.call_later(delay, self.sample, key=self.key, slack=self.scheduler.slack)
+
+    def resumed(self, suspended_at: datetime):
+        """The machine slept from ``suspended_at`` until now
+
+        That time is logged as a suspend, so it must not count as being away
+        too: a break in progress ends where the suspend began, and idle time
+        reported after resume starts no earlier than now.
+        """
+        if self.away:
+            self.finish_break((self.clock() - suspended_at).total_seconds())
+            if self.paused_session and self.session.running and self.session.paused:
+                self.session.resume(reset=True)
+            self.paused_session = False
+        self.not_before = self.clock()
+        self._last_idle = 0.0
+
+    def went_away(self, idle: float):
+        self.away_since = self.clock() - timedelta(seconds=idle)
+        if self.not_before is not None and self.away_since < self.not_before:
+            self.away_since = self.not_before
+        if self.session.running and not self.session.paused:
+            self.session.pause()
+            self.paused_session = True
+
+    def came_back(self, idle: float):
+        self.finish_break(idle)
+        if self.paused_session and self.session.running and self.session.paused:
+            self.session.resume(reset=self.on_return == "reset")
+        self.paused_session = False
+
+    def finish_break(self, idle: float):
+        ended = self.clock() - timedelta(seconds=idle)
+        duration = max(0.0, (ended - self.away_since).total_seconds())
+        self.session.natural_break(self.away_since, duration)
+        self.away_since = None
@@ -0,0 +1,277 @@
+"""Runtime instrumentation: loop lag, reminder drift and save latency
+
+Measurements go into fixed-bucket histograms in a process-wide registry,
+``METRICS``, which is off until the app enables it (``instrumentation``
+in the config). While off, instrumented code pays one attribute check.
+
+    METRICS.enabled = True
+    with METRICS.timer("reminder_save_seconds", file="config"):
+        ...
+    METRICS.render()        # Prometheus text exposition format
+
+What the app records:
+
+- ``tk_loop_lag_seconds``: how late a ``root.after`` callback ran compared
+  to when it was scheduled (``scheduler_loop_lag_seconds`` when headless)
+- ``reminder_drift_seconds{interval=...}``: how late each reminder fired
+- ``reminder_save_seconds{file=...}``: config, stats and history writes
+
+``MetricsServer`` serves ``/metrics`` on localhost for Prometheus or curl.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds in seconds, from sub-millisecond writes to minutes-late timers
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 labels: Tuple[Tuple[str, str], ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by interpolating inside the bucket holding the q-th value"""
+        with self._lock:
+            counts, total, largest = list(self.counts), self.count, self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else largest
+                return min(largest, lower + (upper - lower) * (rank - seen) / count)
+            seen += count
+        return largest
+
+    def summary(self) -> Dict:
+        return {
+            "name": self.name,
+            "labels": dict(self.labels),
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+def _label_text(labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Metrics:
+    """Registry of histograms keyed by name and labels"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.histograms: Dict[Tuple, Histogram] = {}
+        self.helps: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help: str):
+        self.helps[name] = help
+
+    def histogram(self, name: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                  **labels) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(
+                    key, Histogram(name, self.helps.get(name, ""), buckets, key[1])
+                )
+        return histogram
+
+    def observe(self, name: str, value: float, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - start)
+
+    def timed(self, name: str, **labels):
+        """Decorator form of ``timer``"""
+        def decorate(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.histogram(name, **labels).observe(time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def summaries(self) -> List[Dict]:
+        return [h.summary() for _, h in sorted(self.histograms.items())]
+
+    def render(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines = []
+        described = set()
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name not in described:
+                described.add(name)
+                if histogram.help:
+                    lines.append(f"# HELP {name} {histogram.help}")
+                lines.append(f"# TYPE {name} histogram")
+            with histogram._lock:
+                counts, total, value_sum = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _label_text(labels, 'le="%s"' % le)
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_label_text(labels)} {value_sum!r}")
+            lines.append(f"{name}_count{_label_text(labels)} {total}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+METRICS = Metrics()
+METRICS.describe("tk_loop_lag_seconds", "Delay of Tk after() callbacks past their due time")
+METRICS.describe("scheduler_loop_lag_seconds", "Delay of scheduler jobs past their deadline")
+METRICS.describe("reminder_drift_seconds", "Delay of break reminders past their deadline")
+METRICS.describe("reminder_save_seconds", "Time spent writing config, stats and history")
+
+timed = METRICS.timed
+
+
+class LoopLagProbe:
+    """Schedules a no-op every ``interval`` seconds and records how late it ran
+
+    ``schedule(delay, callback)`` is the loop's own timer, e.g.
+    ``lambda d, fn: root.after(int(d * 1000), fn)`` or ``scheduler.call_later``.
+    """
+
+    def __init__(self, schedule: Callable[[float, Callable], object], metric: str,
+                 interval: float = 1.0, metrics: Metrics = METRICS):
+        self.schedule = schedule
+        self.metric = metric
+        self.interval = interval
+        self.metrics = metrics
+        self.running = False
+        self._due = 0.0
+
+    def start(self):
+        if self.running or not self.metrics.enabled:
+            return
+        self.running = True
+        self._arm()
+
+    def stop(self):
+        self.running = False
+
+    def _arm(self):
+        self._due = time.perf_counter() + self.interval
+        self.schedule(self.interval, self._tick)
+
+    def _tick(self):
+        if not self.running:
+            return
+        self.metrics.observe(self.metric, max(0.0, time.perf_counter() - self._due))
+        self._arm()
+
+
+class MetricsServer:
+    """Serves ``GET /metrics`` in the Prometheus text format on a daemon thread"""
+
+    def __init__(self, metrics: Metrics = METRICS, host: str = "127.0.0.1", port: int = 9477):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.httpd = None  # a ThreadingHTTPServer while serving
+        self._thread = None
+
+    def start(self) -> bool:
+        # Imported here: most runs never serve metrics, and http.server is slow to import
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError:
+            return False  # port taken; the debug panel still works
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+
+def enable_from_config(settings: Optional[Dict]) -> Optional[MetricsServer]:
+    """Apply the ``instrumentation`` config value; returns the started server, if any"""
+    settings = settings or {}
+    METRICS.enabled = bool(settings.get("enabled", False))
+    if not METRICS.enabled or not settings.get("port"):
+        return None
+    server = MetricsServer(METRICS, settings.get("host", "127.0.0.1"), settings["port"])
+    return server if server.start() else None
@@ -0,0 +1,273 @@
+import itertools
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Default response buttons for a break reminder
+BREAK_ACTIONS = (("continue", "Continue"), ("stop", "Stop Session"))
+
+_ids = itertools.count(1)
+
+
+class Notification:
+    """A notification waiting for the user's response"""
+
+    def __init__(self, title: str, message: str,
+                 actions: Tuple[Tuple[str, str], ...] = BREAK_ACTIONS,
+                 timeout: Optional[float] = None, default: Optional[str] = None,
+                 context: Optional[Dict] = None):
+        self.id = next(_ids)
+        self.title = title
+        self.message = message
+        self.actions = actions
+        self.timeout = timeout  # seconds before ``default`` is answered
+        self.default = default
+        self.context = context or {}  # caller data, e.g. the reminder it belongs to
+
+
+class NotificationBackend:
+    """Displays notifications; ``respond`` may be called from any thread"""
+
+    name = "base"
+    interactive = True  # False: nothing will answer what it shows
+
+    def show(self, notification: Notification, respond: Callable[[Optional[str]], None]):
+        raise NotImplementedError
+
+    def close(self, notification: Notification):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class NullBackend(NotificationBackend):
+    """Shows nothing; notifications stay pending until closed
+
+    ``answered_elsewhere`` says responses still arrive some other way, such
+    as ``respond`` requests from a server's clients.
+    """
+
+    name = "null"
+
+    def __init__(self, answered_elsewhere: bool = False):
+        self.interactive = answered_elsewhere
+
+    def show(self, notification, respond):
+        pass
+
+
+class RecordingBackend(NotificationBackend):
+    """Records notifications and answers them on request, for tests"""
+
+    name = "recording"
+
+    def __init__(self, auto_response: Optional[str] = None):
+        self.auto_response = auto_response
+        self.shown: List[Notification] = []
+        self.closed: List[Notification] = []
+        self._responders: Dict[int, Callable] = {}
+
+    def show(self, notification, respond):
+        self.shown.append(notification)
+        if self.auto_response is not None:
+            respond(self.auto_response)
+        else:
+            self._responders[notification.id] = respond
+
+    def respond(self, notification_id: int, action: Optional[str]):
+        self._responders.pop(notification_id)(action)
+
+    def close(self, notification):
+        self.closed.append(notification)
+        self._responders.pop(notification.id, None)
+
+
+class ToastBackend(NotificationBackend):
+    """Non-modal CTkToplevel toast in the corner of the screen"""
+
+    name = "toast"
+
+    def __init__(self, root):
+        self.root = root
+        self.windows = {}
+
+    def show(self, notification, respond):
+        import customtkinter as ctk
+
+        window = ctk.CTkToplevel(self.root)
+        window.title(notification.title)
+        window.resizable(False, False)
+        window.attributes("-topmost", True)
+        self.windows[notification.id] = window
+
+        def answer(action):
+            if self.windows.pop(notification.id, None) is not None:
+                window.destroy()
+                respond(action)
+
+        ctk.CTkLabel(
+            window,
+            text=notification.message,
+            font=("Arial", 14),
+            justify="left",
+            wraplength=320
+        ).pack(padx=20, pady=(20, 10))
+
+        button_frame = ctk.CTkFrame(window, fg_color="transparent")
+        button_frame.pack(pady=(0, 20))
+        for action, label in notification.actions:
+            ctk.CTkButton(
+                button_frame,
+                text=label,
+                width=120,
+                command=lambda a=action: answer(a)
+            ).pack(side="left", padx=5)
+
+        window.protocol('WM_DELETE_WINDOW', lambda: answer(None))
+        if notification.timeout:
+            window.after(int(notification.timeout * 1000), lambda: answer(notification.default))
+
+        # Bottom-right corner, clear of the taskbar
+        window.update_idletasks()
+        x = window.winfo_screenwidth() - window.winfo_reqwidth() - 20
+        y = window.winfo_screenheight() - window.winfo_reqheight() - 80
+        window.geometry(f"+{x}+{y}")
+
+    def close(self, notification):
+        window = self.windows.pop(notification.id, None)
+        if window is not None:
+            window.destroy()
+
+    def shutdown(self):
+        for window in list(self.windows.values()):
+            window.destroy()
+        self.windows.clear()
+
+
+class FreedesktopBackend(NotificationBackend):
+    """Desktop notifications through notify-send (libnotify 0.7.10+)
+
+    ``notify-send --wait`` blocks until the notification is answered and
+    prints the chosen action, so each notification gets a short-lived
+    waiter thread and the caller never blocks.
+    """
+
+    name = "freedesktop"
+
+    def __init__(self, app_name: str = "Break Reminder"):
+        self.app_name = app_name
+        self.processes = {}
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux") and shutil.which("notify-send") is not None
+
+    def show(self, notification, respond):
+        args = ["notify-send", "--app-name", self.app_name, "--wait"]
+        for action, label in notification.actions:
+            args.append(f"--action={action}={label}")
+        if notification.timeout:
+            args += ["--expire-time", str(int(notification.timeout * 1000))]
+        args += [notification.title, notification.message]
+
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        self.processes[notification.id] = process
+
+        def wait():
+            output, _ = process.communicate()
+            self.processes.pop(notification.id, None)
+            action = output.strip() or None
+            if action is None and notification.timeout:
+                action = notification.default
+            respond(action)
+
+        threading.Thread(target=wait, daemon=True).start()
+
+    def close(self, notification):
+        process = self.processes.pop(notification.id, None)
+        if process is not None:
+            process.terminate()
+
+    def shutdown(self):
+        for process in list(self.processes.values()):
+            process.terminate()
+        self.processes.clear()
+
+
+class NotificationCenter:
+    """Shows notifications and queues their responses for the owning thread
+
+    Backends may answer from any thread; answers are only put on a queue.
+    The owner calls ``dispatch`` from its own loop (Tk, asyncio, ...) to
+    run the callbacks there, so nothing ever blocks waiting for the user.
+    """
+
+    def __init__(self, backend: NotificationBackend):
+        self.backend = backend
+        self.responses = queue.Queue()
+        self.callbacks: Dict[int, Callable[[Optional[str]], None]] = {}
+        self.on_response: Optional[Callable[[], None]] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self.callbacks)
+
+    @property
+    def interactive(self) -> bool:
+        return self.backend.interactive
+
+    def notify(self, notification: Notification, callback: Callable[[Optional[str]], None]) -> int:
+        self.callbacks[notification.id] = callback
+
+        def respond(action, notification_id=notification.id):
+            self.responses.put((notification_id, action))
+            if self.on_response is not None:
+                self.on_response()
+
+        self.backend.show(notification, respond)
+        return notification.id
+
+    def close(self, notification: Notification):
+        """Withdraw a notification without running its callback"""
+        self.callbacks.pop(notification.id, None)
+        self.backend.close(notification)
+
+    def dispatch(self) -> int:
+        """Run callbacks for all queued responses; returns how many ran"""
+        handled = 0
+        while True:
+            try:
+                notification_id, action = self.responses.get_nowait()
+            except queue.Empty:
+                return handled
+            callback = self.callbacks.pop(notification_id, None)
+            if callback is not None:
+                callback(action)
+                handled += 1
+
+    def shutdown(self):
+        self.callbacks.clear()
+        self.backend.shutdown()
+
+
+def create_backend(name: str, root=None) -> NotificationBackend:
+    """Backend factory for the ``notification_backend`` config value"""
+    if name == "auto":
+        if root is not None:
+            name = "toast"
+        elif FreedesktopBackend.available():
+            name = "freedesktop"
+        else:
+            name = "null"
+
+    if name == "freedesktop" and FreedesktopBackend.available():
+        return FreedesktopBackend()
+    if name in ("toast", "freedesktop") and root is not None:
+        return ToastBackend(root)
+    if name == "recording":
+        return RecordingBackend()
+    return NullBackend()
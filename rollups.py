@@ -0,0 +1,223 @@
+"""Incremental statistics rollups
+
+Every break taken updates one hourly, one daily and one weekly bucket, so
+trend questions ("breaks per day this month", "median session this week")
+are answered from a few small dicts instead of rescanning history.
+Session lengths also go into quantile sketches that can be merged, which
+lets a range of weeks, or many users, be summarised without raw data.
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Hourly buckets older than this many days are dropped
+HOURLY_RETENTION_DAYS = 31
+# Daily buckets are kept for about a year; older days still count in the weekly totals
+DAILY_RETENTION_DAYS = 400
+# Weekly sketches are kept for two years; the all-time sketch still includes older weeks
+SKETCH_RETENTION_WEEKS = 104
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with bounded relative error
+
+    Values are counted in buckets whose bounds grow by a factor ``gamma``,
+    so every quantile estimate is within ``relative_accuracy`` of a value
+    that was really added. Adding is O(1), and two sketches with the same
+    accuracy merge by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, count: int = 1):
+        if value < self.min_value:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "QuantileSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("cannot merge sketches with different accuracy")
+        if not other.count:
+            return
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.min
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(self.max, max(self.min, estimate))
+        return self.max
+
+    def quantiles(self, qs: Iterable[float] = (0.5, 0.9, 0.99)) -> Dict[str, Optional[float]]:
+        return {f"p{round(q * 100):d}": self.quantile(q) for q in qs}
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "buckets": {str(index): count for index, count in self.buckets.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "QuantileSketch":
+        data = data or {}
+        sketch = cls(data.get("relative_accuracy", 0.01), data.get("min_value", 1e-3))
+        sketch.buckets = {int(index): count for index, count in data.get("buckets", {}).items()}
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.total = data.get("total", 0.0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        return sketch
+
+
+class StatsRollups:
+    """Hourly, daily and weekly break buckets kept up to date per break
+
+    Each bucket holds ``breaks``, ``work_time`` and ``longest``, and every
+    week also gets a QuantileSketch of session lengths. Buckets are
+    plain dicts keyed by ``2024-05-06T13``, ``2024-05-06`` and ``2024-W19``
+    and stay in chronological order, so old hourly and daily buckets and
+    old weekly sketches are pruned from the front.
+    """
+
+    def __init__(self, hourly_days: int = HOURLY_RETENTION_DAYS,
+                 daily_days: int = DAILY_RETENTION_DAYS, sketch_weeks: int = SKETCH_RETENTION_WEEKS):
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.sketch_weeks = sketch_weeks
+        self.hourly: Dict[str, Dict] = {}
+        self.daily: Dict[str, Dict] = {}
+        self.weekly: Dict[str, Dict] = {}
+        self.weekly_sketches: Dict[str, QuantileSketch] = {}
+        self.sketch = QuantileSketch()
+
+    @staticmethod
+    def keys(when: datetime) -> Tuple[str, str, str]:
+        year, week, _ = when.isocalendar()
+        return when.strftime("%Y-%m-%dT%H"), when.strftime("%Y-%m-%d"), f"{year}-W{week:02d}"
+
+    def record(self, when: datetime, duration: float):
+        hour, day, week = self.keys(when)
+        if hour not in self.hourly:
+            self._prune(self.hourly, (when - timedelta(days=self.hourly_days)).strftime("%Y-%m-%dT%H"))
+        if day not in self.daily:
+            self._prune(self.daily, (when - timedelta(days=self.daily_days)).strftime("%Y-%m-%d"))
+        self._bump(self.hourly, hour, duration)
+        self._bump(self.daily, day, duration)
+        self._bump(self.weekly, week, duration)
+
+        sketch = self.weekly_sketches.get(week)
+        if sketch is None:
+            self._prune(self.weekly_sketches, self.keys(when - timedelta(weeks=self.sketch_weeks))[2])
+            sketch = self.weekly_sketches[week] = QuantileSketch()
+        sketch.add(duration)
+        self.sketch.add(duration)
+
+    @staticmethod
+    def _bump(buckets: Dict[str, Dict], key: str, duration: float):
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = {"breaks": 1, "work_time": duration, "longest": duration}
+            return
+        bucket["breaks"] += 1
+        bucket["work_time"] += duration
+        if duration > bucket["longest"]:
+            bucket["longest"] = duration
+
+    @staticmethod
+    def _prune(buckets: Dict, cutoff: str):
+        while buckets:
+            oldest = next(iter(buckets))
+            if oldest >= cutoff:
+                break
+            del buckets[oldest]
+
+    def daily_series(self, days: int = 7, today: datetime = None) -> List[Tuple[str, Dict]]:
+        """The last ``days`` daily buckets, oldest first, with empty days filled in"""
+        today = today or datetime.now()
+        series = []
+        for offset in range(days - 1, -1, -1):
+            key = (today - timedelta(days=offset)).strftime("%Y-%m-%d")
+            series.append((key, self.daily.get(key, {"breaks": 0, "work_time": 0, "longest": 0})))
+        return series
+
+    def week(self, when: datetime = None) -> Dict:
+        key = self.keys(when or datetime.now())[2]
+        return self.weekly.get(key, {"breaks": 0, "work_time": 0, "longest": 0})
+
+    def quantiles(self, weeks: Optional[int] = None, now: datetime = None) -> Dict[str, Optional[float]]:
+        """Session length percentiles over the last ``weeks`` weeks, or all time"""
+        if weeks is None:
+            return self.sketch.quantiles()
+        now = now or datetime.now()
+        merged = QuantileSketch()
+        for offset in range(weeks):
+            sketch = self.weekly_sketches.get(self.keys(now - timedelta(weeks=offset))[2])
+            if sketch is not None:
+                merged.merge(sketch)
+        return merged.quantiles()
+
+    def to_dict(self) -> Dict:
+        return {
+            "hourly": self.hourly,
+            "daily": self.daily,
+            "weekly": self.weekly,
+            "weekly_sketches": {key: s.to_dict() for key, s in self.weekly_sketches.items()},
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict],
+                  hourly_days: int = HOURLY_RETENTION_DAYS) -> "StatsRollups":
+        rollups = cls(hourly_days)
+        if not data:
+            return rollups
+        # Sorted so pruning from the front stays correct for hand-edited files
+        rollups.hourly = dict(sorted(data.get("hourly", {}).items()))
+        rollups.daily = dict(sorted(data.get("daily", {}).items()))
+        rollups.weekly = dict(sorted(data.get("weekly", {}).items()))
+        rollups.weekly_sketches = {
+            key: QuantileSketch.from_dict(s) for key, s in sorted(data.get("weekly_sketches", {}).items())
+        }
+        rollups.sketch = QuantileSketch.from_dict(data.get("sketch"))
+        return rollups
@@ -0,0 +1,445 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional
+
+# Jobs run_async fires before letting other asyncio tasks in
+ASYNC_BATCH = 32
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A one-shot or recurring timer entry"""
+
+    __slots__ = ("deadline", "seq", "callback", "interval", "key", "slack", "cancelled", "queued")
+
+    def __init__(self, deadline: float, seq: int, callback: Callable, interval: Optional[float], key,
+                 slack: float = 0.0):
+        self.deadline = deadline
+        self.seq = seq
+        self.callback = callback
+        self.interval = interval
+        self.key = key
+        self.slack = slack  # how far off its deadline the job may run to share a wakeup
+        self.cancelled = False
+        self.queued = False
+
+    def __lt__(self, other: "Job") -> bool:
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+
+class Scheduler:
+    """Priority-queue timer core driven by a monotonic clock
+
+    Jobs live in a binary heap ordered by deadline, so adding one is
+    O(log n). Cancelling only flags the job; flagged entries are dropped
+    when they reach the top of the heap, or all at once when they make up
+    most of it. Recurring jobs are re-armed from their previous deadline
+    rather than from the time their callback returned, so slow callbacks
+    do not push later reminders back.
+
+    The scheduler never sleeps on its own. A driver (``TkDriver``,
+    ``run_forever`` or ``run_async``) asks for the next wakeup and calls
+    ``run_pending`` when it is due.
+
+    Jobs with ``slack`` may run up to that many seconds early or late
+    (recurring jobs at most half their interval). The next wakeup is the
+    earliest time some job must run, and every job within its window then
+    runs in the same wakeup, so nearby timers are coalesced. ``slack`` on
+    the scheduler is the window callers use for jobs that can be moved (0
+    unless low-power mode is on) and bounds how far ahead jobs are run.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, slack: float = 0.0):
+        self.clock = clock
+        self.slack = slack
+        self.wakeups = 0
+        self.created = clock()
+        self._heap = []
+        self._keys: Dict[Hashable, Job] = {}
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self.on_change: Optional[Callable[[], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._heap) - self._cancelled
+
+    def call_at(self, deadline: float, callback: Callable, key: Hashable = None,
+                interval: Optional[float] = None, slack: float = 0.0) -> Job:
+        if interval:
+            slack = min(slack, interval / 2)
+        with self._lock:
+            if key is not None:
+                self._cancel_key(key)
+            job = Job(deadline, next(self._seq), callback, interval, key, slack)
+            if key is not None:
+                self._keys[key] = job
+            self._push(job)
+            changed = self._heap[0] is job
+        if changed:
+            self._notify()
+        return job
+
+    def call_later(self, delay: float, callback: Callable, key: Hashable = None,
+                   slack: float = 0.0) -> Job:
+        return self.call_at(self.clock() + delay, callback, key, slack=slack)
+
+    def every(self, interval: float, callback: Callable, key: Hashable = None,
+              first: Optional[float] = None, slack: float = 0.0) -> Job:
+        """Run ``callback`` every ``interval`` seconds, first after ``first`` seconds"""
+        delay = interval if first is None else first
+        return self.call_at(self.clock() + delay, callback, key, interval, slack)
+
+    def cancel(self, job_or_key) -> bool:
+        with self._lock:
+            if isinstance(job_or_key, Job):
+                job = job_or_key
+                if job.key is not None and self._keys.get(job.key) is job:
+                    del self._keys[job.key]
+                cancelled = self._cancel_job(job)
+            else:
+                cancelled = self._cancel_key(job_or_key)
+        if cancelled:
+            self._notify()
+        return cancelled
+
+    def get(self, key: Hashable) -> Optional[Job]:
+        return self._keys.get(key)
+
+    def next_deadline(self) -> Optional[float]:
+        with self._lock:
+            self._drop_cancelled_head()
+            return self._heap[0].deadline if self._heap else None
+
+    def next_wakeup(self) -> Optional[float]:
+        """The earliest time some job must run, allowing for each job's slack"""
+        with self._lock:
+            self._drop_cancelled_head()
+            heap = self._heap
+            if not heap:
+                return None
+            head = heap[0]
+            if not head.slack:
+                return head.deadline
+            # Walk the heap in deadline order, but only over the jobs due
+            # before the wakeup found so far
+            target = float("inf")
+            frontier = [(head.deadline, head.seq, 0)]
+            while frontier:
+                deadline, _, index = heapq.heappop(frontier)
+                if deadline > target:
+                    break
+                job = heap[index]
+                if not job.cancelled:
+                    target = min(target, deadline + job.slack)
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child].deadline, heap[child].seq, child))
+            return target
+
+    def time_until_next(self) -> Optional[float]:
+        wakeup = self.next_wakeup()
+        if wakeup is None:
+            return None
+        return max(0.0, wakeup - self.clock())
+
+    def note_wakeup(self):
+        """Count a wakeup of the owning loop that did not come through run_pending"""
+        self.wakeups += 1
+
+    def wakeups_per_hour(self) -> float:
+        elapsed = self.clock() - self.created
+        return self.wakeups * 3600 / elapsed if elapsed > 0 else 0.0
+
+    def run_pending(self, limit: Optional[int] = None) -> int:
+        """Fire every job whose deadline has passed, or the first ``limit``; returns how many ran"""
+        self.wakeups += 1
+        return self._run_due(limit)
+
+    def _run_due(self, limit: Optional[int]) -> int:
+        fired = 0
+        while limit is None or fired < limit:
+            with self._lock:
+                self._drop_cancelled_head()
+                if not self._heap:
+                    break
+                if self._heap[0].deadline <= self.clock():
+                    job = heapq.heappop(self._heap)
+                else:
+                    job = self._pop_early()
+                    if job is None:
+                        break
+                job.queued = False
+
+            try:
+                job.callback()
+            except Exception:
+                logger.exception("scheduled job %r failed", job.key or job.callback)
+            fired += 1
+
+            with self._lock:
+                if job.interval and not job.cancelled:
+                    self._rearm(job)
+                elif job.key is not None and self._keys.get(job.key) is job:
+                    del self._keys[job.key]
+        return fired
+
+    def wake(self):
+        """Wake a sleeping driver, e.g. after setting its stop event"""
+        self._notify()
+
+    def run_forever(self, stop: threading.Event):
+        """Blocking driver for CLI and daemon use"""
+        while not stop.is_set():
+            self.run_pending()
+            with self._wakeup:
+                if stop.is_set():
+                    break
+                self._wakeup.wait(self.time_until_next())
+
+    async def run_async(self, stop=None, batch: int = ASYNC_BATCH):
+        """asyncio driver; wakes early when a nearer job is added
+
+        Due jobs run ``batch`` at a time with a yield to the loop in
+        between, so thousands of timers falling due together don't hold
+        client connections up.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        previous = self.on_change
+        self.on_change = lambda: loop.call_soon_threadsafe(changed.set)
+        try:
+            while stop is None or not stop.is_set():
+                fired = self.run_pending(batch)
+                while fired == batch and not (stop is not None and stop.is_set()):
+                    await asyncio.sleep(0)
+                    fired = self._run_due(batch)
+                changed.clear()
+                try:
+                    await asyncio.wait_for(changed.wait(), self.time_until_next())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.on_change = previous
+
+    def _pop_early(self) -> Optional[Job]:
+        """Take a job that is not due yet but may run now thanks to its slack"""
+        if not self.slack:
+            return None
+        heap = self._heap
+        now = self.clock()
+        frontier = [(heap[0].deadline, heap[0].seq, 0)]
+        while frontier:
+            deadline, _, index = heapq.heappop(frontier)
+            if deadline > now + self.slack:
+                return None
+            job = heap[index]
+            if not job.cancelled and deadline - job.slack <= now:
+                # A cancelled stand-in sorts exactly like the job, so the heap
+                # stays valid and the slot is dropped like any cancelled entry
+                stand_in = Job(job.deadline, job.seq, None, None, None)
+                stand_in.cancelled = stand_in.queued = True
+                heap[index] = stand_in
+                self._cancelled += 1
+                self._prune_cancelled()
+                return job
+            for child in (2 * index + 1, 2 * index + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child].deadline, heap[child].seq, child))
+        return None
+
+    def _rearm(self, job: Job):
+        # Drift correction: advance along the original grid and skip any
+        # slots that were missed while the callback (or the host) was busy
+        now = self.clock()
+        job.deadline += job.interval
+        if job.deadline <= now:
+            missed = int((now - job.deadline) // job.interval) + 1
+            job.deadline += missed * job.interval
+        job.seq = next(self._seq)
+        self._push(job)
+
+    def _push(self, job: Job):
+        job.queued = True
+        heapq.heappush(self._heap, job)
+
+    def _cancel_key(self, key) -> bool:
+        job = self._keys.pop(key, None)
+        return job is not None and self._cancel_job(job)
+
+    def _cancel_job(self, job: Job) -> bool:
+        if job.cancelled:
+            return False
+        job.cancelled = True
+        if not job.queued:
+            # Cancelled from inside its own callback; it is not in the heap
+            return True
+        self._cancelled += 1
+        self._prune_cancelled()
+        return True
+
+    def _prune_cancelled(self):
+        # Rebuild once flagged entries dominate so the heap stays O(live jobs)
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [j for j in self._heap if not j.cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _drop_cancelled_head(self):
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap).queued = False
+            self._cancelled -= 1
+
+    def _notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+        if self.on_change is not None:
+            self.on_change()
+
+
+class TkDriver:
+    """Drives a Scheduler from a Tk root using a single pending after()
+
+    Jobs added from other threads have to wake Tk up. On Unix that is done
+    through a self-pipe registered with ``createfilehandler``. Elsewhere a
+    small waker thread posts a virtual event with ``event_generate``;
+    Tkinter hands that call to the Tk thread and blocks until it has run,
+    so the waker, not the thread that added the job, is the one that waits.
+    """
+
+    WAKE_EVENT = "<<SchedulerWake>>"
+
+    def __init__(self, root, scheduler: Scheduler):
+        self.root = root
+        self.scheduler = scheduler
+        self._after_id = None
+        self._thread = threading.current_thread()
+        self._pipe = None
+        self._waker = None
+        self._wake = threading.Event()
+        self._closed = False
+        if os.name == "posix" and hasattr(root.tk, "createfilehandler"):
+            try:
+                import tkinter
+
+                read_fd, write_fd = os.pipe()
+                os.set_blocking(read_fd, False)
+                os.set_blocking(write_fd, False)
+                root.tk.createfilehandler(read_fd, tkinter.READABLE, self._on_pipe)
+                self._pipe = (read_fd, write_fd)
+            except Exception:
+                self._pipe = None
+        if self._pipe is None:
+            root.bind(self.WAKE_EVENT, self._on_wake_event)
+            self._waker = threading.Thread(target=self._run_waker, name="tk-wake", daemon=True)
+            self._waker.start()
+        scheduler.on_change = self.rearm
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._pipe is not None:
+            try:
+                self.root.tk.deletefilehandler(self._pipe[0])
+            except Exception:
+                pass
+            for fd in self._pipe:
+                os.close(fd)
+            self._pipe = None
+
+    def rearm(self):
+        if threading.current_thread() is not self._thread:
+            if self._pipe is not None:
+                try:
+                    os.write(self._pipe[1], b"\0")
+                except BlockingIOError:
+                    pass  # a wakeup is already pending
+            else:
+                self._wake.set()
+            return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        delay = self.scheduler.time_until_next()
+        if delay is not None:
+            self._after_id = self.root.after(int(delay * 1000) + 1, self._tick)
+
+    def _tick(self):
+        self._after_id = None
+        self.scheduler.run_pending()
+        self.rearm()
+
+    def _on_pipe(self, fd, mask):
+        try:
+            while os.read(fd, 512):
+                pass
+        except BlockingIOError:
+            pass
+        self.scheduler.run_pending()
+        self.rearm()
+
+    def _on_wake_event(self, event=None):
+        self.scheduler.run_pending()
+        self.rearm()
+
+    def _run_waker(self):
+        while True:
+            self._wake.wait()
+            if self._closed:
+                return
+            self._wake.clear()
+            try:
+                self.root.event_generate(self.WAKE_EVENT, when="tail")
+            except Exception:
+                if self._closed:
+                    return
+                # Tk isn't in its main loop yet; try again shortly
+                self._wake.set()
+                time.sleep(0.1)
+
+
+def parse_duration(text: str) -> float:
+    """Parse '90', '90s', '25m' or '1h' into seconds"""
+    units = {"s": 1, "m": 60, "h": 3600}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main(argv=None):
+    import argparse
+    import random
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Terminal break reminder")
+    parser.add_argument("interval", nargs="+", help="interval(s) such as 25m or 90s")
+    parser.add_argument("--message", default="Time for a break!")
+    args = parser.parse_args(argv)
+
+    scheduler = Scheduler()
+    for text in args.interval:
+        seconds = parse_duration(text)
+
+        def remind(text=text):
+            print(f"\a[{datetime.now():%H:%M:%S}] {args.message} ({text})", flush=True)
+
+        scheduler.every(seconds, remind, key=text)
+
+    stop = threading.Event()
+    try:
+        scheduler.run_forever(stop)
+    except KeyboardInterrupt:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
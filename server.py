@@ -0,0 +1,225 @@
+"""Multi-user reminder server
+
+Runs one ReminderSession per user on a single asyncio loop with one shared
+Scheduler heap. Each user gets their own config, stats and history files
+under ``<data-dir>/users/<name>/``. The protocol is the daemon's
+line-delimited JSON with an extra ``user`` field on every request:
+
+    python server.py --data-dir /srv/reminders --port 8765
+    {"user": "ana", "cmd": "start_session", "interval": "Pomodoro"}
+
+Reminders are not shown on the server; clients see them as break_shown
+events on a ``subscribe`` stream and answer with ``respond``.
+
+Over TCP every request must also carry the shared secret as ``token``
+(``--token`` or ``BREAK_REMINDER_SERVER_TOKEN``); the server refuses to
+listen on a port without one. The Unix socket is only open to its owner.
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from config_layers import SERVER_TOKEN_ENV as TOKEN_ENV
+from daemon import default_socket_path, history_limit
+from notifications import NotificationCenter, NullBackend
+from scheduler import Scheduler
+from ver4 import (
+    ReminderConfig, ReminderHistory, ReminderSession, ReminderStats,
+    CONFIG_FILE, STATS_FILE, HISTORY_FILE, HISTORY_JOURNAL_FILE,
+    SESSION_EVENTS_FILE, SESSION_SNAPSHOT_FILE
+)
+
+USER_NAME = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class UserNamespace:
+    """One user's config, stats, history and session"""
+
+    __slots__ = ("name", "config", "stats", "history", "session", "subscribers")
+
+    def __init__(self, name: str, directory: Path, scheduler: Scheduler, notifier: NotificationCenter):
+        self.name = name
+        self.config = ReminderConfig(str(directory / CONFIG_FILE))
+        self.stats = ReminderStats(
+            path=str(directory / STATS_FILE),
+            events_path=str(directory / SESSION_EVENTS_FILE),
+            snapshot_path=str(directory / SESSION_SNAPSHOT_FILE)
+        )
+        self.history = ReminderHistory(
+            self.config.get("history_retention"),
+            path=str(directory / HISTORY_FILE),
+            journal_path=str(directory / HISTORY_JOURNAL_FILE)
+        )
+        # Thousands of users would otherwise hold thousands of open journals
+        self.history.journal.keep_open = False
+        self.stats.events.keep_open = False
+        self.session = ReminderSession(
+            self.config, self.stats, self.history, scheduler, notifier, key=(name, "session")
+        )
+        self.subscribers = {}
+        self.session.listeners.append(self.broadcast)
+
+    def broadcast(self, event: str, payload):
+        if not self.subscribers:
+            return
+        message = json.dumps({"user": self.name, "event": event, "data": payload}).encode() + b"\n"
+        for writer, topics in list(self.subscribers.items()):
+            if topics and event not in topics:
+                continue
+            if writer.is_closing():
+                self.subscribers.pop(writer, None)
+                continue
+            writer.write(message)
+
+    def close(self):
+        self.session.stop()
+        self.config.flush()
+        self.history.close()
+        self.stats.close()
+
+
+class ReminderServer:
+    """Hosts many users' sessions on one event loop and one timer heap"""
+
+    def __init__(self, data_dir: str, token: Optional[str] = None):
+        self.data_dir = Path(data_dir)
+        self.token = token
+        self.scheduler = Scheduler()
+        self.notifier = NotificationCenter(NullBackend(answered_elsewhere=True))
+        self.users: Dict[str, UserNamespace] = {}
+
+        self.commands = {
+            "start_session": self.cmd_start_session,
+            "stop_session": self.cmd_stop_session,
+            "status": self.cmd_status,
+            "next_fire": self.cmd_next_fire,
+            "respond": self.cmd_respond,
+            "stats": self.cmd_stats,
+            "history": self.cmd_history,
+        }
+
+    def user(self, name: str) -> UserNamespace:
+        if not isinstance(name, str) or not USER_NAME.match(name):
+            raise ValueError(f"invalid user name: {name!r}")
+        namespace = self.users.get(name)
+        if namespace is None:
+            directory = self.data_dir / "users" / name
+            directory.mkdir(parents=True, exist_ok=True)
+            namespace = UserNamespace(name, directory, self.scheduler, self.notifier)
+            self.users[name] = namespace
+        return namespace
+
+    def handle_request(self, request: Dict, writer=None) -> Dict:
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "expected a JSON object"}
+        if self.token is not None and not (
+            isinstance(request.get("token"), str)
+            and hmac.compare_digest(request["token"].encode(), self.token.encode())
+        ):
+            return {"ok": False, "error": "invalid token"}
+        try:
+            namespace = self.user(request.get("user"))
+            name = request.get("cmd")
+            if name == "subscribe":
+                namespace.subscribers[writer] = set(request.get("topics") or ())
+                return {"ok": True, "subscribed": sorted(namespace.subscribers[writer])}
+            if name not in self.commands:
+                return {"ok": False, "error": f"unknown command: {name}"}
+            return {"ok": True, "result": self.commands[name](namespace, request)}
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            return {"ok": False, "error": str(e)}
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle_request(json.loads(line), writer)
+                except ValueError as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for namespace in self.users.values():
+                namespace.subscribers.pop(writer, None)
+            writer.close()
+
+    async def serve(self, socket_path: str = None, host: str = None, port: int = None):
+        if port is not None:
+            if not self.token:
+                raise ValueError(f"a token is required to listen on TCP (--token or {TOKEN_ENV})")
+            server = await asyncio.start_server(self.handle_client, host or "127.0.0.1", port)
+        else:
+            Path(socket_path).unlink(missing_ok=True)
+            server = await asyncio.start_unix_server(self.handle_client, path=socket_path)
+            os.chmod(socket_path, 0o600)
+
+        try:
+            async with server:
+                await self.scheduler.run_async()
+        finally:
+            for namespace in self.users.values():
+                namespace.close()
+            if port is None:
+                Path(socket_path).unlink(missing_ok=True)
+
+    def cmd_start_session(self, namespace: UserNamespace, request: Dict):
+        interval = request.get("interval")
+        if interval is not None and interval not in namespace.config.get("intervals", {}):
+            raise KeyError(f"unknown interval: {interval}")
+        namespace.session.start(interval)
+        return namespace.session.status()
+
+    def cmd_stop_session(self, namespace: UserNamespace, request: Dict):
+        namespace.session.stop()
+        return namespace.session.status()
+
+    def cmd_status(self, namespace: UserNamespace, request: Dict):
+        return namespace.session.status()
+
+    def cmd_next_fire(self, namespace: UserNamespace, request: Dict):
+        status = namespace.session.status()
+        return {"next_fire_in": status["next_fire_in"], "next_fire_at": status["next_fire_at"]}
+
+    def cmd_respond(self, namespace: UserNamespace, request: Dict):
+        return namespace.session.respond(request.get("action", "continue"))
+
+    def cmd_stats(self, namespace: UserNamespace, request: Dict):
+        return namespace.stats.stats
+
+    def cmd_history(self, namespace: UserNamespace, request: Dict):
+        return namespace.history.recent(history_limit(request))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-user break reminder server")
+    parser.add_argument("--data-dir", default="reminder_server_data")
+    parser.add_argument("--socket", default=default_socket_path().replace(".sock", "-server.sock"))
+    parser.add_argument("--host", help="listen on TCP instead of a Unix socket")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"shared secret clients send as \"token\" (default: ${TOKEN_ENV})")
+    args = parser.parse_args(argv)
+    if args.port is not None and not args.token:
+        parser.error(f"--port needs --token or {TOKEN_ENV}")
+
+    server = ReminderServer(args.data_dir, args.token)
+    try:
+        asyncio.run(server.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
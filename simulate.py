@@ -0,0 +1,245 @@
+"""Deterministic session simulation on a virtual clock
+
+Replays weeks of work sessions through the real ReminderSession,
+ReminderStats and ReminderHistory without waiting for a single timer:
+
+    python simulate.py --days 30 --output simulation/
+    python simulate.py --days 7 --interval "Short Break" --responses continue=3,ignore=1
+
+A ``VirtualClock`` stands in for both clocks the app reads. The scheduler
+runs on its monotonic side; the session, the stats event log and the
+history take their timestamps from its wall side. Time only moves when the
+simulation jumps it to the next scheduler deadline, so a month of Pomodoro
+sessions is a few hundred callbacks.
+
+A ``ScriptedUser`` answers each reminder after a short delay with an action
+drawn from a seeded generator (or taken in turn from a fixed list);
+``ignore`` leaves the reminder open so the next one logs it as missed. The
+same seed, start date and config always produce byte-identical stats,
+event log and history files, which makes the output usable as a fixture
+for regression tests and the run time as a benchmark
+(``benchmarks/bench_core.py --only simulation``).
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from notifications import NotificationCenter, NullBackend
+from scheduler import Scheduler
+from ver4 import (
+    HISTORY_FILE, HISTORY_JOURNAL_FILE, SESSION_EVENTS_FILE, SESSION_SNAPSHOT_FILE, STATS_FILE,
+    ReminderConfig, ReminderHistory, ReminderSession, ReminderStats
+)
+
+DATA_FILES = (
+    STATS_FILE, HISTORY_FILE, HISTORY_JOURNAL_FILE, SESSION_EVENTS_FILE, SESSION_SNAPSHOT_FILE
+)
+
+# A Monday, so the default run starts on a working day
+DEFAULT_START = date(2024, 6, 3)
+DEFAULT_BLOCKS = (("09:00", "12:30"), ("13:30", "17:30"))
+WORKDAYS = (0, 1, 2, 3, 4)
+
+# "ignore" never answers; the reminder is logged as missed when the next one replaces it
+DEFAULT_RESPONSES = {"continue": 0.85, "dismissed": 0.05, "ignore": 0.08, "stop": 0.02}
+RESPONSE_DELAY = (5.0, 90.0)
+
+
+class VirtualClock:
+    """Monotonic and wall-clock time that only move when told to"""
+
+    def __init__(self, start: datetime):
+        self.start = start
+        self.elapsed = 0.0
+
+    def monotonic(self) -> float:
+        return self.elapsed
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self.elapsed)
+
+    def time(self) -> float:
+        return self.start.timestamp() + self.elapsed
+
+    def set(self, when: datetime):
+        elapsed = (when - self.start).total_seconds()
+        if elapsed < self.elapsed:
+            raise ValueError("the virtual clock cannot go backwards")
+        self.elapsed = elapsed
+
+
+class ScriptedUser:
+    """Answers every reminder a session shows, after a short delay
+
+    ``responses`` is either a mapping of action to weight, sampled with
+    ``rng``, or a sequence of actions used in turn.
+    """
+
+    def __init__(self, responses: Union[Dict[str, float], Sequence[str]] = DEFAULT_RESPONSES,
+                 delay: Tuple[float, float] = RESPONSE_DELAY, rng: random.Random = None):
+        self.responses = responses
+        self.delay = delay
+        self.rng = rng or random.Random(0)
+        self.answered: Dict[str, int] = {}
+        self._turn = 0
+        self.session = None
+
+    def attach(self, session: ReminderSession):
+        self.session = session
+        session.listeners.append(self.on_event)
+
+    def next_action(self) -> str:
+        if isinstance(self.responses, dict):
+            actions = list(self.responses)
+            return self.rng.choices(actions, [self.responses[a] for a in actions])[0]
+        action = self.responses[self._turn % len(self.responses)]
+        self._turn += 1
+        return action
+
+    def on_event(self, event: str, payload):
+        if event != "break_shown":
+            return
+        action = self.next_action()
+        self.answered[action] = self.answered.get(action, 0) + 1
+        if action == "ignore":
+            return
+        self.session.scheduler.call_later(
+            self.rng.uniform(*self.delay), lambda: self.session.respond(action),
+            key=(self.session.key, "user")
+        )
+
+
+class Simulation:
+    """Runs scripted work days through the reminder core into ``output``
+
+    Each day in ``workdays`` (0 is Monday) has one session per block of
+    ``blocks``; a session the user stopped stays stopped until the next
+    block. Existing data files in ``output`` are replaced.
+    """
+
+    def __init__(self, output: Union[str, Path], days: int = 30, start: date = DEFAULT_START,
+                 interval: str = "Pomodoro", blocks: Iterable[Tuple[str, str]] = DEFAULT_BLOCKS,
+                 workdays: Iterable[int] = WORKDAYS, responses=DEFAULT_RESPONSES, seed: int = 0,
+                 config: Optional[Dict] = None):
+        self.output = Path(output)
+        self.days = days
+        self.start = start
+        self.interval = interval
+        self.blocks = [(time.fromisoformat(a), time.fromisoformat(b)) for a, b in blocks]
+        self.workdays = set(workdays)
+        self.responses = responses
+        self.seed = seed
+        self.overrides = config or {}
+
+    def run(self) -> Dict:
+        self.output.mkdir(parents=True, exist_ok=True)
+        for name in DATA_FILES:
+            (self.output / name).unlink(missing_ok=True)
+
+        clock = VirtualClock(datetime.combine(self.start, time()))
+        scheduler = Scheduler(clock=clock.monotonic)
+        rng = random.Random(self.seed)
+
+        # No system file or environment variables: only what is in the output
+        # directory and the overrides may change the outcome
+        config = ReminderConfig(
+            str(self.output / "reminder_config.json"), system_path=None, environ={},
+            overrides=dict(self.overrides, sound_enabled=False)
+        )
+        stats = ReminderStats(
+            path=str(self.output / STATS_FILE),
+            events_path=str(self.output / SESSION_EVENTS_FILE),
+            snapshot_path=str(self.output / SESSION_SNAPSHOT_FILE),
+            clock=clock.now
+        )
+        history = ReminderHistory(
+            config.get("history_retention"),
+            path=str(self.output / HISTORY_FILE),
+            journal_path=str(self.output / HISTORY_JOURNAL_FILE),
+            clock=clock.now
+        )
+        # The scripted user answers through session.respond
+        notifier = NotificationCenter(NullBackend(answered_elsewhere=True))
+        session = ReminderSession(config, stats, history, scheduler, notifier, clock=clock.now)
+        session.random = rng
+        user = ScriptedUser(self.responses, rng=rng)
+        user.attach(session)
+
+        sessions = 0
+        # The stats file is only a copy of the event log; write it once at the end
+        with stats.batch():
+            for offset in range(self.days):
+                day = self.start + timedelta(days=offset)
+                if day.weekday() not in self.workdays:
+                    continue
+                for begin, end in self.blocks:
+                    self.advance(scheduler, clock, datetime.combine(day, begin))
+                    session.start(self.interval)
+                    sessions += 1
+                    self.advance(scheduler, clock, datetime.combine(day, end))
+                    session.stop()
+                    scheduler.cancel((session.key, "user"))
+            stats.save_stats()
+        history.save_history()
+        stats.close()
+        history.close()
+        return {
+            "days": self.days,
+            "sessions": sessions,
+            "reminders": stats.stats["breaks_shown"],
+            "responses": dict(sorted(user.answered.items())),
+            "simulated_seconds": clock.elapsed,
+            "stats": stats.stats,
+        }
+
+    @staticmethod
+    def advance(scheduler: Scheduler, clock: VirtualClock, until: datetime):
+        """Run every job due before ``until``, jumping the clock from one to the next"""
+        target = (until - clock.start).total_seconds()
+        while True:
+            wakeup = scheduler.next_wakeup()
+            if wakeup is None or wakeup > target:
+                break
+            clock.elapsed = max(clock.elapsed, wakeup)
+            scheduler.run_pending()
+        clock.set(until)
+
+
+def parse_responses(text: str) -> Dict[str, float]:
+    """Parse 'continue=8,ignore=1' into action weights"""
+    weights = {}
+    for part in text.split(","):
+        action, _, weight = part.partition("=")
+        weights[action.strip()] = float(weight or 1)
+    return weights
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate reminder sessions on a virtual clock")
+    parser.add_argument("--days", type=int, default=30, help="calendar days to simulate (default 30)")
+    parser.add_argument("--start", type=date.fromisoformat, default=DEFAULT_START,
+                        help=f"first day, YYYY-MM-DD (default {DEFAULT_START})")
+    parser.add_argument("--interval", default="Pomodoro", help="interval name (default Pomodoro)")
+    parser.add_argument("--responses", type=parse_responses, default=DEFAULT_RESPONSES,
+                        help="action weights such as continue=8,dismissed=1,ignore=1,stop=0.2")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", help="JSON file with config values to override")
+    parser.add_argument("--output", default="simulation", help="directory for the data files")
+    args = parser.parse_args(argv)
+
+    overrides = None
+    if args.config:
+        with open(args.config) as f:
+            overrides = json.load(f)
+    simulation = Simulation(args.output, args.days, args.start, args.interval,
+                            responses=args.responses, seed=args.seed, config=overrides)
+    print(json.dumps(simulation.run(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,444 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+# A journal being folded into the snapshot is parked under this suffix
+COMPACTING_SUFFIX = ".compacting"
+
+
+def atomic_write_json(path: str, data, indent: Optional[int] = 2):
+    """Write JSON to a temp file and rename it over the target"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RetentionPolicy:
+    """Decides how much notification history is kept"""
+
+    def __init__(self, max_entries: Optional[int] = None, max_days: Optional[float] = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.max_entries = max_entries
+        self.max_days = max_days
+        self.clock = clock
+
+    @classmethod
+    def from_config(cls, value: Optional[Dict],
+                    clock: Callable[[], datetime] = datetime.now) -> "RetentionPolicy":
+        value = value or {}
+        return cls(value.get("max_entries"), value.get("max_days"), clock)
+
+    def needs_trim(self, count: int) -> bool:
+        # Allow ~10% slack so trimming the in-memory list is amortized O(1)
+        if not self.max_entries:
+            return False
+        return count > self.max_entries + max(1, self.max_entries // 10)
+
+    def apply(self, entries: List[Dict]) -> List[Dict]:
+        if self.max_days:
+            cutoff = (self.clock() - timedelta(days=self.max_days)).isoformat()
+            start = 0
+            while start < len(entries) and entries[start].get("timestamp", "") < cutoff:
+                start += 1
+            entries = entries[start:]
+        if self.max_entries and len(entries) > self.max_entries:
+            entries = entries[-self.max_entries:]
+        return entries
+
+
+def is_new_entry(last: Optional[Dict], entry: Dict) -> bool:
+    """Whether a journal entry is missing from a snapshot that ends with ``last``
+
+    Entries are numbered (``seq``) as they are journaled, so a line that an
+    interrupted compaction left behind is recognised by its number. Wall-clock
+    timestamps can go backwards (DST, clock changes); they are only compared
+    for lines written before entries were numbered, against a snapshot that
+    has no numbers either.
+    """
+    if last is None:
+        return True
+    seq = entry.get("seq")
+    if seq is not None:
+        return "seq" not in last or seq > last["seq"]
+    return "seq" not in last and entry.get("timestamp", "") > last.get("timestamp", "")
+
+
+def iter_journal(path: str) -> Iterator[Dict]:
+    """Entries of a JSONL journal, skipping a torn last line; nothing if it doesn't exist"""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Torn final line from an interrupted write
+                    continue
+    except OSError:
+        return
+
+
+class HistoryJournal:
+    """Append-only JSONL journal in front of a JSON snapshot file
+
+    Every entry is written as one line to the journal, so the per-entry
+    cost does not depend on how much history is kept. Once enough lines
+    have accumulated the journal is folded into the snapshot on a
+    background thread.
+
+    Every entry gets a ``seq`` number when it is journaled (or earlier,
+    with ``number``); ``load`` uses it to drop lines that a snapshot
+    already holds.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 retention: Optional[RetentionPolicy] = None,
+                 fsync_every: int = 20, fsync_interval: float = 5.0,
+                 compact_after: int = 1000, keep_open: bool = True):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + COMPACTING_SUFFIX
+        self.retention = retention or RetentionPolicy()
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+        # Processes holding many journals close them between appends to save fds
+        self.keep_open = keep_open
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._journal_lines = 0
+        self._next_seq = 1
+        self._compactor = None
+
+    def load(self) -> List[Dict]:
+        entries = self._read_snapshot()
+        last = entries[-1] if entries else None
+        seqs = [entry["seq"] for entry in entries[-1:] if "seq" in entry]
+
+        # A crash mid-compaction can leave entries both in the snapshot and
+        # in a journal; see is_new_entry
+        for path in (self.compacting_path, self.journal_path):
+            for entry in iter_journal(path):
+                if "seq" in entry:
+                    seqs.append(entry["seq"])
+                if is_new_entry(last, entry):
+                    entries.append(entry)
+                    if path == self.journal_path:
+                        self._journal_lines += 1
+
+        with self._lock:
+            self._next_seq = max(seqs, default=0) + 1
+        return self.retention.apply(entries)
+
+    def number(self, entries: List[Dict]):
+        """Give entries that don't have one yet their ``seq``"""
+        with self._lock:
+            for entry in entries:
+                if "seq" not in entry:
+                    entry["seq"] = self._next_seq
+                    self._next_seq += 1
+
+    def append(self, entry: Dict):
+        self.extend([entry])
+
+    def extend(self, entries: List[Dict]):
+        """Append several entries with a single write"""
+        self.number(entries)
+        lines = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a')
+            self._file.write(lines)
+            self._file.flush()
+            self._unsynced += len(entries)
+            self._journal_lines += len(entries)
+
+            now = time.monotonic()
+            if (self._unsynced >= self.fsync_every
+                    or now - self._last_sync >= self.fsync_interval):
+                self._sync_locked()
+            if not self.keep_open:
+                self._file.close()
+                self._file = None
+
+    def should_compact(self) -> bool:
+        return self._journal_lines >= self.compact_after and not self.is_compacting()
+
+    def is_compacting(self) -> bool:
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def compact(self, entries: List[Dict], background: bool = True):
+        """Fold the journal into a snapshot of ``entries``"""
+        self.wait()
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            # Park the current journal so new appends start a fresh one
+            if Path(self.journal_path).exists():
+                os.replace(self.journal_path, self.compacting_path)
+            self._journal_lines = 0
+            snapshot = self.retention.apply(list(entries))
+
+        if background:
+            self._compactor = threading.Thread(
+                target=self._write_snapshot, args=(snapshot,), daemon=True
+            )
+            self._compactor.start()
+        else:
+            self._write_snapshot(snapshot)
+
+    def sync(self):
+        with self._lock:
+            self._sync_locked()
+
+    def wait(self):
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _sync_locked(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _write_snapshot(self, snapshot: List[Dict]):
+        try:
+            atomic_write_json(self.snapshot_path, snapshot)
+            Path(self.compacting_path).unlink(missing_ok=True)
+        except Exception:
+            pass
+
+    def _read_snapshot(self) -> List[Dict]:
+        try:
+            if Path(self.snapshot_path).exists():
+                with open(self.snapshot_path, 'r') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return []
+
+
+class SQLiteStore:
+    """SQLite storage engine for stats and history
+
+    History rows are indexed on timestamp and (action, timestamp) so time
+    range queries only touch the matching rows. Statements are fixed class
+    constants, so sqlite3's statement cache keeps them prepared.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            message TEXT NOT NULL DEFAULT '',
+            activity TEXT NOT NULL DEFAULT '',
+            action TEXT NOT NULL DEFAULT 'continue'
+        );
+        CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+        CREATE INDEX IF NOT EXISTS idx_history_action_timestamp ON history (action, timestamp);
+        CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    INSERT_HISTORY = (
+        "INSERT INTO history (timestamp, message, activity, action) VALUES (?, ?, ?, ?)"
+    )
+    SELECT_RECENT = (
+        "SELECT timestamp, message, activity, action FROM history "
+        "ORDER BY timestamp DESC, id DESC LIMIT ?"
+    )
+    SELECT_ALL = (
+        "SELECT timestamp, message, activity, action FROM history ORDER BY timestamp, id"
+    )
+    SELECT_RANGE = (
+        "SELECT timestamp, message, activity, action FROM history "
+        "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp, id"
+    )
+    SELECT_RANGE_ACTION = (
+        "SELECT timestamp, message, activity, action FROM history "
+        "WHERE action = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp, id"
+    )
+    SELECT_PAGE = (
+        "SELECT timestamp, message, activity, action FROM history "
+        "WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+    )
+    SELECT_PAGE_ACTION = (
+        "SELECT timestamp, message, activity, action FROM history "
+        "WHERE action = ? AND timestamp >= ? AND timestamp < ? "
+        "ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+    )
+    COUNT_RANGE = "SELECT COUNT(*) FROM history WHERE timestamp >= ? AND timestamp < ?"
+    COUNT_RANGE_ACTION = (
+        "SELECT COUNT(*) FROM history WHERE action = ? AND timestamp >= ? AND timestamp < ?"
+    )
+    COUNT_ALL = "SELECT COUNT(*) FROM history"
+    DELETE_BEFORE = "DELETE FROM history WHERE timestamp < ?"
+    DELETE_OLDEST = (
+        "DELETE FROM history WHERE id <= "
+        "(SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)"
+    )
+    DELETE_ALL = "DELETE FROM history"
+    SELECT_STATS = "SELECT key, value FROM stats"
+    UPSERT_STATS = (
+        "INSERT INTO stats (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+    )
+    SELECT_META = "SELECT value FROM meta WHERE key = ?"
+    UPSERT_META = (
+        "INSERT INTO meta (key, value) VALUES (?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+    )
+
+    # Far-future bound for open-ended range queries
+    MAX_TIMESTAMP = "9999-12-31T23:59:59"
+
+    def __init__(self, path: str, trim_every: int = 1000):
+        self.path = path
+        self.trim_every = trim_every
+        self._inserts = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def migrate_from_json(self, stats_path: str, history_path: str, journal_path: str):
+        """Import the JSON data files once; later calls are no-ops"""
+        with self._lock:
+            if self.conn.execute(self.SELECT_META, ("migrated",)).fetchone():
+                return
+
+        entries = HistoryJournal(history_path, journal_path).load()
+        stats = {}
+        try:
+            if Path(stats_path).exists():
+                with open(stats_path, 'r') as f:
+                    stats = json.load(f)
+        except Exception:
+            stats = {}
+
+        with self._lock, self.conn:
+            self.conn.executemany(self.INSERT_HISTORY, (self._row(e) for e in entries))
+            self.conn.executemany(
+                self.UPSERT_STATS, ((k, json.dumps(v)) for k, v in stats.items())
+            )
+            self.conn.execute(self.UPSERT_META, ("migrated", datetime.now().isoformat()))
+
+    def add_history(self, entry: Dict, retention: Optional[RetentionPolicy] = None):
+        with self._lock, self.conn:
+            self.conn.execute(self.INSERT_HISTORY, self._row(entry))
+            self._inserts += 1
+            if retention and self._inserts >= self.trim_every:
+                self._inserts = 0
+                self._trim_locked(retention)
+
+    def add_history_many(self, entries: List[Dict], retention: Optional[RetentionPolicy] = None):
+        with self._lock, self.conn:
+            self.conn.executemany(self.INSERT_HISTORY, (self._row(entry) for entry in entries))
+            self._inserts += len(entries)
+            if retention and self._inserts >= self.trim_every:
+                self._inserts = 0
+                self._trim_locked(retention)
+
+    def recent_history(self, limit: int) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(self.SELECT_RECENT, (limit,)).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def all_history(self) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(self.SELECT_ALL).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def history_between(self, start: str, end: Optional[str] = None,
+                        action: Optional[str] = None) -> List[Dict]:
+        end = end or self.MAX_TIMESTAMP
+        with self._lock:
+            if action is None:
+                rows = self.conn.execute(self.SELECT_RANGE, (start, end)).fetchall()
+            else:
+                rows = self.conn.execute(self.SELECT_RANGE_ACTION, (action, start, end)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def history_page(self, offset: int, limit: int, start: str = "", end: Optional[str] = None,
+                     action: Optional[str] = None) -> List[Dict]:
+        """One page of matching entries, newest first"""
+        end = end or self.MAX_TIMESTAMP
+        with self._lock:
+            if action is None:
+                rows = self.conn.execute(self.SELECT_PAGE, (start, end, limit, offset)).fetchall()
+            else:
+                rows = self.conn.execute(
+                    self.SELECT_PAGE_ACTION, (action, start, end, limit, offset)
+                ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def count_history(self, start: str = "", end: Optional[str] = None,
+                      action: Optional[str] = None) -> int:
+        end = end or self.MAX_TIMESTAMP
+        with self._lock:
+            if action is None:
+                row = self.conn.execute(self.COUNT_RANGE, (start, end)).fetchone()
+            else:
+                row = self.conn.execute(self.COUNT_RANGE_ACTION, (action, start, end)).fetchone()
+        return row[0]
+
+    def clear_history(self):
+        with self._lock, self.conn:
+            self.conn.execute(self.DELETE_ALL)
+
+    def load_stats(self) -> Dict:
+        with self._lock:
+            rows = self.conn.execute(self.SELECT_STATS).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_stats(self, stats: Dict):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                self.UPSERT_STATS, ((k, json.dumps(v)) for k, v in stats.items())
+            )
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _trim_locked(self, retention: RetentionPolicy):
+        if retention.max_days:
+            cutoff = (retention.clock() - timedelta(days=retention.max_days)).isoformat()
+            self.conn.execute(self.DELETE_BEFORE, (cutoff,))
+        if retention.max_entries:
+            self.conn.execute(self.DELETE_OLDEST, (retention.max_entries,))
+
+    @staticmethod
+    def _row(entry: Dict):
+        return (
+            entry.get("timestamp", ""),
+            entry.get("message", ""),
+            entry.get("activity", ""),
+            entry.get("action", "continue"),
+        )
+
+    @staticmethod
+    def _entry(row) -> Dict:
+        return {"timestamp": row[0], "message": row[1], "activity": row[2], "action": row[3]}
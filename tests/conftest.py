@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    """Run every test in its own directory; the app writes its files to the working directory"""
+    monkeypatch.chdir(tmp_path)
+    for name in list(__import__("os").environ):
+        if name.startswith("BREAK_REMINDER_"):
+            monkeypatch.delenv(name)
+    return tmp_path
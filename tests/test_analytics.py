@@ -0,0 +1,26 @@
+import pytest
+
+analytics = pytest.importorskip("analytics")
+
+
+def entries(timestamps, action="continue"):
+    return [{"timestamp": timestamp, "action": action} for timestamp in timestamps]
+
+
+def test_common_interval_in_the_open_last_bin_has_no_upper_edge():
+    arrays = analytics.HistoryArrays.from_entries(
+        entries(f"2024-05-0{day}T10:00:00" for day in range(1, 5))
+    )
+    assert analytics.summary(arrays)["common_interval"] == (240.0, None)
+
+
+def test_common_interval_between_two_edges():
+    arrays = analytics.HistoryArrays.from_entries(
+        entries(f"2024-05-06T10:{minute:02d}:00" for minute in range(0, 50, 7))
+    )
+    assert analytics.summary(arrays)["common_interval"] == (5.0, 10.0)
+
+
+def test_malformed_timestamp_raises_value_error():
+    with pytest.raises(ValueError):
+        analytics.HistoryArrays.from_entries(entries(["not a time"]))
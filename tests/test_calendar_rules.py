@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from calendar_rules import WorkCalendar
+
+SETTINGS = {
+    "enabled": True,
+    "working_hours": [{"days": ["mon", "tue", "wed", "thu", "fri"], "start": "09:00", "end": "17:30"}],
+    "lunch": {"start": "12:30", "end": "13:30"},
+    "do_not_disturb": [
+        {"days": ["wed"], "start": "14:00", "end": "15:00"},
+        {"from": "2024-06-03T10:00", "to": "2024-06-03T12:00"},
+    ],
+}
+
+# 2024-06-03 is a Monday
+MONDAY = datetime(2024, 6, 3)
+
+
+def test_disabled_or_empty_calendar_is_none():
+    assert WorkCalendar.from_config(None) is None
+    assert WorkCalendar.from_config(dict(SETTINGS, enabled=False)) is None
+    assert WorkCalendar.from_config({"enabled": True}) is None
+
+
+def test_allowed_moment_is_returned_as_is():
+    calendar = WorkCalendar.from_config(SETTINGS)
+    assert calendar.next_allowed(MONDAY.replace(hour=9, minute=30)) == MONDAY.replace(hour=9, minute=30)
+
+
+def test_one_off_block_and_lunch_are_skipped():
+    calendar = WorkCalendar.from_config(SETTINGS)
+    # The block runs to 12:00, then 12:00-12:30 is free
+    assert calendar.next_allowed(MONDAY.replace(hour=10, minute=15)) == MONDAY.replace(hour=12)
+    assert calendar.next_allowed(MONDAY.replace(hour=12, minute=45)) == MONDAY.replace(hour=13, minute=30)
+
+
+def test_recurring_do_not_disturb():
+    calendar = WorkCalendar.from_config(SETTINGS)
+    wednesday = MONDAY + timedelta(days=2)
+    assert not calendar.allowed(wednesday.replace(hour=14, minute=30))
+    assert calendar.next_allowed(wednesday.replace(hour=14, minute=30)) == wednesday.replace(hour=15)
+
+
+def test_evening_and_weekend_move_to_the_next_working_morning():
+    calendar = WorkCalendar.from_config(SETTINGS)
+    assert calendar.next_allowed(MONDAY.replace(hour=18)) == MONDAY.replace(day=4, hour=9)
+    friday_evening = (MONDAY + timedelta(days=4)).replace(hour=17, minute=45)
+    assert calendar.next_allowed(friday_evening) == (MONDAY + timedelta(days=7)).replace(hour=9)
+
+
+def test_nothing_allowed_within_the_horizon():
+    calendar = WorkCalendar.from_config({
+        "enabled": True,
+        "do_not_disturb": [{"from": "2024-06-03T00:00", "to": "2026-06-03T00:00"}],
+    })
+    assert calendar.next_allowed(MONDAY) is None
@@ -0,0 +1,113 @@
+import json
+
+from config_layers import FrozenConfig, deep_merge, env_overrides, parse_assignment, validate
+from ver4 import ReminderConfig
+
+
+def make_config(tmp_path, user=None, system=None, environ=None, overrides=None):
+    user_path, system_path = tmp_path / "user.json", tmp_path / "system.json"
+    if user is not None:
+        user_path.write_text(json.dumps(user))
+    if system is not None:
+        system_path.write_text(json.dumps(system))
+    return ReminderConfig(str(user_path), save_delay=0.01, system_path=str(system_path),
+                          environ=environ or {}, overrides=overrides)
+
+
+def test_deep_merge_merges_dicts_and_replaces_lists():
+    base = {"intervals": {"A": 1, "B": 2}, "messages": ["x", "y"]}
+    merged = deep_merge(base, {"intervals": {"B": 3}, "messages": ["z"]})
+    assert merged == {"intervals": {"A": 1, "B": 3}, "messages": ["z"]}
+    assert base["intervals"] == {"A": 1, "B": 2}
+
+
+def test_env_and_assignment_layers():
+    environ = {
+        "BREAK_REMINDER_SOUND_ENABLED": "false",
+        "BREAK_REMINDER_IDLE_DETECTION__IDLE_MINUTES": "10",
+        "BREAK_REMINDER_SERVER_TOKEN": "secret",
+        "OTHER": "1",
+    }
+    assert env_overrides(environ) == {"sound_enabled": False, "idle_detection": {"idle_minutes": 10}}
+    assert parse_assignment("intervals.Short Break=60") == {"intervals": {"Short Break": 60}}
+
+
+def test_validate_replaces_wrong_kinds_and_choices():
+    defaults = {"sound_enabled": True, "policy": "reset", "nested": {"minutes": 5}}
+    values, problems = validate(
+        {"sound_enabled": "yes", "policy": "later", "nested": {"minutes": 7}, "extra": 1},
+        defaults, choices={"policy": ("reset", "resume")}
+    )
+    assert values == {"sound_enabled": True, "policy": "reset", "nested": {"minutes": 7}, "extra": 1}
+    assert len(problems) == 2
+
+
+def test_layers_apply_in_order(tmp_path):
+    config = make_config(
+        tmp_path,
+        system={"sound_enabled": False, "idle_detection": {"idle_minutes": 7}},
+        user={"intervals": {"Pomodoro": 3000}},
+        environ={"BREAK_REMINDER_IDLE_DETECTION__ON_RETURN": "resume"},
+        overrides={"idle_detection": {"idle_minutes": 9}},
+    )
+    snapshot = config.snapshot
+    assert snapshot.sound_enabled is False
+    assert snapshot.intervals["Pomodoro"] == 3000
+    assert snapshot.intervals["Short Break"] == ReminderConfig.DEFAULT_CONFIG["intervals"]["Short Break"]
+    assert snapshot.idle_detection.idle_minutes == 9
+    assert snapshot.idle_detection.on_return == "resume"
+    assert config.problems == []
+
+
+def test_invalid_values_fall_back_with_a_problem(tmp_path):
+    config = make_config(tmp_path, user={"sound_enabled": "loud", "intervals": {"Pomodoro": -5}})
+    assert config.snapshot.sound_enabled == ReminderConfig.DEFAULT_CONFIG["sound_enabled"]
+    assert "Pomodoro" not in config.snapshot.intervals
+    assert len(config.problems) == 2
+
+
+def test_snapshot_is_read_only():
+    snapshot = FrozenConfig({"idle_detection": {"idle_minutes": 5}, "messages": ["a"]})
+    assert snapshot.idle_detection.idle_minutes == 5
+    assert snapshot.messages == ("a",)
+    try:
+        snapshot.messages = []
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("snapshot accepted an assignment")
+
+
+def test_set_writes_only_the_user_layer(tmp_path):
+    config = make_config(tmp_path, system={"idle_detection": {"idle_minutes": 7}})
+    config.set("idle_detection.enabled", False)
+    config.flush()
+    assert json.loads((tmp_path / "user.json").read_text()) == {"idle_detection": {"enabled": False}}
+    assert config.snapshot.idle_detection.idle_minutes == 7
+
+
+def test_overridden_user_values_are_reported(tmp_path):
+    config = make_config(tmp_path, user={"sound_enabled": True},
+                         environ={"BREAK_REMINDER_SOUND_ENABLED": "false"})
+    assert config.snapshot.sound_enabled is False
+    assert config.shadowed_by("sound_enabled") == "an environment variable"
+    assert any(problem.startswith("sound_enabled:") for problem in config.problems)
+
+
+def test_bad_calendar_rule_is_reported_and_disabled(tmp_path):
+    calendar = {"enabled": True, "working_hours": [{"start": "9:xx", "end": "17:00"}]}
+    config = make_config(tmp_path, user={"calendar": calendar})
+    assert config.snapshot.calendar.enabled is False
+    assert any(problem.startswith("calendar:") for problem in config.problems)
+
+
+def test_failed_save_keeps_the_change_pending(tmp_path):
+    config = make_config(tmp_path)
+    config.path = str(tmp_path / "missing" / "user.json")
+    config.set("sound_enabled", False)
+    config.flush()
+    assert config._dirty
+    (tmp_path / "missing").mkdir()
+    config.flush()
+    assert not config._dirty
+    assert json.loads((tmp_path / "missing" / "user.json").read_text()) == {"sound_enabled": False}
@@ -0,0 +1,79 @@
+import threading
+from datetime import datetime
+
+from eventbus import EventBus, Sink, StatsSink
+from ver4 import ReminderStats
+
+
+class RecordingSink(Sink):
+    name = "recording"
+    batch_size = 3
+    flush_interval = 0.05
+
+    def __init__(self, topics=None, gate=None):
+        self.topics = topics
+        self.gate = gate
+        self.writing = threading.Event()
+        self.batches = []
+
+    def write(self, batch):
+        self.writing.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.batches.append([item["data"] for item in batch])
+
+
+def test_flush_writes_everything_in_batches():
+    bus = EventBus()
+    sink = RecordingSink()
+    worker = bus.add_sink(sink)
+    for i in range(10):
+        bus.publish("tick", i)
+    assert bus.flush(5)
+    assert [value for batch in sink.batches for value in batch] == list(range(10))
+    assert all(len(batch) <= 3 for batch in sink.batches)
+    assert worker.delivered == 10 and worker.dropped == 0
+    bus.close()
+
+
+def test_sinks_only_get_their_topics():
+    bus = EventBus()
+    history = bus.add_sink(RecordingSink(topics=("history_entry",))).sink
+    everything = bus.add_sink(RecordingSink()).sink
+    bus.publish("history_entry", 1)
+    bus.publish("break_shown", 2)
+    bus.close()
+    assert history.batches == [[1]]
+    assert sorted(value for batch in everything.batches for value in batch) == [1, 2]
+
+
+def test_a_full_queue_drops_the_oldest_events():
+    gate = threading.Event()
+    bus = EventBus()
+    sink = RecordingSink(gate=gate)
+    sink.batch_size = 1
+    sink.max_pending = 5
+    worker = bus.add_sink(sink)
+
+    bus.publish("tick", 0)
+    assert sink.writing.wait(5)  # the worker is now stuck on the first event
+    for i in range(1, 11):
+        bus.publish("tick", i)
+    assert len(worker.pending) == 5
+    gate.set()
+    assert bus.flush(5)
+    assert [batch[0] for batch in sink.batches] == [0, 6, 7, 8, 9, 10]
+    assert worker.dropped == 5
+    bus.close()
+
+
+def test_stats_are_reported_after_they_are_applied(tmp_path):
+    stats = ReminderStats(path=str(tmp_path / "stats.json"), events_path=str(tmp_path / "events.jsonl"),
+                          snapshot_path=str(tmp_path / "snapshot.json"))
+    seen = []
+    bus = EventBus()
+    bus.add_sink(StatsSink(stats, on_applied=lambda types: seen.append((types, stats.stats["total_breaks"]))))
+    bus.publish("stats_event", {"type": "break_accepted", "time": datetime(2024, 6, 3, 9).isoformat()})
+    bus.close()
+    stats.close()
+    assert seen == [(["break_accepted"], 1)]
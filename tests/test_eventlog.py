@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from eventlog import SessionEventLog
+
+
+def make_log(tmp_path, now, rotate_bytes=500):
+    return SessionEventLog(str(tmp_path / "events.jsonl"), str(tmp_path / "snapshot.json"),
+                           snapshot_every=1000, clock=lambda: now[0], rotate_bytes=rotate_bytes)
+
+
+def run_sessions(log, now, count):
+    for _ in range(count):
+        log.append("session_start")
+        for _ in range(3):
+            now[0] += timedelta(minutes=20)
+            log.append("break_shown")
+            log.append("break_accepted")
+        now[0] += timedelta(minutes=5)
+        log.append("session_stop")
+        now[0] += timedelta(hours=1)
+
+
+def test_rotation_archives_segments_and_rebuilds_from_all_of_them(tmp_path):
+    now = [datetime(2024, 5, 6, 9, 0)]
+    log = make_log(tmp_path, now)
+    log.load()
+    run_sessions(log, now, 6)
+    log.close()
+    assert log.segments >= 2
+    assert Path(tmp_path / "events.1.jsonl").exists()
+    stats = dict(log.projection.stats)
+    assert stats["total_sessions"] == 6 and stats["total_breaks"] == 18
+
+    reopened = make_log(tmp_path, now)
+    assert reopened.load().stats == stats
+    assert reopened.rebuild().stats == stats
+
+
+def test_crash_after_rotation_rebuilds(tmp_path):
+    now = [datetime(2024, 5, 6, 9, 0)]
+    log = make_log(tmp_path, now, rotate_bytes=0)
+    log.load()
+    run_sessions(log, now, 2)
+    log.close()
+    stats = dict(log.projection.stats)
+    # The log was archived but the snapshot still describes the old layout
+    Path(tmp_path / "events.jsonl").replace(tmp_path / "events.1.jsonl")
+
+    reopened = make_log(tmp_path, now)
+    assert reopened.load().stats == stats
+    assert reopened.segments == 1
@@ -0,0 +1,119 @@
+import asyncio
+
+from scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_jobs_run_in_deadline_order_then_insertion_order():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    for name, delay in (("c", 3), ("a", 1), ("b1", 2), ("b2", 2)):
+        scheduler.call_later(delay, lambda name=name: ran.append(name))
+    clock.now = 5
+    assert scheduler.run_pending() == 4
+    assert ran == ["a", "b1", "b2", "c"]
+
+
+def test_only_due_jobs_run():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.call_later(10, lambda: ran.append("later"))
+    scheduler.call_later(1, lambda: ran.append("soon"))
+    clock.now = 2
+    scheduler.run_pending()
+    assert ran == ["soon"]
+    assert scheduler.next_deadline() == 10
+
+
+def test_same_key_replaces_and_cancel_removes():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.call_later(1, lambda: ran.append("old"), key="job")
+    scheduler.call_later(2, lambda: ran.append("new"), key="job")
+    scheduler.call_later(3, lambda: ran.append("gone"), key="other")
+    assert scheduler.cancel("other")
+    clock.now = 5
+    scheduler.run_pending()
+    assert ran == ["new"]
+    assert len(scheduler) == 0
+
+
+def test_recurring_jobs_keep_their_grid():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    scheduler.every(10, lambda: None, key="tick")
+    clock.now = 10.5  # ran late
+    scheduler.run_pending()
+    assert scheduler.get("tick").deadline == 20
+    clock.now = 45  # missed two slots
+    scheduler.run_pending()
+    assert scheduler.get("tick").deadline == 50
+
+
+def test_slack_coalesces_nearby_jobs_and_keeps_the_heap_valid():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock, slack=30)
+    ran = []
+    for i in range(200):
+        scheduler.call_at(100 + i * 7, lambda i=i: ran.append(i), slack=30)
+    clock.now = scheduler.next_wakeup()
+    assert clock.now == 130
+    fired = scheduler.run_pending()
+    assert fired == len(ran) > 1
+    assert len(scheduler) == 200 - fired
+    heap = scheduler._heap
+    assert all(not heap[i] < heap[(i - 1) // 2] for i in range(1, len(heap)))
+
+
+def test_failing_job_is_logged_and_the_rest_still_run(caplog):
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    ran = []
+    scheduler.call_later(1, lambda: 1 / 0, key="broken")
+    scheduler.call_later(2, lambda: ran.append("next"))
+    clock.now = 5
+    assert scheduler.run_pending() == 2
+    assert ran == ["next"]
+    assert "'broken' failed" in caplog.text
+
+
+def test_run_pending_limit():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    for _ in range(5):
+        scheduler.call_later(0, lambda: None)
+    assert scheduler.run_pending(limit=2) == 2
+    assert scheduler.run_pending() == 3
+
+
+def test_run_async_lets_other_tasks_in_between_batches():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    order = []
+    for i in range(10):
+        scheduler.call_later(0, lambda i=i: order.append(i))
+
+    async def main():
+        stop = asyncio.Event()
+
+        def finish():
+            stop.set()
+            scheduler.wake()
+
+        scheduler.call_later(0, finish)
+        other = asyncio.get_running_loop().call_soon(lambda: order.append("other"))
+        await scheduler.run_async(stop, batch=4)
+        other.cancel()
+
+    asyncio.run(main())
+    assert order.index("other") == 4
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from notifications import NotificationCenter, NullBackend
+from scheduler import Scheduler
+from ver4 import ReminderConfig, ReminderHistory, ReminderSession, ReminderStats
+
+
+class Clock:
+    def __init__(self):
+        self.start = datetime(2024, 5, 6, 9, 0)
+        self.elapsed = 0.0
+
+    def monotonic(self):
+        return self.elapsed
+
+    def now(self):
+        return self.start + timedelta(seconds=self.elapsed)
+
+
+def run_unanswered(tmp_path, backend):
+    clock = Clock()
+    scheduler = Scheduler(clock=clock.monotonic)
+    config = ReminderConfig(str(tmp_path / "config.json"), system_path=None, environ={},
+                            overrides={"sound_enabled": False, "idle_detection": {"enabled": False}})
+    stats = ReminderStats(path=str(tmp_path / "stats.json"),
+                          events_path=str(tmp_path / "events.jsonl"),
+                          snapshot_path=str(tmp_path / "snapshot.json"), clock=clock.now)
+    history = ReminderHistory(None, path=str(tmp_path / "history.json"),
+                              journal_path=str(tmp_path / "history.jsonl"), clock=clock.now)
+    session = ReminderSession(config, stats, history, scheduler, NotificationCenter(backend),
+                              clock=clock.now)
+    session.start("Short Break")
+    for _ in range(3):
+        clock.elapsed = scheduler.next_deadline()
+        scheduler.run_pending()
+    session.stop()
+    actions = [entry["action"] for entry in history.recent(10)]
+    skipped = stats.stats["breaks_skipped"]
+    stats.close()
+    history.close()
+    return actions, skipped
+
+
+def test_reminders_nobody_can_answer_are_not_skips(tmp_path):
+    actions, skipped = run_unanswered(tmp_path, NullBackend())
+    assert actions == ["shown_only", "shown_only"]
+    assert skipped == 0
+
+
+def test_unanswered_reminders_are_missed_when_answers_can_arrive(tmp_path):
+    actions, skipped = run_unanswered(tmp_path, NullBackend(answered_elsewhere=True))
+    assert actions == ["missed", "missed"]
+    assert skipped == 2
@@ -0,0 +1,25 @@
+from simulate import DATA_FILES, Simulation
+
+
+def run(output, **kwargs):
+    return Simulation(output, days=7, seed=3, **kwargs).run()
+
+
+def test_same_seed_gives_identical_files(tmp_path):
+    first, second = run(tmp_path / "a"), run(tmp_path / "b")
+    assert first == second
+    for name in DATA_FILES:
+        a, b = tmp_path / "a" / name, tmp_path / "b" / name
+        assert a.exists() == b.exists()
+        if a.exists():
+            assert a.read_bytes() == b.read_bytes(), name
+
+
+def test_figures_add_up(tmp_path):
+    report = run(tmp_path, responses=["continue"])
+    stats = report["stats"]
+    # Five working days, two sessions a day, every reminder accepted
+    assert report["sessions"] == stats["total_sessions"] == stats["completed_sessions"] == 10
+    assert stats["total_breaks"] == stats["breaks_shown"] == report["reminders"] > 0
+    assert stats["breaks_skipped"] == 0
+    assert stats["total_work_time"] == 5 * 7.5 * 3600
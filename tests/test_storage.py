@@ -0,0 +1,63 @@
+import json
+
+from storage import COMPACTING_SUFFIX, HistoryJournal, is_new_entry
+
+
+def entry(timestamp, action="continue"):
+    return {"timestamp": timestamp, "message": "m", "activity": "", "action": action}
+
+
+def test_entries_are_numbered_in_order(tmp_path):
+    journal = HistoryJournal(str(tmp_path / "h.json"), str(tmp_path / "h.jsonl"))
+    entries = [entry("2024-06-03T09:00:00"), entry("2024-06-03T09:25:00")]
+    journal.extend(entries)
+    journal.close()
+    assert [e["seq"] for e in entries] == [1, 2]
+
+
+def test_clock_going_back_keeps_every_entry(tmp_path):
+    # 01:30 and 01:50, then the DST change puts the clock back to 01:10
+    journal = HistoryJournal(str(tmp_path / "h.json"), str(tmp_path / "h.jsonl"))
+    journal.compact([], background=False)
+    for timestamp in ("2024-10-27T01:30:00", "2024-10-27T01:50:00", "2024-10-27T01:10:00"):
+        journal.append(entry(timestamp))
+    journal.close()
+
+    reloaded = HistoryJournal(str(tmp_path / "h.json"), str(tmp_path / "h.jsonl"))
+    assert [e["timestamp"][11:16] for e in reloaded.load()] == ["01:30", "01:50", "01:10"]
+
+
+def test_lines_already_in_the_snapshot_are_dropped(tmp_path):
+    snapshot, journal_path = tmp_path / "h.json", tmp_path / "h.jsonl"
+    journal = HistoryJournal(str(snapshot), str(journal_path))
+    entries = [entry(f"2024-06-03T09:{minute:02d}:00") for minute in range(5)]
+    journal.extend(entries)
+    journal.close()
+    # A crash after the snapshot was written but before the parked journal was removed
+    journal_path.rename(str(journal_path) + COMPACTING_SUFFIX)
+    snapshot.write_text(json.dumps(entries[:3]))
+
+    loaded = HistoryJournal(str(snapshot), str(journal_path)).load()
+    assert [e["seq"] for e in loaded] == [1, 2, 3, 4, 5]
+
+
+def test_numbering_continues_after_reload(tmp_path):
+    journal = HistoryJournal(str(tmp_path / "h.json"), str(tmp_path / "h.jsonl"))
+    journal.extend([entry("2024-06-03T09:00:00"), entry("2024-06-03T09:25:00")])
+    journal.close()
+
+    reloaded = HistoryJournal(str(tmp_path / "h.json"), str(tmp_path / "h.jsonl"))
+    reloaded.load()
+    later = entry("2024-06-03T09:50:00")
+    reloaded.append(later)
+    reloaded.close()
+    assert later["seq"] == 3
+
+
+def test_is_new_entry_falls_back_to_timestamps_without_seq():
+    last = entry("2024-06-03T09:25:00")
+    assert is_new_entry(None, last)
+    assert is_new_entry(last, entry("2024-06-03T09:50:00"))
+    assert not is_new_entry(last, entry("2024-06-03T09:00:00"))
+    assert not is_new_entry(dict(last, seq=4), dict(last, seq=4))
+    assert is_new_entry(dict(last, seq=4), dict(last, seq=5))
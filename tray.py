@@ -0,0 +1,104 @@
+import queue
+import threading
+from typing import Callable, Dict, Optional
+
+
+class TrayService:
+    """Long-lived system tray icon with a menu that updates in place
+
+    The pystray icon and its thread are created once. Menu entries read
+    ``state`` when the menu is rebuilt, so changing the session only
+    needs ``update()``. Clicks never call into the application directly:
+    they put a command name on ``commands`` and call ``on_command`` so the
+    owner can drain the queue on its own thread.
+    """
+
+    def __init__(self, image, name: str = "AdvancedBreakReminder",
+                 title: str = "Advanced Break Reminder", show_app: bool = True):
+        self.image = image
+        self.name = name
+        self.title = title
+        self.show_app = show_app
+        self.commands = queue.Queue()
+        self.on_command: Optional[Callable[[], None]] = None
+        self.state: Dict = {"running": False, "paused": False, "next_break": None}
+        self.icon = None
+        self._thread = None
+
+    def start(self):
+        """Show the icon from a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.create().run, daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Show the icon on the calling thread until stop(); macOS needs the main thread"""
+        self.create().run()
+
+    def create(self):
+        """Build the pystray icon without showing it"""
+        if self.icon is not None:
+            return self.icon
+        import pystray
+        from pystray import Menu, MenuItem as item
+
+        running = lambda menu_item: self.state["running"]
+        stopped = lambda menu_item: not self.state["running"]
+        paused = lambda menu_item: self.state["running"] and self.state["paused"]
+        active = lambda menu_item: self.state["running"] and not self.state["paused"]
+
+        menu = Menu(
+            item(lambda menu_item: self.status_text(), None, enabled=False),
+            Menu.SEPARATOR,
+            item('Show App', self.post("show"), default=True, visible=self.show_app),
+            item('Settings', self.post("settings"), visible=self.show_app),
+            item('Start Session', self.post("start"), visible=stopped),
+            item('Pause Session', self.post("pause"), visible=active),
+            item('Resume Session', self.post("resume"), visible=paused),
+            item('Stop Session', self.post("stop"), visible=running),
+            item('Quit', self.post("quit"))
+        )
+        self.icon = pystray.Icon(self.name, self.image, self.title, menu)
+        return self.icon
+
+    def post(self, command: str):
+        def callback(icon=None, menu_item=None):
+            self.commands.put(command)
+            if self.on_command is not None:
+                self.on_command()
+        return callback
+
+    def drain(self, handler: Callable[[str], None]) -> int:
+        """Run ``handler`` for each queued command on the caller's thread"""
+        handled = 0
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                return handled
+            handler(command)
+            handled += 1
+
+    def status_text(self) -> str:
+        if not self.state["running"]:
+            return "No session running"
+        if self.state["paused"]:
+            return "Session paused"
+        if self.state["next_break"]:
+            return f"Next break at {self.state['next_break']:%H:%M}"
+        return "Session running"
+
+    def update(self, **state):
+        self.state.update(state)
+        if self.icon is not None:
+            self.icon.update_menu()
+
+    def stop(self):
+        if self.icon is None:
+            return
+        self.icon.stop()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.icon = None
+        self._thread = None
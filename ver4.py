@@ -3,23 +3,80 @@ import json
 import threading
 import time
 import random
-import winsound
+import bisect
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List
-import customtkinter as ctk
-from tkinter import messagebox, filedialog
-from PIL import Image, ImageDraw
-import pystray
-from pystray import MenuItem as item
+from typing import Callable, Dict, List, Mapping, Optional
+from storage import HistoryJournal, RetentionPolicy, SQLiteStore, atomic_write_json
+from scheduler import Scheduler, TkDriver
+from notifications import Notification, NotificationCenter, create_backend
+from icons import CountdownUpdater, IconCache
+from tray import TrayService
+from eventlog import SessionEventLog
+from audio import AudioEngine, create_audio_backend
+from idle import IdleMonitor
+from clockwatch import CATCH_UP_POLICIES, ClockWatch
+from calendar_rules import WorkCalendar
+from eventbus import EventBus
+from config_layers import (
+    SYSTEM_CONFIG_FILE, FrozenConfig, covers, deep_merge, env_overrides, file_stamp, leaf_paths,
+    parse_assignment, read_layer, thaw, validate
+)
+from metrics import METRICS, LoopLagProbe, enable_from_config, timed
+
+# GUI toolkits are imported on first use (see load_gui) so tray-only and
+# headless launches never pay for customtkinter
+ctk = None
+messagebox = None
+filedialog = None
+
+def load_gui():
+    global ctk, messagebox, filedialog
+    if ctk is None:
+        import customtkinter
+        from tkinter import messagebox as tk_messagebox, filedialog as tk_filedialog
+        ctk, messagebox, filedialog = customtkinter, tk_messagebox, tk_filedialog
 
 # Configuration files
 CONFIG_FILE = "reminder_config.json"
 STATS_FILE = "reminder_stats.json"
 HISTORY_FILE = "reminder_history.json"
+HISTORY_JOURNAL_FILE = "reminder_history.jsonl"
+SESSION_EVENTS_FILE = "reminder_events.jsonl"
+SESSION_SNAPSHOT_FILE = "reminder_events_snapshot.json"
+DATABASE_FILE = "reminder_data.db"
+
+# Seconds config changes are held back so bursts turn into one write
+CONFIG_SAVE_DELAY = 0.5
+# Scheduler key of the delayed save (see ReminderConfig.use_scheduler)
+CONFIG_SAVE_KEY = "config_save"
+# Seconds the stats file copy may lag behind the event log
+STATS_SAVE_DELAY = 5.0
+STATS_SAVE_KEY = "stats_save"
+
+# Seconds an unanswered reminder waits before auto-continuing
+AUTO_CONTINUE_TIMEOUT = 60
+
+# Instrumentation: how often the loop-lag probe runs and the metrics panel refreshes
+LAG_PROBE_SECONDS = 1.0
+METRICS_REFRESH_MS = 1000
+
+# History window: rows on screen, entries fetched per page, rows per wheel step
+HISTORY_VISIBLE_ROWS = 10
+HISTORY_PAGE_SIZE = 100
+HISTORY_SCROLL_ROWS = 3
 
 class ReminderConfig:
-    """Manages application configuration"""
+    """Manages application configuration
+    
+    Defaults, the system file, the user file, ``BREAK_REMINDER_*``
+    environment variables and command-line overrides are merged, validated
+    and frozen into ``snapshot`` (see config_layers.py). ``set`` changes
+    the user layer and only that layer is written back to the user file.
+    """
     
     DEFAULT_CONFIG = {
         "intervals": {
@@ -47,127 +104,932 @@ class ReminderConfig:
         ],
         "sound_enabled": True,
         "sound_file": "",  # Custom sound file path
+        "audio_backend": "auto",  # auto, winsound, subprocess, bell or null
+        "catch_up_policy": "reset",  # after a suspend: reset, skip or fire_once
+        "idle_detection": {
+            "enabled": True,
+            "idle_minutes": 5,
+            "on_return": "reset",  # reset: fresh interval, resume: pick up where paused
+            "source": "auto"  # auto, x11, mutter, windows or fake
+        },
+        "calendar": {
+            "enabled": False,
+            "working_hours": [
+                {"days": ["mon", "tue", "wed", "thu", "fri"], "start": "09:00", "end": "17:30"}
+            ],
+            "lunch": {"start": "12:30", "end": "13:30"},
+            "do_not_disturb": []  # {"days", "start", "end"} or one-off {"from", "to"}
+        },
         "auto_continue": False,
-        "show_activity_suggestion": True
+        "show_activity_suggestion": True,
+        "history_retention": {
+            "max_entries": 100000,
+            "max_days": 365
+        },
+        "storage_backend": "json",  # "json" or "sqlite"
+        "low_power": {
+            "enabled": False,
+            "slack_seconds": 30  # how late timers may run to share a wakeup
+        },
+        "instrumentation": {
+            "enabled": False,
+            "port": 9477  # /metrics on localhost; 0 for the debug panel only
+        },
+        "event_bus": {
+            "enabled": False,  # write history and stats on worker threads
+            "log_file": "",  # rotating JSONL log of session events
+            "log_max_bytes": 1048576,
+            "log_backups": 3,
+            "webhook_url": ""  # POST session events here in batches
+        },
+        "notification_backend": "auto"  # "auto", "toast", "freedesktop" or "null"
+    }
+    # Shared by every snapshot that keeps a default value unchanged
+    FROZEN_DEFAULTS = FrozenConfig(DEFAULT_CONFIG)
+    # Allowed values of string options, by dotted path
+    CHOICES = {
+        "catch_up_policy": CATCH_UP_POLICIES,
+        "storage_backend": ("json", "sqlite"),
+        "idle_detection.on_return": ("reset", "resume")
     }
+    # Options that may be null
+    NULLABLE = ("history_retention.max_entries", "history_retention.max_days")
+    
+    def __init__(self, path: str = None, save_delay: float = CONFIG_SAVE_DELAY,
+                 system_path: Optional[str] = SYSTEM_CONFIG_FILE,
+                 environ: Optional[Mapping[str, str]] = None, overrides: Optional[Dict] = None):
+        self.path = path or CONFIG_FILE
+        self.system_path = system_path  # None: no system layer
+        self.save_delay = save_delay
+        self.env = env_overrides(environ)
+        self.overrides = thaw(overrides or {})
+        
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._batch_depth = 0
+        self._save_timer = None
+        self._stamps = None
+        self._file_problems: List[str] = []
+        self.scheduler = None  # see use_scheduler
+        
+        self.system: Dict = {}
+        self.user: Dict = {}
+        self.problems: List[str] = []  # invalid values replaced by defaults
+        self.snapshot: FrozenConfig = None
+        self.load_config()
     
-    def __init__(self):
-        self.config = self.load_config()
+    def use_scheduler(self, scheduler: Scheduler):
+        """Run delayed saves as scheduler jobs instead of a timer thread
+        
+        The save then shares a wakeup with other timers and runs on the
+        scheduler's thread.
+        """
+        self.scheduler = scheduler
+    
+    def load_config(self) -> FrozenConfig:
+        """Read both files and resolve all layers into a new snapshot"""
+        stamps = (file_stamp(self.system_path), file_stamp(self.path))
+        problems = []
+        layers = []
+        for path in (self.system_path, self.path):
+            try:
+                layers.append(read_layer(path))
+            except ValueError as e:
+                problems.append(str(e))
+                layers.append({})
+        with self._lock:
+            self.system, self.user = layers
+            self._stamps = stamps
+            self._file_problems = problems
+            self._compile()
+        return self.snapshot
     
-    def load_config(self) -> Dict:
+    def reload_if_changed(self) -> bool:
+        """Reload if either file changed on disk; two stat calls when neither did
+        
+        Unsaved changes win over the file: no reload until they are written.
+        """
+        if self._dirty:
+            return False
+        if (file_stamp(self.system_path), file_stamp(self.path)) == self._stamps:
+            return False
+        self.load_config()
+        return True
+    
+    def _compile(self):
+        # Called with the lock held
+        merged = self.DEFAULT_CONFIG
+        for layer in (self.system, self.user, self.env, self.overrides):
+            merged = deep_merge(merged, layer)
+        values, found = validate(merged, self.DEFAULT_CONFIG, self.CHOICES, self.NULLABLE)
+        problems = self._file_problems + found
+        if self.env or self.overrides:
+            for path in leaf_paths(self.user):
+                source = self.shadowed_by(path)
+                if source is not None:
+                    problems.append(f"{'.'.join(path)}: the value in {self.path} is overridden "
+                                    f"by {source}")
+        
+        intervals = {}
+        for name, seconds in values["intervals"].items():
+            if isinstance(seconds, (int, float)) and not isinstance(seconds, bool) and seconds > 0:
+                intervals[name] = seconds
+            else:
+                problems.append(f"intervals.{name}: expected a positive number of seconds, "
+                                f"got {seconds!r}; left out")
+        values["intervals"] = intervals or self.DEFAULT_CONFIG["intervals"]
+        if values["current_interval"] not in values["intervals"]:
+            problems.append(f"current_interval: no interval named {values['current_interval']!r}; "
+                            f"using the first one")
+            values["current_interval"] = next(iter(values["intervals"]))
+        if not values["messages"]:
+            values["messages"] = self.DEFAULT_CONFIG["messages"]
         try:
-            if Path(CONFIG_FILE).exists():
-                with open(CONFIG_FILE, 'r') as f:
-                    loaded = json.load(f)
-                    # Merge with defaults to handle missing keys
-                    config = self.DEFAULT_CONFIG.copy()
-                    config.update(loaded)
-                    return config
-            return self.DEFAULT_CONFIG.copy()
-        except Exception:
-            return self.DEFAULT_CONFIG.copy()
+            WorkCalendar.from_config(values["calendar"])
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            problems.append(f"calendar: {e}; reminders are not held back by the calendar")
+            values["calendar"] = self.DEFAULT_CONFIG["calendar"]
+        
+        defaults = self.DEFAULT_CONFIG
+        for key, value in values.items():
+            if key in defaults and (value is defaults[key] or value == defaults[key]):
+                values[key] = self.FROZEN_DEFAULTS[key]
+        # One assignment, so readers never see half an update
+        self.snapshot = FrozenConfig(values)
+        self.problems = problems
     
+    @timed("reminder_save_seconds", file="config")
     def save_config(self):
+        # Copy the user layer under the lock, then write to a temp file and rename it in
+        with self._lock:
+            data = thaw(self.user)
+            self._dirty = False
         try:
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            atomic_write_json(self.path, data)
         except Exception:
-            pass
+            # Still unsaved: flush() schedules another try
+            with self._lock:
+                self._dirty = True
+            return
+        # Our own write is not a change to reload
+        self._stamps = (self._stamps[0], file_stamp(self.path))
     
     def get(self, key: str, default=None):
-        return self.config.get(key, default)
+        return self.snapshot.get(key, default)
+    
+    def set(self, key, value):
+        """Store ``value`` in the user file
+        
+        ``key`` is a name, a dotted path such as ``idle_detection.enabled``
+        or a tuple of names; a path sets just that field and keeps the rest
+        of the user file's dict.
+        """
+        path = key.split(".") if isinstance(key, str) else list(key)
+        with self._lock:
+            layer = self.user
+            for name in path[:-1]:
+                if not isinstance(layer.get(name), dict):
+                    layer[name] = {}
+                layer = layer[name]
+            layer[path[-1]] = thaw(value)
+            self._dirty = True
+            self._compile()
+        if self._batch_depth == 0:
+            self.schedule_save()
+    
+    def shadowed_by(self, key) -> Optional[str]:
+        """The layer above the user file that sets ``key`` (a path as for set), if any"""
+        path = key.split(".") if isinstance(key, str) else list(key)
+        if covers(self.overrides, path):
+            return "--set"
+        if covers(self.env, path):
+            return "an environment variable"
+        return None
+    
+    @contextmanager
+    def batch(self):
+        """Group several set() calls into a single write"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self.schedule_save()
     
-    def set(self, key: str, value):
-        self.config[key] = value
-        self.save_config()
+    def schedule_save(self):
+        # The first change starts the timer; later ones ride along with it
+        if self.scheduler is not None:
+            if self.scheduler.get(CONFIG_SAVE_KEY) is None:
+                self.scheduler.call_later(self.save_delay, self.flush, key=CONFIG_SAVE_KEY,
+                                          slack=self.scheduler.slack)
+            return
+        if self._save_timer is not None and self._save_timer.is_alive():
+            return
+        self._save_timer = threading.Timer(self.save_delay, self.flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+    
+    def flush(self):
+        """Write pending changes now, e.g. on quit"""
+        if self.scheduler is not None:
+            self.scheduler.cancel(CONFIG_SAVE_KEY)
+        if self._save_timer is not None and self._save_timer is not threading.current_thread():
+            self._save_timer.cancel()
+        self._save_timer = None
+        if self._dirty:
+            self.save_config()
+            # A set() during the write may have seen this timer still alive and
+            # left the save to it; pick that change up with another one
+            if self._dirty and self._batch_depth == 0:
+                self.schedule_save()
 
 class ReminderStats:
-    """Manages usage statistics"""
+    """Manages usage statistics
+    
+    The figures are a projection of the session event log (see
+    eventlog.py); the stats file or store keeps a copy for other readers.
+    With the event bus on, events are logged on its worker thread; hold
+    ``lock`` while reading ``rollups`` from another thread.
+    """
+    
+    # Events after which that copy is rewritten, ``save_delay`` seconds later
+    SAVE_AFTER = ("break_accepted", "break_natural", "suspended", "session_stop")
     
-    def __init__(self):
-        self.stats = self.load_stats()
+    def __init__(self, store: SQLiteStore = None, path: str = None,
+                 events_path: str = None, snapshot_path: str = None,
+                 clock: Callable[[], datetime] = datetime.now,
+                 save_delay: float = STATS_SAVE_DELAY):
+        self.store = store
+        self.path = path or STATS_FILE
+        self.save_delay = save_delay
+        self.scheduler = None  # see use_scheduler
+        self._save_timer = None
+        self.events = SessionEventLog(
+            events_path or SESSION_EVENTS_FILE, snapshot_path or SESSION_SNAPSHOT_FILE,
+            clock=clock
+        )
+        self.events.load()
+        self.lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        
+        if self.events.projection.seq == 0:
+            # First run with the event log: carry over the old totals
+            legacy = self.load_stats()
+            if legacy.get("total_sessions") or legacy.get("rollups"):
+                rollups = legacy.pop("rollups", None)
+                self.events.append("imported", stats=legacy, rollups=rollups)
+    
+    def use_scheduler(self, scheduler: Scheduler):
+        """Run delayed saves as scheduler jobs instead of a timer thread"""
+        self.scheduler = scheduler
+    
+    @property
+    def stats(self) -> Dict:
+        """A copy of the current figures"""
+        with self.lock:
+            return dict(self.events.projection.stats)
+    
+    @property
+    def rollups(self):
+        return self.events.projection.rollups
     
     def load_stats(self) -> Dict:
         try:
-            if Path(STATS_FILE).exists():
-                with open(STATS_FILE, 'r') as f:
+            if self.store is not None:
+                return self.store.load_stats()
+            elif Path(self.path).exists():
+                with open(self.path, 'r') as f:
                     return json.load(f)
-            return {
-                "total_sessions": 0,
-                "total_breaks": 0,
-                "total_work_time": 0,  # in seconds
-                "longest_session": 0,
-                "average_session": 0,
-                "last_session": None
-            }
         except Exception:
-            return {}
+            pass
+        return {}
     
+    @contextmanager
+    def batch(self):
+        """Hold stats writes back and make a single one at the end"""
+        with self.lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self.schedule_save()
+    
+    @timed("reminder_save_seconds", file="stats")
     def save_stats(self):
-        try:
-            with open(STATS_FILE, 'w') as f:
-                json.dump(self.stats, f, indent=2)
-        except Exception:
-            pass
+        # Held while writing: to_dict() shares the rollups' buckets
+        with self.lock:
+            if self._batch_depth:
+                self._dirty = True
+                return
+            self._dirty = False
+            data = dict(self.events.projection.stats, rollups=self.rollups.to_dict())
+            try:
+                if self.store is not None:
+                    self.store.save_stats(data)
+                    return
+                with open(self.path, 'w') as f:
+                    json.dump(data, f, indent=2)
+            except Exception:
+                pass
+    
+    def schedule_save(self):
+        # The first change starts the timer; later ones ride along with it
+        with self.lock:
+            self._dirty = True
+            if self._batch_depth:
+                return
+            if self.scheduler is not None:
+                key = (STATS_SAVE_KEY, self.path)
+                if self.scheduler.get(key) is None:
+                    self.scheduler.call_later(self.save_delay, self.flush, key=key,
+                                              slack=self.scheduler.slack)
+                return
+            if self._save_timer is not None and self._save_timer.is_alive():
+                return
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self):
+        """Write a pending save now, e.g. on quit"""
+        with self.lock:
+            if self.scheduler is not None:
+                self.scheduler.cancel((STATS_SAVE_KEY, self.path))
+            if self._save_timer is not None and self._save_timer is not threading.current_thread():
+                self._save_timer.cancel()
+            self._save_timer = None
+            if self._dirty:
+                self.save_stats()
     
-    def log_session_start(self):
-        self.session_start = datetime.now()
+    def log(self, event_type: str, **data):
+        """Append one session event; see eventlog.EVENT_TYPES"""
+        with self.lock:
+            self.events.append(event_type, **data)
+            if event_type in self.SAVE_AFTER:
+                self.schedule_save()
+    
+    def log_session_start(self, interval: str = None):
+        self.log("session_start", interval=interval)
+    
+    def log_break_shown(self, message: str = "", activity: str = ""):
+        self.log("break_shown", message=message, activity=activity)
     
     def log_break_taken(self):
-        if hasattr(self, 'session_start'):
-            session_duration = (datetime.now() - self.session_start).total_seconds()
-            
-            self.stats["total_sessions"] += 1
-            self.stats["total_breaks"] += 1
-            self.stats["total_work_time"] += session_duration
-            
-            if session_duration > self.stats.get("longest_session", 0):
-                self.stats["longest_session"] = session_duration
-            
-            # Update average
-            self.stats["average_session"] = (
-                self.stats["total_work_time"] / self.stats["total_sessions"]
-            )
-            
-            self.stats["last_session"] = datetime.now().isoformat()
+        self.log("break_accepted")
+    
+    def log_break_skipped(self, reason: str = "stop"):
+        self.log("break_skipped", reason=reason)
+    
+    def log_natural_break(self, started: datetime, duration: float):
+        self.log("break_natural", started=started.isoformat(), duration=duration)
+    
+    def log_suspend(self, started: datetime, duration: float):
+        self.log("suspended", started=started.isoformat(), duration=duration)
+    
+    def log_clock_jump(self, offset: float):
+        self.log("clock_jump", offset=offset)
+    
+    def log_session_stop(self):
+        self.log("session_stop")
+    
+    def rebuild(self):
+        """Recompute every figure from the event log"""
+        with self.lock:
+            self.events.rebuild()
             self.save_stats()
+    
+    def close(self):
+        self.flush()
+        try:
+            self.events.close()
+        except Exception:
+            pass
 
 class ReminderHistory:
-    """Manages notification history"""
+    """Manages notification history
+    
+    The event bus adds entries on its worker thread while the windows read
+    on the Tk thread, so the in-memory list is only touched under ``_lock``
+    and readers get copies. Journal writes happen outside it.
+    """
+    
+    def __init__(self, retention: Dict = None, store: SQLiteStore = None,
+                 path: str = None, journal_path: str = None,
+                 clock: Callable[[], datetime] = datetime.now):
+        self.retention = RetentionPolicy.from_config(retention, clock)
+        self.store = store
+        self.clock = clock
+        self.journal = HistoryJournal(
+            path or HISTORY_FILE, journal_path or HISTORY_JOURNAL_FILE, self.retention
+        )
+        self._lock = threading.RLock()
+        self._entries = self.load_history() if store is None else None
+        # action -> positions in _entries, built lazily for filtered paging
+        self._positions: Dict[str, List[int]] = None
+    
+    @property
+    def history(self) -> List[Dict]:
+        if self.store is not None:
+            return self.store.all_history()
+        with self._lock:
+            return list(self._entries)
     
-    def __init__(self):
-        self.history = self.load_history()
+    @history.setter
+    def history(self, entries: List[Dict]):
+        if self.store is not None:
+            self.store.clear_history()
+            for entry in entries:
+                self.store.add_history(entry)
+        else:
+            with self._lock:
+                self._entries = entries
+                self._positions = None
     
     def load_history(self) -> List[Dict]:
         try:
-            if Path(HISTORY_FILE).exists():
-                with open(HISTORY_FILE, 'r') as f:
-                    return json.load(f)
-            return []
+            return self.journal.load()
         except Exception:
             return []
     
+    @timed("reminder_save_seconds", file="history")
     def save_history(self):
-        try:
-            with open(HISTORY_FILE, 'w') as f:
-                json.dump(self.history, f, indent=2)
-        except Exception:
-            pass
+        # Rewrites the snapshot; only needed after bulk changes such as clearing
+        if self.store is not None:
+            return
+        with self._lock:
+            try:
+                self.journal.compact(self._entries, background=False)
+            except Exception:
+                pass
     
-    def add_entry(self, message: str, activity: str = "", action: str = "continue"):
-        entry = {
-            "timestamp": datetime.now().isoformat(),
+    def new_entry(self, message: str, activity: str = "", action: str = "continue") -> Dict:
+        return {
+            "timestamp": self.clock().isoformat(),
             "message": message,
             "activity": activity,
             "action": action
         }
-        self.history.append(entry)
+    
+    @timed("reminder_save_seconds", file="history_append")
+    def add_entry(self, message: str, activity: str = "", action: str = "continue"):
+        entry = self.new_entry(message, activity, action)
+        self.extend([entry])
+        return entry
+    
+    def extend(self, entries: List[Dict]):
+        """Store entries made with new_entry, in one journal write or transaction"""
+        if self.store is not None:
+            try:
+                self.store.add_history_many(entries, self.retention)
+            except Exception:
+                pass
+            return
+        
+        with self._lock:
+            self.journal.number(entries)
+            for entry in entries:
+                self._entries.append(entry)
+                if self._positions is not None:
+                    self._positions.setdefault(entry["action"], []).append(len(self._entries) - 1)
+            
+            if self.retention.needs_trim(len(self._entries)):
+                self._trim()
+        
+        try:
+            self.journal.extend(entries)
+            if self.journal.should_compact():
+                with self._lock:
+                    snapshot = list(self._entries)
+                self.journal.compact(snapshot)
+                self._trim()
+        except Exception:
+            pass
+    
+    def _trim(self):
+        with self._lock:
+            size = len(self._entries)
+            self._entries = self.retention.apply(self._entries)
+            if len(self._entries) != size:
+                self._positions = None
+    
+    def _range(self, start_key: str, end_key: str = None):
+        # Entries are appended in time order, so ISO timestamps can be bisected
+        lo = (bisect.bisect_left(self._entries, start_key, key=lambda e: e["timestamp"])
+              if start_key else 0)
+        hi = (bisect.bisect_left(self._entries, end_key, key=lambda e: e["timestamp"])
+              if end_key else len(self._entries))
+        return lo, hi
+    
+    def _action_positions(self, action: str) -> List[int]:
+        if self._positions is None:
+            positions = {}
+            for i, entry in enumerate(self._entries):
+                positions.setdefault(entry.get("action", "continue"), []).append(i)
+            self._positions = positions
+        return self._positions.get(action, [])
+    
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """Last ``limit`` entries, oldest first"""
+        if limit <= 0:
+            return []
+        if self.store is not None:
+            return self.store.recent_history(limit)
+        with self._lock:
+            return self._entries[-limit:]
+    
+    def between(self, start: datetime, end: datetime = None, action: str = None) -> List[Dict]:
+        """Entries with start <= timestamp < end, optionally for one action"""
+        start_key = start.isoformat()
+        end_key = end.isoformat() if end else None
+        if self.store is not None:
+            return self.store.history_between(start_key, end_key, action)
+        
+        with self._lock:
+            lo, hi = self._range(start_key, end_key)
+            entries = self._entries[lo:hi]
+        if action is not None:
+            entries = [e for e in entries if e.get("action") == action]
+        return entries
+    
+    def count(self, start: datetime = None, end: datetime = None, action: str = None) -> int:
+        start_key = start.isoformat() if start else ""
+        end_key = end.isoformat() if end else None
+        if self.store is not None:
+            return self.store.count_history(start_key, end_key, action)
+        
+        with self._lock:
+            lo, hi = self._range(start_key, end_key)
+            if action is None:
+                return hi - lo
+            positions = self._action_positions(action)
+            return bisect.bisect_left(positions, hi) - bisect.bisect_left(positions, lo)
+    
+    def page(self, offset: int, limit: int, start: datetime = None, end: datetime = None,
+             action: str = None) -> List[Dict]:
+        """``limit`` entries newest first, skipping the ``offset`` newest matches"""
+        start_key = start.isoformat() if start else ""
+        end_key = end.isoformat() if end else None
+        if self.store is not None:
+            return self.store.history_page(offset, limit, start_key, end_key, action)
+        
+        with self._lock:
+            lo, hi = self._range(start_key, end_key)
+            if action is None:
+                stop = hi - offset
+                return self._entries[max(lo, stop - limit):max(lo, stop)][::-1]
+            
+            positions = self._action_positions(action)
+            first = bisect.bisect_left(positions, lo)
+            stop = bisect.bisect_left(positions, hi) - offset
+            selected = positions[max(first, stop - limit):max(first, stop)]
+            return [self._entries[i] for i in reversed(selected)]
+    
+    def clear(self):
+        if self.store is not None:
+            self.store.clear_history()
+        else:
+            with self._lock:
+                self._entries = []
+                self._positions = None
+                self.save_history()
+    
+    def close(self):
+        try:
+            self.journal.close()
+            if self.store is not None:
+                self.store.close()
+        except Exception:
+            pass
+
+def open_store(backend: str):
+    """Open the SQLite store when configured, migrating the JSON files once"""
+    if backend != "sqlite":
+        return None
+    try:
+        store = SQLiteStore(DATABASE_FILE)
+        store.migrate_from_json(STATS_FILE, HISTORY_FILE, HISTORY_JOURNAL_FILE)
+        return store
+    except Exception:
+        return None
+
+def create_scheduler(config: ReminderConfig) -> Scheduler:
+    """Scheduler with the ``low_power`` slack window applied"""
+    settings = config.get("low_power") or {}
+    if not settings.get("enabled", False):
+        return Scheduler()
+    scheduler = Scheduler(slack=settings.get("slack_seconds", 30))
+    config.use_scheduler(scheduler)
+    return scheduler
+
+class ReminderSession:
+    """Work session logic shared by the GUI and the daemon
+    
+    Reminders are scheduled on ``scheduler`` and shown through ``notifier``;
+    the owner is responsible for driving both. Listeners are called as
+    ``listener(event, payload)`` for session_start, session_pause,
+    session_resume, session_suspended, clock_jump, break_shown,
+    break_deferred, natural_break, history, stats and session_stop events.
+    """
+    
+    def __init__(self, config: ReminderConfig, stats: ReminderStats, history: ReminderHistory,
+                 scheduler: Scheduler, notifier: NotificationCenter, play_sound=None,
+                 key="session", clock: Callable[[], datetime] = datetime.now):
+        self.config = config
+        self.stats = stats
+        self.history = history
+        self.scheduler = scheduler
+        self.notifier = notifier
+        self.play_sound = play_sound
+        self.listeners = []
+        stats.use_scheduler(scheduler)  # delayed stats saves share the session's wakeups
+        self.key = key  # scheduler job key, unique per session sharing a scheduler
+        self.clock = clock  # wall clock; the scheduler keeps its own monotonic one
+        self.random = random  # picks messages; simulate.py swaps in a seeded Random
+        
+        self.running = False
+        self.interval_name = None
+        self.interval_seconds = None
+        self.started_at = None
+        self.pending_break = None
+        self.paused_remaining = None  # seconds left in the interval while paused
+        self.idle_monitor = None  # set by IdleMonitor
+        self.clock_watch = None  # set by ClockWatch
+        self.calendar = None  # WorkCalendar, compiled at start
+        self.bus = None  # set by EventBus.attach
+    
+    def emit(self, event: str, payload=None):
+        for listener in list(self.listeners):
+            listener(event, payload)
+    
+    def start(self, interval_name: str = None):
+        if self.running:
+            self.stop()
+        
+        self.config.reload_if_changed()
+        config = self.config.snapshot
+        # Compiled before any state changes, so a bad rule can't leave a half-started session
+        calendar = WorkCalendar.from_config(config.calendar)
+        self.interval_name = interval_name or config.current_interval
+        self.interval_seconds = config.intervals.get(self.interval_name, 300)
+        self.running = True
+        self.paused_remaining = None
+        self.started_at = self.clock()
+        self.calendar = calendar
+        self.log_stats("session_start", interval=self.interval_name)
+        
+        self.scheduler.every(self.interval_seconds, self.fire, key=self.key,
+                             slack=self.scheduler.slack)
+        if self.idle_monitor is not None:
+            self.idle_monitor.start()
+        if self.clock_watch is not None:
+            self.clock_watch.start()
+        self.emit("session_start", self.status())
+    
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.paused_remaining = None
+        self.scheduler.cancel(self.key)
+        
+        if self.pending_break is not None:
+            self.notifier.close(self.pending_break)
+            self.pending_break = None
+        
+        # Time away right before stopping is still logged inside the session
+        if self.idle_monitor is not None:
+            self.idle_monitor.stop()
+        if self.clock_watch is not None:
+            self.clock_watch.stop()
+        self.log_stats("session_stop")
+        self.emit("session_stop", self.status())
+    
+    @property
+    def paused(self) -> bool:
+        return self.paused_remaining is not None
+    
+    def pause(self):
+        if not self.running or self.paused:
+            return
+        self.paused_remaining = self.seconds_until_next() or 0.0
+        self.scheduler.cancel(self.key)
+        self.emit("session_pause", self.status())
+    
+    def resume(self, reset: bool = False):
+        """Carry on with the paused interval, or start a full one if ``reset``"""
+        if not self.running or not self.paused:
+            return
+        remaining, self.paused_remaining = self.paused_remaining, None
+        if reset:
+            remaining = self.interval_seconds
+        self.scheduler.every(self.interval_seconds, self.fire, key=self.key, first=remaining,
+                             slack=self.scheduler.slack)
+        self.emit("session_resume", self.status())
+    
+    def fire(self):
+        if not self.running:
+            return
+        if self.clock_watch is not None and self.clock_watch.check():
+            return  # woke up from a suspend; the catch-up policy took care of it
         
-        # Keep only last 100 entries
-        if len(self.history) > 100:
-            self.history = self.history[-100:]
+        if METRICS.enabled:
+            # Still the job being run; it is re-armed after this returns
+            job = self.scheduler.get(self.key)
+            if job is not None:
+                METRICS.observe("reminder_drift_seconds", self.scheduler.clock() - job.deadline,
+                                interval=self.interval_name)
+        
+        if self.calendar is not None and self.defer():
+            return
         
-        self.save_history()
+        # Edits to the config files show up from the next reminder on
+        self.config.reload_if_changed()
+        config = self.config.snapshot
+        
+        # Get random message and activity
+        messages = config.messages
+        activities = config.break_activities
+        
+        message = self.random.choice(messages)
+        activity = self.random.choice(activities) if activities else ""
+        
+        if self.play_sound is not None:
+            self.play_sound()
+        
+        popup_text = message
+        if activity and config.show_activity_suggestion:
+            popup_text += f"\n\nSuggested activity:\n{activity}"
+        
+        popup_text += "\n\nContinue working?"
+        
+        # An unanswered reminder is replaced rather than stacked. Nobody could
+        # answer one shown through a non-interactive backend, so it is no skip
+        if self.pending_break is not None:
+            self.notifier.close(self.pending_break)
+            context = self.pending_break.context
+            if self.notifier.interactive:
+                self.log_history(context["message"], context["activity"], "missed")
+                self.log_stats("break_skipped", reason="missed")
+            else:
+                self.log_history(context["message"], context["activity"], "shown_only")
+        
+        auto_continue = config.auto_continue
+        notification = Notification(
+            "Break Time", popup_text,
+            timeout=AUTO_CONTINUE_TIMEOUT if auto_continue else None,
+            default="continue",
+            context={"message": message, "activity": activity}
+        )
+        self.pending_break = notification
+        self.log_stats("break_shown", message=message, activity=activity)
+        self.notifier.notify(notification, lambda action: self.on_response(notification, action))
+        self.emit("break_shown", {"message": message, "activity": activity})
+    
+    def defer(self) -> bool:
+        """Hold the reminder back outside working hours or during do-not-disturb
+        
+        After time off the next reminder comes a full interval after work
+        resumes; one held back by do-not-disturb is shown when it ends.
+        """
+        now = self.clock()
+        allowed = self.calendar.next_allowed(now)
+        if allowed == now:
+            return False
+        if allowed is None:
+            delay = self.interval_seconds
+        else:
+            delay = (allowed - now).total_seconds()
+            if not self.calendar.is_working(now):
+                delay += self.interval_seconds
+        self.scheduler.every(self.interval_seconds, self.fire, key=self.key, first=delay,
+                             slack=self.scheduler.slack)
+        self.emit("break_deferred", {"until": (now + timedelta(seconds=delay)).isoformat()})
+        return True
+    
+    def on_response(self, notification: Notification, action):
+        if notification is self.pending_break:
+            self.pending_break = None
+        
+        context = notification.context
+        self.log_history(context["message"], context["activity"], action or "dismissed")
+        
+        if action == "continue":
+            # The session schedule is recurring; the next reminder re-arms itself
+            self.log_stats("break_accepted")
+            if self.bus is None:
+                self.emit("stats", self.stats.stats)
+            return
+        
+        self.log_stats("break_skipped", reason=action or "dismissed")
+        if action == "stop":
+            self.stop()
+    
+    def suspended(self, started: datetime, duration: float, unseen: float = 0.0,
+                  policy: str = "reset"):
+        """Catch up after the machine slept for ``duration`` seconds
+        
+        ``unseen`` is the part of it the scheduler clock did not count
+        (Linux's monotonic clock stops during suspend). Reminders that came
+        due while asleep are dropped (skip), shown once (fire_once), or the
+        interval starts over (reset); there is never more than one.
+        """
+        if not self.running:
+            return
+        self.log_stats("suspended", started=started.isoformat(), duration=duration)
+        if self.idle_monitor is not None:
+            self.idle_monitor.resumed(started)
+        self.emit("session_suspended", {"started": started.isoformat(), "duration": duration})
+        if self.paused:
+            return
+        
+        job = self.scheduler.get(self.key)
+        remaining = self.interval_seconds
+        missed = 0
+        if job is not None:
+            remaining = job.deadline - self.scheduler.clock() - unseen
+            if remaining <= 0:
+                missed = int(-remaining // self.interval_seconds) + 1
+                remaining += missed * self.interval_seconds
+        if policy == "reset":
+            remaining = self.interval_seconds
+        self.scheduler.every(self.interval_seconds, self.fire, key=self.key, first=remaining,
+                             slack=self.scheduler.slack)
+        if missed and policy == "fire_once":
+            self.scheduler.call_later(0, self.fire)
+    
+    def clock_jumped(self, offset: float):
+        """The wall clock was set ``offset`` seconds forward (or back)"""
+        if not self.running:
+            return
+        self.log_stats("clock_jump", offset=offset)
+        if self.started_at is not None:
+            self.started_at += timedelta(seconds=offset)
+        self.emit("clock_jump", {"offset": offset})
+    
+    def natural_break(self, started: datetime, duration: float):
+        """Record time the user was away from the computer as a break"""
+        self.log_history("Natural break", "", "idle")
+        self.log_stats("break_natural", started=started.isoformat(), duration=duration)
+        self.emit("natural_break", {"started": started.isoformat(), "duration": duration})
+    
+    def respond(self, action: str) -> bool:
+        """Answer the pending reminder on the user's behalf"""
+        if self.pending_break is None:
+            return False
+        notification = self.pending_break
+        self.notifier.close(notification)
+        self.on_response(notification, action)
+        return True
+    
+    def log_history(self, message: str, activity: str, action: str):
+        if self.bus is None:
+            entry = self.history.add_entry(message, activity, action)
+        else:
+            entry = self.history.new_entry(message, activity, action)
+            self.bus.publish("history_entry", entry)
+        self.emit("history", entry)
+    
+    def log_stats(self, event_type: str, **data):
+        """Record a session event in the stats, on the event bus's thread if there is one"""
+        if self.bus is None:
+            self.stats.log(event_type, **data)
+        else:
+            event = dict(data, type=event_type, time=self.clock().isoformat())
+            self.bus.publish("stats_event", event)
+    
+    def stats_applied(self, event_types: List[str]):
+        """The event bus logged these stats events; pass the new figures on from the scheduler"""
+        if "break_accepted" in event_types:
+            self.scheduler.call_later(0, lambda: self.emit("stats", self.stats.stats))
+    
+    def seconds_until_next(self):
+        if self.paused:
+            return self.paused_remaining
+        job = self.scheduler.get(self.key) if self.running else None
+        if job is None:
+            return None
+        return max(0.0, job.deadline - self.scheduler.clock())
+    
+    def status(self) -> Dict:
+        remaining = self.seconds_until_next()
+        return {
+            "running": self.running,
+            "paused": self.paused,
+            "interval": self.interval_name,
+            "interval_seconds": self.interval_seconds,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "next_fire_in": remaining,
+            "next_fire_at": (
+                (self.clock() + timedelta(seconds=remaining)).isoformat()
+                if remaining is not None else None
+            ),
+            "break_pending": self.pending_break is not None,
+            "wakeups_per_hour": round(self.scheduler.wakeups_per_hour(), 1)
+        }
 
 class SettingsWindow:
     """Settings configuration GUI"""
@@ -178,6 +1040,7 @@ class SettingsWindow:
         self.window = None
     
     def show(self):
+        load_gui()
         if self.window and self.window.winfo_exists():
             self.window.focus()
             return
@@ -197,6 +1060,7 @@ class SettingsWindow:
         self.create_messages_tab()
         self.create_activities_tab()
         self.create_sounds_tab()
+        self.create_idle_tab()
         
         # Save/Cancel buttons
         button_frame = ctk.CTkFrame(self.window)
@@ -307,6 +1171,42 @@ class SettingsWindow:
             width=80
         ).pack(side="right")
     
+    def create_idle_tab(self):
+        tab = self.notebook.add("Idle")
+        
+        ctk.CTkLabel(tab, text="Idle Detection", font=("Arial", 16, "bold")).pack(pady=10)
+        
+        idle = self.config.get("idle_detection") or {}
+        self.idle_enabled = ctk.BooleanVar(value=idle.get("enabled", True))
+        ctk.CTkCheckBox(
+            tab,
+            text="Pause the session while I'm away",
+            variable=self.idle_enabled
+        ).pack(pady=10)
+        
+        frame = ctk.CTkFrame(tab)
+        frame.pack(fill="x", pady=5)
+        ctk.CTkLabel(frame, text="Away after:").pack(side="left", padx=10)
+        self.idle_minutes = ctk.StringVar(value=str(idle.get("idle_minutes", 5)))
+        ctk.CTkEntry(frame, textvariable=self.idle_minutes, width=100).pack(side="right", padx=10)
+        ctk.CTkLabel(frame, text="minutes").pack(side="right")
+        
+        frame = ctk.CTkFrame(tab)
+        frame.pack(fill="x", pady=5)
+        ctk.CTkLabel(frame, text="When I come back:").pack(side="left", padx=10)
+        self.idle_on_return = ctk.StringVar(value=idle.get("on_return", "reset"))
+        ctk.CTkOptionMenu(
+            frame,
+            variable=self.idle_on_return,
+            values=["reset", "resume"]
+        ).pack(side="right", padx=10)
+        
+        ctk.CTkLabel(
+            tab,
+            text="reset starts a fresh interval; resume continues the paused one",
+            text_color="gray"
+        ).pack()
+    
     def browse_sound_file(self):
         filename = filedialog.askopenfilename(
             title="Select Sound File",
@@ -327,41 +1227,73 @@ class SettingsWindow:
                 messagebox.showerror("Error", f"Invalid interval value for {name}")
                 return
         
-        self.config.set("intervals", intervals)
+        try:
+            idle_minutes = float(self.idle_minutes.get())
+        except ValueError:
+            messagebox.showerror("Error", "Invalid idle time")
+            return
         
-        # Save messages
+        # Messages and activities
         messages_text = self.messages_text.get("1.0", "end-1c")
         messages = [msg.strip() for msg in messages_text.split("\n") if msg.strip()]
-        self.config.set("messages", messages)
-        
-        # Save activities
         activities_text = self.activities_text.get("1.0", "end-1c")
         activities = [act.strip() for act in activities_text.split("\n") if act.strip()]
-        self.config.set("break_activities", activities)
         
-        # Save sound settings
-        self.config.set("sound_enabled", self.sound_enabled.get())
-        self.config.set("sound_file", self.sound_file.get())
-        
-        messagebox.showinfo("Success", "Settings saved successfully!")
+        # Only fields that differ from the current settings go into the user
+        # file, so values from the system file or defaults aren't copied into it
+        current = self.config.snapshot.thaw()
+        edited = [(("intervals", name), seconds) for name, seconds in intervals.items()
+                  if current["intervals"].get(name) != seconds]
+        edited += [(key, value) for key, value in (
+            ("messages", messages),
+            ("break_activities", activities),
+            ("sound_enabled", self.sound_enabled.get()),
+            ("sound_file", self.sound_file.get()),
+        ) if current[key] != value]
+        edited += [(("idle_detection", key), value) for key, value in (
+            ("enabled", self.idle_enabled.get()),
+            ("idle_minutes", idle_minutes),
+            ("on_return", self.idle_on_return.get()),
+        ) if current["idle_detection"].get(key) != value]
+        
+        # One write for the whole dialog
+        with self.config.batch():
+            for key, value in edited:
+                self.config.set(key, value)
+        
+        shadowed = [
+            f"{key if isinstance(key, str) else '.'.join(key)} (set by {source})"
+            for key, source in ((key, self.config.shadowed_by(key)) for key, _ in edited)
+            if source is not None
+        ]
+        if shadowed:
+            messagebox.showwarning(
+                "Saved",
+                "Settings saved, but these are overridden and won't take effect:\n"
+                + "\n".join(shadowed)
+            )
+        else:
+            messagebox.showinfo("Success", "Settings saved successfully!")
         self.window.destroy()
 
 class StatsWindow:
     """Statistics display window"""
     
-    def __init__(self, parent, stats: ReminderStats):
+    def __init__(self, parent, stats: ReminderStats, history: ReminderHistory = None):
         self.parent = parent
         self.stats = stats
+        self.history = history
         self.window = None
     
     def show(self):
+        load_gui()
         if self.window and self.window.winfo_exists():
             self.window.focus()
             return
         
         self.window = ctk.CTkToplevel(self.parent)
         self.window.title("Usage Statistics")
-        self.window.geometry("400x500")
+        self.window.geometry("440x900")
         self.window.transient(self.parent)
         
         # Title
@@ -399,48 +1331,236 @@ class StatsWindow:
                 font=("Arial", 14)
             ).pack(pady=10, anchor="w")
         
+        self.show_trends(stats_frame)
+        self.show_analytics(stats_frame)
+        
         # Close button
         ctk.CTkButton(
             self.window,
             text="Close",
             command=self.window.destroy
         ).pack(pady=20)
+    
+    def show_analytics(self, frame):
+        if self.history is None:
+            return
+        try:
+            import analytics
+        except ImportError:
+            return  # NumPy is optional
+        
+        try:
+            summary = analytics.summary(analytics.HistoryArrays.from_history(self.history))
+        except (ValueError, TypeError) as e:
+            # A malformed entry, e.g. a timestamp that doesn't parse
+            lines = [f"Could not analyze the history: {e}"]
+        else:
+            if not summary["entries"]:
+                return
+            lines = [f"Busiest Hour: {summary['busiest']}"]
+            if summary["skip_rate"] is not None:
+                lines.append(f"Skip Rate (7 days): {summary['skip_rate']:.0%}")
+            if summary["common_interval"] is not None:
+                low, high = summary["common_interval"]
+                gap = f"{low:.0f}+" if high is None else f"{low:.0f}-{high:.0f}"
+                lines.append(f"Usual Gap Between Reminders: {gap} min")
+            for name, counts in summary["top_activities"]:
+                lines.append(f"  {name}: {counts['accepted']}/{counts['shown']} accepted")
+        
+        ctk.CTkLabel(
+            frame,
+            text="History Insights",
+            font=("Arial", 14, "bold")
+        ).pack(pady=(10, 0), anchor="w")
+        for line in lines:
+            ctk.CTkLabel(frame, text=line, font=("Arial", 12)).pack(pady=2, anchor="w")
+    
+    def show_trends(self, frame):
+        now = datetime.now()
+        with self.stats.lock:
+            rollups = self.stats.rollups
+            this_week = rollups.week(now)
+            last_week = rollups.week(now - timedelta(weeks=1))
+            quantiles = rollups.quantiles(weeks=4, now=now)
+            series = rollups.daily_series(7, now)
+        
+        lines = [
+            f"This Week: {this_week['breaks']} breaks, {this_week['work_time'] / 3600:.1f} hours"
+            f" (last week {last_week['breaks']})",
+        ]
+        if quantiles["p50"] is not None:
+            lines.append(
+                "Session p50/p90/p99 (4 weeks): " + " / ".join(
+                    f"{quantiles[p] / 60:.0f}" for p in ("p50", "p90", "p99")
+                ) + " min"
+            )
+        for line in lines:
+            ctk.CTkLabel(frame, text=line, font=("Arial", 14)).pack(pady=5, anchor="w")
+        
+        # Breaks per day as a small bar chart
+        most = max(bucket["breaks"] for _, bucket in series) or 1
+        rows = []
+        for day, bucket in series:
+            weekday = datetime.strptime(day, "%Y-%m-%d").strftime("%a")
+            bar = "█" * round(12 * bucket["breaks"] / most)
+            rows.append(f"{weekday}  {bar:<12} {bucket['breaks']}")
+        
+        ctk.CTkLabel(
+            frame,
+            text="Breaks, Last 7 Days",
+            font=("Arial", 14, "bold")
+        ).pack(pady=(10, 0), anchor="w")
+        ctk.CTkLabel(
+            frame,
+            text="\n".join(rows),
+            font=("Courier", 12),
+            justify="left"
+        ).pack(pady=5, anchor="w")
+
+@lru_cache(maxsize=4096)
+def format_timestamp(timestamp: str) -> str:
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return timestamp
+
+class HistoryPager:
+    """Fetches history a page at a time for the history window
+    
+    Only the pages that have been looked at are loaded, and just the last
+    few of them are kept, so the window costs the same for 20 entries as
+    for a few hundred thousand.
+    """
+    
+    def __init__(self, history: ReminderHistory, page_size: int = HISTORY_PAGE_SIZE,
+                 cached_pages: int = 8):
+        self.history = history
+        self.page_size = page_size
+        self.cached_pages = cached_pages
+        self.filters = {"action": None, "start": None, "end": None}
+        self.total = 0
+        self._pages = OrderedDict()
+    
+    def set_filters(self, action: str = None, start: datetime = None, end: datetime = None):
+        self.filters = {"action": action, "start": start, "end": end}
+        self.refresh()
+    
+    def refresh(self):
+        self._pages.clear()
+        self.total = self.history.count(**self.filters)
+    
+    def rows(self, offset: int, count: int) -> List[Dict]:
+        """Entries ``offset`` to ``offset + count``, newest first"""
+        rows = []
+        index = offset
+        stop = min(offset + count, self.total)
+        while index < stop:
+            number, skip = divmod(index, self.page_size)
+            chunk = self._page(number)[skip:skip + stop - index]
+            if not chunk:
+                break
+            rows.extend(chunk)
+            index += len(chunk)
+        return rows
+    
+    def _page(self, number: int) -> List[Dict]:
+        page = self._pages.get(number)
+        if page is not None:
+            self._pages.move_to_end(number)
+            return page
+        page = self.history.page(number * self.page_size, self.page_size, **self.filters)
+        self._pages[number] = page
+        if len(self._pages) > self.cached_pages:
+            self._pages.popitem(last=False)
+        return page
 
 class HistoryWindow:
-    """Notification history window"""
+    """Notification history window
+    
+    Shows a fixed set of row labels and fills them from a HistoryPager as
+    the scrollbar moves, instead of inserting every entry into a textbox.
+    """
+    
+    ACTIONS = ["All", "continue", "stop", "dismissed", "missed", "shown_only", "idle"]
     
     def __init__(self, parent, history: ReminderHistory):
         self.parent = parent
         self.history = history
+        self.pager = HistoryPager(history)
         self.window = None
+        self.offset = 0
+        self.rows = []
     
     def show(self):
+        load_gui()
         if self.window and self.window.winfo_exists():
             self.window.focus()
             return
         
         self.window = ctk.CTkToplevel(self.parent)
         self.window.title("Notification History")
-        self.window.geometry("600x500")
+        self.window.geometry("640x640")
         self.window.transient(self.parent)
         
         # Title
         ctk.CTkLabel(
             self.window,
-            text="Recent Notifications", 
+            text="Notification History", 
             font=("Arial", 20, "bold")
-        ).pack(pady=20)
+        ).pack(pady=(20, 10))
+        
+        # Filters
+        filter_frame = ctk.CTkFrame(self.window)
+        filter_frame.pack(fill="x", padx=20)
+        
+        ctk.CTkLabel(filter_frame, text="Action:").pack(side="left", padx=(10, 5), pady=10)
+        self.action_var = ctk.StringVar(value="All")
+        ctk.CTkOptionMenu(
+            filter_frame,
+            variable=self.action_var,
+            values=self.ACTIONS,
+            width=110,
+            command=lambda choice: self.apply_filters()
+        ).pack(side="left")
         
-        # History display
-        self.history_text = ctk.CTkTextbox(self.window)
-        self.history_text.pack(fill="both", expand=True, padx=20, pady=20)
+        ctk.CTkLabel(filter_frame, text="From:").pack(side="left", padx=(10, 5))
+        self.start_entry = ctk.CTkEntry(filter_frame, width=100, placeholder_text="YYYY-MM-DD")
+        self.start_entry.pack(side="left")
         
-        # Load history
-        self.refresh_history()
+        ctk.CTkLabel(filter_frame, text="To:").pack(side="left", padx=(10, 5))
+        self.end_entry = ctk.CTkEntry(filter_frame, width=100, placeholder_text="YYYY-MM-DD")
+        self.end_entry.pack(side="left")
+        
+        ctk.CTkButton(
+            filter_frame,
+            text="Apply",
+            width=70,
+            command=self.apply_filters
+        ).pack(side="left", padx=10)
+        
+        # Rows and scrollbar
+        list_frame = ctk.CTkFrame(self.window)
+        list_frame.pack(fill="both", expand=True, padx=20, pady=10)
+        list_frame.grid_columnconfigure(0, weight=1)
+        
+        self.rows = []
+        for i in range(HISTORY_VISIBLE_ROWS):
+            row = ctk.CTkLabel(list_frame, text="", anchor="w", justify="left")
+            row.grid(row=i, column=0, sticky="ew", padx=10, pady=2)
+            self.rows.append(row)
+        
+        self.scrollbar = ctk.CTkScrollbar(list_frame, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=HISTORY_VISIBLE_ROWS, sticky="ns")
+        
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.window.bind(sequence, self.on_mousewheel)
+        
+        self.status_label = ctk.CTkLabel(self.window, text="")
+        self.status_label.pack()
         
         # Buttons
         button_frame = ctk.CTkFrame(self.window)
-        button_frame.pack(fill="x", padx=20, pady=(0, 20))
+        button_frame.pack(fill="x", padx=20, pady=(10, 20))
         
         ctk.CTkButton(
             button_frame,
@@ -459,50 +1579,218 @@ class HistoryWindow:
             text="Close",
             command=self.window.destroy
         ).pack(side="right")
-    
-    def refresh_history(self):
-        self.history_text.delete("1.0", "end")
         
-        history_entries = self.history.history[-20:]  # Last 20 entries
-        history_entries.reverse()  # Most recent first
+        # Load history
+        self.refresh_history()
+    
+    def parse_date(self, entry) -> datetime:
+        text = entry.get().strip()
+        return datetime.strptime(text, "%Y-%m-%d") if text else None
+    
+    def apply_filters(self):
+        try:
+            start = self.parse_date(self.start_entry)
+            end = self.parse_date(self.end_entry)
+        except ValueError:
+            messagebox.showerror("Error", "Dates must look like 2024-01-31")
+            return
         
-        for entry in history_entries:
-            timestamp = datetime.fromisoformat(entry["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-            message = entry["message"]
-            activity = entry.get("activity", "")
-            action = entry.get("action", "continue")
-            
-            entry_text = f"[{timestamp}] {message}\n"
-            if activity:
-                entry_text += f"  Activity: {activity}\n"
-            entry_text += f"  Action: {action}\n\n"
-            
-            self.history_text.insert("end", entry_text)
+        action = self.action_var.get()
+        self.pager.set_filters(
+            action=None if action == "All" else action,
+            start=start,
+            end=end + timedelta(days=1) if end else None  # "To" includes that day
+        )
+        self.offset = 0
+        self.render()
+    
+    def refresh_history(self):
+        self.pager.refresh()
+        self.scroll_to(self.offset, force=True)
+    
+    def on_scrollbar(self, command, value, units=None):
+        if command == "moveto":
+            self.scroll_to(int(float(value) * self.pager.total))
+        elif command == "scroll":
+            step = len(self.rows) if units == "pages" else HISTORY_SCROLL_ROWS
+            direction = 1 if float(value) > 0 else -1
+            self.scroll_to(self.offset + direction * step)
+    
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - HISTORY_SCROLL_ROWS)
+        else:
+            self.scroll_to(self.offset + HISTORY_SCROLL_ROWS)
+    
+    def scroll_to(self, offset: int, force: bool = False):
+        offset = max(0, min(offset, self.pager.total - len(self.rows)))
+        if offset == self.offset and not force:
+            return
+        self.offset = offset
+        self.render()
+    
+    def render(self):
+        entries = self.pager.rows(self.offset, len(self.rows))
+        for i, row in enumerate(self.rows):
+            row.configure(text=self.format_entry(entries[i]) if i < len(entries) else "")
+        
+        total = self.pager.total
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(entries)) / total)
+            self.status_label.configure(
+                text=f"Showing {self.offset + 1}-{self.offset + len(entries)} of {total:,}"
+            )
+        else:
+            self.scrollbar.set(0, 1)
+            self.status_label.configure(text="No notifications")
+    
+    @staticmethod
+    def format_entry(entry: Dict) -> str:
+        details = f"Action: {entry.get('action', 'continue')}"
+        if entry.get("activity"):
+            details = f"Activity: {entry['activity']}  ·  {details}"
+        return f"[{format_timestamp(entry['timestamp'])}] {entry['message']}\n  {details}"
     
     def clear_history(self):
         if messagebox.askyesno("Confirm", "Clear all notification history?"):
-            self.history.history = []
-            self.history.save_history()
+            self.history.clear()
+            self.offset = 0
             self.refresh_history()
 
+class MetricsWindow:
+    """Debug panel listing the instrumentation histograms
+    
+    Refreshes once a second while it is on screen and stops while it is
+    withdrawn, e.g. together with the main window.
+    """
+    
+    def __init__(self, parent, scheduler: Scheduler = None):
+        self.parent = parent
+        self.scheduler = scheduler
+        self.window = None
+        self.textbox = None
+        self.paused = False
+    
+    def show(self):
+        load_gui()
+        if self.window and self.window.winfo_exists():
+            self.window.focus()
+            return
+        
+        self.window = ctk.CTkToplevel(self.parent)
+        self.window.title("Metrics")
+        self.window.geometry("640x420")
+        self.window.transient(self.parent)
+        
+        ctk.CTkLabel(
+            self.window,
+            text="Runtime Metrics",
+            font=("Arial", 20, "bold")
+        ).pack(pady=10)
+        
+        self.textbox = ctk.CTkTextbox(self.window, font=("Courier", 12))
+        self.textbox.pack(fill="both", expand=True, padx=20, pady=10)
+        
+        ctk.CTkButton(
+            self.window,
+            text="Close",
+            command=self.window.destroy
+        ).pack(pady=10)
+        self.window.bind("<Map>", self.on_map, add="+")
+        self.refresh()
+    
+    def on_map(self, event=None):
+        if self.paused:
+            self.paused = False
+            self.refresh()
+    
+    def refresh(self):
+        if not self.window or not self.window.winfo_exists():
+            return
+        if not self.window.winfo_viewable():
+            # Nobody can see it; on_map picks up again when it is shown
+            self.paused = True
+            return
+        text = self.format_summaries(METRICS.summaries())
+        if self.scheduler is not None:
+            text = f"Scheduler wakeups per hour: {self.scheduler.wakeups_per_hour():.1f}\n\n" + text
+        self.textbox.configure(state="normal")
+        self.textbox.delete("1.0", "end")
+        self.textbox.insert("end", text)
+        self.textbox.configure(state="disabled")
+        self.window.after(METRICS_REFRESH_MS, self.refresh)
+    
+    @staticmethod
+    def format_summaries(summaries: List[Dict]) -> str:
+        if not summaries:
+            return "Nothing recorded yet."
+        lines = [f"{'metric':<44}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for item in summaries:
+            labels = ",".join(f"{k}={v}" for k, v in item["labels"].items())
+            name = f"{item['name']}{{{labels}}}" if labels else item["name"]
+            lines.append(
+                f"{name:<44}{item['count']:>7}{item['p50'] * 1000:>10.2f}"
+                f"{item['p99'] * 1000:>10.2f}{item['max'] * 1000:>10.2f}"
+            )
+        return "\n".join(lines)
+
 class BreakReminderApp:
     """Main application class"""
     
-    def __init__(self):
-        self.config = ReminderConfig()
-        self.stats = ReminderStats()
-        self.history = ReminderHistory()
+    def __init__(self, config_overrides: Optional[Dict] = None):
+        self.config = ReminderConfig(overrides=config_overrides)
+        self.store = open_store(self.config.get("storage_backend", "json"))
+        self.stats = ReminderStats(self.store)
+        self.history = ReminderHistory(self.config.get("history_retention"), self.store)
         
-        self.icon = None
         self.running = False
         
         # Setup UI
+        load_gui()
         ctk.set_appearance_mode("dark")
         self.root = ctk.CTk()
         self.root.title("Advanced Break Reminder")
         self.root.geometry("500x400")
         self.root.protocol('WM_DELETE_WINDOW', self.quit_app)
         
+        self.scheduler = create_scheduler(self.config)
+        self.scheduler_driver = TkDriver(self.root, self.scheduler)
+        
+        self.metrics_server = enable_from_config(self.config.get("instrumentation"))
+        self.lag_probe = LoopLagProbe(
+            lambda delay, callback: self.root.after(int(delay * 1000), callback),
+            "tk_loop_lag_seconds", LAG_PROBE_SECONDS
+        )
+        self.lag_probe.start()
+        
+        self.notifier = NotificationCenter(
+            create_backend(self.config.get("notification_backend", "auto"), self.root)
+        )
+        # Answers and tray clicks from other threads wake Tk through the driver
+        self.notifier.on_response = lambda: self.scheduler.call_later(0, self.notifier.dispatch)
+        
+        # Played on the audio thread; the bell itself has to ring on the Tk thread
+        bell = lambda: self.scheduler.call_later(0, self.root.bell)
+        self.audio = AudioEngine(
+            create_audio_backend(self.config.get("audio_backend", "auto"), bell), fallback=bell
+        )
+        
+        self.session = ReminderSession(
+            self.config, self.stats, self.history,
+            self.scheduler, self.notifier, self.play_notification_sound
+        )
+        self.session.listeners.append(self.on_session_event)
+        self.bus = EventBus.from_config(self.config.get("event_bus"), self.history, self.stats)
+        if self.bus is not None:
+            self.bus.attach(self.session)
+        self.idle = IdleMonitor.from_config(self.config, self.scheduler, self.session)
+        ClockWatch.from_config(self.config, self.scheduler, self.session)
+        
+        self.icons = IconCache()
+        self.countdown = CountdownUpdater(self.icons, self.scheduler, self.session)
+        # Created on first use and then kept for the lifetime of the app
+        self.tray = TrayService(self.icons.base())
+        
         self.setup_ui()
     
     def setup_ui(self):
@@ -566,6 +1854,8 @@ class BreakReminderApp:
             ("Statistics", self.show_stats),
             ("History", self.show_history)
         ]
+        if METRICS.enabled:
+            buttons.append(("Metrics", self.show_metrics))
         
         for text, command in buttons:
             ctk.CTkButton(
@@ -578,69 +1868,42 @@ class BreakReminderApp:
     def on_interval_change(self, value):
         self.config.set("current_interval", value)
     
-    def create_icon_image(self):
-        width, height = 64, 64
-        image = Image.new('RGB', (width, height), (31, 83, 141))
-        dc = ImageDraw.Draw(image)
-        dc.ellipse((10, 10, 54, 54), fill=(255, 255, 255))
-        # Add a small clock symbol
-        dc.arc((20, 20, 44, 44), start=90, end=0, fill=(31, 83, 141), width=2)
-        return image
-    
     def play_notification_sound(self):
-        if not self.config.get("sound_enabled", True):
-            return
-        
-        sound_file = self.config.get("sound_file", "")
-        
-        try:
-            if sound_file and Path(sound_file).exists():
-                winsound.PlaySound(sound_file, winsound.SND_FILENAME | winsound.SND_ASYNC)
-            else:
-                winsound.Beep(800, 500)  # Frequency, duration
-        except Exception:
-            # Fallback to system bell
-            self.root.bell()
+        # Decoding and playback happen on the audio thread
+        config = self.config.snapshot
+        if config.sound_enabled:
+            self.audio.play(config.sound_file)
     
-    def show_break_reminder(self):
-        if not self.running:
-            return
-        
-        # Get random message and activity
-        messages = self.config.get("messages", ["Time for a break!"])
-        activities = self.config.get("break_activities", [])
-        
-        message = random.choice(messages)
-        activity = random.choice(activities) if activities else ""
-        
-        # Play sound
-        self.play_notification_sound()
-        
-        # Show popup
-        popup_text = message
-        if activity and self.config.get("show_activity_suggestion", True):
-            popup_text += f"\n\nSuggested activity:\n{activity}"
-        
-        popup_text += "\n\nContinue working?"
-        
-        response = messagebox.askyesno("Break Time", popup_text)
-        
-        # Log to history and stats
-        action = "continue" if response else "stop"
-        self.history.add_entry(message, activity, action)
-        
-        if response:
-            self.stats.log_break_taken()
-            # Schedule next reminder
-            interval_name = self.interval_var.get()
-            interval_seconds = self.config.get("intervals", {}).get(interval_name, 300)
-            self.root.after(interval_seconds * 1000, self.show_break_reminder)
-        else:
-            self.stop_session()
+    def on_session_event(self, event, payload):
+        config = self.config.snapshot
+        if event == "session_start" and config.sound_enabled:
+            self.audio.preload(config.sound_file)
+        
+        if event == "break_shown":
+            # The session job re-arms after this callback; read it afterwards
+            self.scheduler.call_later(0, self.refresh_tray)
+        elif event in ("session_start", "session_resume"):
+            self.countdown.start()
+            self.refresh_tray()
+        elif event == "session_pause":
+            self.countdown.stop()
+            self.refresh_tray()
+        elif event == "session_stop":
+            self.on_session_stopped()
+    
+    def refresh_tray(self):
+        remaining = self.session.seconds_until_next()
+        self.tray.update(
+            running=self.session.running,
+            paused=self.session.paused,
+            next_break=(
+                datetime.now() + timedelta(seconds=remaining)
+                if remaining is not None and not self.session.paused else None
+            )
+        )
     
     def start_session(self):
         self.running = True
-        self.stats.log_session_start()
         
         # Update UI
         self.start_btn.configure(state="disabled")
@@ -649,22 +1912,23 @@ class BreakReminderApp:
         # Minimize to tray
         self.withdraw_to_tray()
         
-        # Schedule first reminder
-        interval_name = self.interval_var.get()
-        interval_seconds = self.config.get("intervals", {}).get(interval_name, 300)
-        self.root.after(interval_seconds * 1000, self.show_break_reminder)
+        # Schedule reminders
+        self.session.start(self.interval_var.get())
     
     def stop_session(self):
+        # Session listeners update the UI through on_session_stopped
+        self.session.stop()
+    
+    def on_session_stopped(self):
         self.running = False
         
         # Update UI
         self.start_btn.configure(state="normal")
         self.stop_btn.configure(state="disabled")
         
-        # Stop tray icon
-        if self.icon:
-            self.icon.stop()
-            self.icon = None
+        # Reset the tray icon
+        self.countdown.stop()
+        self.refresh_tray()
         
         # Show main window
         self.root.deiconify()
@@ -672,50 +1936,229 @@ class BreakReminderApp:
     def withdraw_to_tray(self):
         self.root.withdraw()
         
-        menu = (
-            item('Show App', self.show_window),
-            item('Settings', self.show_settings_from_tray),
-            item('Stop Session', self.stop_session),
-            item('Quit', self.quit_app)
-        )
-        
-        self.icon = pystray.Icon(
-            "AdvancedBreakReminder",
-            self.create_icon_image(),
-            "Advanced Break Reminder",
-            menu
-        )
-        
-        threading.Thread(target=self.icon.run, daemon=True).start()
+        if self.tray.icon is None:
+            self.tray.start()
+            self.countdown.icon = self.tray.icon
+            self.tray.on_command = lambda: self.scheduler.call_later(
+                0, lambda: self.tray.drain(self.handle_tray_command)
+            )
     
-    def show_window(self, icon=None, item=None):
-        if self.icon:
-            self.icon.stop()
-            self.icon = None
-        self.root.after(0, self.root.deiconify)
+    def handle_tray_command(self, command: str):
+        actions = {
+            "show": self.show_window,
+            "settings": self.show_settings,
+            "start": self.start_session,
+            "pause": self.session.pause,
+            "resume": self.session.resume,
+            "stop": self.stop_session,
+            "quit": self.quit_app
+        }
+        if command in actions:
+            actions[command]()
     
-    def show_settings_from_tray(self, icon=None, item=None):
-        self.root.after(0, lambda: SettingsWindow(self.root, self.config).show())
+    def show_window(self):
+        self.root.deiconify()
     
     def show_settings(self):
         SettingsWindow(self.root, self.config).show()
     
     def show_stats(self):
-        StatsWindow(self.root, self.stats).show()
+        StatsWindow(self.root, self.stats, self.history).show()
     
     def show_history(self):
         HistoryWindow(self.root, self.history).show()
     
-    def quit_app(self, icon=None, item=None):
+    def show_metrics(self):
+        MetricsWindow(self.root, self.scheduler).show()
+    
+    def quit_app(self):
         self.running = False
-        if self.icon:
-            self.icon.stop()
+        self.lag_probe.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        # Log session_stop, without bringing the window back just to close it
+        self.session.listeners.remove(self.on_session_event)
+        self.session.stop()
+        self.notifier.shutdown()
+        self.audio.shutdown()
+        self.config.flush()
+        if self.bus is not None:
+            self.bus.close()
+        self.history.close()
+        self.stats.close()
+        self.idle.close()
+        self.tray.stop()
+        self.scheduler_driver.close()
         self.root.after(0, self.root.destroy)
         sys.exit()
     
     def run(self):
         self.root.mainloop()
 
+class HeadlessApp:
+    """Runs sessions without customtkinter, in a terminal or as a bare tray icon
+    
+    Everything session-related runs on the scheduler thread; tray menu
+    callbacks and notification answers are handed over as zero-delay jobs.
+    """
+    
+    def __init__(self, tray: bool = False, config_overrides: Optional[Dict] = None):
+        self.config = ReminderConfig(overrides=config_overrides)
+        self.store = open_store(self.config.get("storage_backend", "json"))
+        self.stats = ReminderStats(self.store)
+        self.history = ReminderHistory(self.config.get("history_retention"), self.store)
+        
+        self.scheduler = create_scheduler(self.config)
+        self.notifier = NotificationCenter(
+            create_backend(self.config.get("notification_backend", "auto"))
+        )
+        self.notifier.on_response = lambda: self.scheduler.call_later(0, self.notifier.dispatch)
+        
+        bell = lambda: print("\a", end="", flush=True)
+        self.audio = AudioEngine(
+            create_audio_backend(self.config.get("audio_backend", "auto"), bell), fallback=bell
+        )
+        
+        self.session = ReminderSession(
+            self.config, self.stats, self.history, self.scheduler, self.notifier,
+            self.play_notification_sound
+        )
+        self.session.listeners.append(self.on_session_event)
+        self.bus = EventBus.from_config(self.config.get("event_bus"), self.history, self.stats)
+        if self.bus is not None:
+            self.bus.attach(self.session)
+        self.idle = IdleMonitor.from_config(self.config, self.scheduler, self.session)
+        ClockWatch.from_config(self.config, self.scheduler, self.session)
+        
+        self.icons = IconCache()
+        self.countdown = CountdownUpdater(self.icons, self.scheduler, self.session)
+        
+        self.tray = TrayService(self.icons.base(), show_app=False) if tray else None
+        self.interval_name = None
+        
+        self.metrics_server = enable_from_config(self.config.get("instrumentation"))
+        self.lag_probe = LoopLagProbe(
+            self.scheduler.call_later, "scheduler_loop_lag_seconds", LAG_PROBE_SECONDS
+        )
+        self.stop_event = threading.Event()
+    
+    def play_notification_sound(self):
+        config = self.config.snapshot
+        if config.sound_enabled:
+            self.audio.play(config.sound_file)
+    
+    def on_session_event(self, event, payload):
+        config = self.config.snapshot
+        if event == "session_start" and config.sound_enabled:
+            self.audio.preload(config.sound_file)
+        
+        # The countdown only draws the tray icon, so a terminal session doesn't run it
+        if event in ("session_start", "session_resume"):
+            if self.tray is not None:
+                self.countdown.start()
+        elif event in ("session_stop", "session_pause"):
+            if self.tray is not None:
+                self.countdown.stop()
+        elif event == "break_shown":
+            print(f"[{datetime.now():%H:%M:%S}] {payload['message']}", flush=True)
+            if payload["activity"] and config.show_activity_suggestion:
+                print(f"  Suggested activity: {payload['activity']}", flush=True)
+        if self.tray is not None:
+            self.scheduler.call_later(0, self.refresh_tray)
+    
+    def refresh_tray(self):
+        remaining = self.session.seconds_until_next()
+        self.tray.update(
+            running=self.session.running,
+            paused=self.session.paused,
+            next_break=(
+                datetime.now() + timedelta(seconds=remaining)
+                if remaining is not None and not self.session.paused else None
+            )
+        )
+    
+    def run(self, interval_name: str = None):
+        self.interval_name = interval_name
+        self.scheduler.call_later(0, lambda: self.session.start(interval_name))
+        self.lag_probe.start()
+        
+        if self.tray is None:
+            try:
+                self.scheduler.run_forever(self.stop_event)
+            except KeyboardInterrupt:
+                pass
+            self.shutdown()
+            return
+        
+        # Menu clicks are drained on the scheduler thread
+        self.tray.on_command = lambda: self.scheduler.call_later(
+            0, lambda: self.tray.drain(self.handle_tray_command)
+        )
+        self.countdown.icon = self.tray.create()
+        worker = threading.Thread(target=self.scheduler.run_forever, args=(self.stop_event,), daemon=True)
+        worker.start()
+        # pystray has to own the main thread on some platforms
+        self.tray.run()
+        self.quit()
+        worker.join()
+        self.shutdown()
+    
+    def handle_tray_command(self, command: str):
+        actions = {
+            "start": lambda: self.session.start(self.interval_name),
+            "pause": self.session.pause,
+            "resume": self.session.resume,
+            "stop": self.session.stop,
+            "quit": self.quit
+        }
+        if command in actions:
+            actions[command]()
+    
+    def quit(self):
+        self.stop_event.set()
+        self.scheduler.wake()
+        if self.tray is not None:
+            self.tray.stop()
+    
+    def shutdown(self):
+        self.lag_probe.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.session.stop()
+        if self.scheduler.slack:
+            print(f"Wakeups per hour: {self.scheduler.wakeups_per_hour():.1f}", flush=True)
+        self.notifier.shutdown()
+        self.audio.shutdown()
+        self.config.flush()
+        if self.bus is not None:
+            self.bus.close()
+        self.history.close()
+        self.stats.close()
+        self.idle.close()
+
+def main(argv=None):
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Advanced Break Reminder")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--tray", action="store_true", help="tray icon only, no main window")
+    mode.add_argument("--headless", action="store_true", help="no GUI at all; reminders go to the terminal")
+    parser.add_argument("--interval", help="interval preset to start with")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a config value for this run, e.g. idle_detection.idle_minutes=10")
+    args = parser.parse_args(argv)
+    
+    overrides = {}
+    for assignment in args.set:
+        try:
+            overrides = deep_merge(overrides, parse_assignment(assignment))
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.tray or args.headless:
+        HeadlessApp(tray=args.tray, config_overrides=overrides).run(args.interval)
+    else:
+        BreakReminderApp(overrides).run()
+
 if __name__ == "__main__":
-    app = BreakReminderApp()
-    app.run()
+    main()